@@ -8,6 +8,8 @@ def post_init_hook(cr, registry):
     cuando se instala el módulo.
     """
     env = api.Environment(cr, SUPERUSER_ID, {})
+    # 0) Cargamos el mapeo de IDs FM <=> Odoo con los IDs que ya existan
+    env['forcemanager.id.map']._backfill_from_legacy_columns()
     # 1) Sincronizamos países de forcemanager con los de Odoo
     env['res.country'].sync_countries_from_forcemanager()
     # 2) Sincronizamos las categorías hacia forcemanager
@@ -12,3 +12,9 @@ from . import forcemanager_import
 from . import stock_move
 from . import product_template
 from . import sale_order_line
+from . import forcemanager_pending_ref
+from . import forcemanager_indexes
+from . import forcemanager_id_map
+from . import forcemanager_staging
+from . import forcemanager_outbox
+from . import forcemanager_push_hash
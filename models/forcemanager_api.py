@@ -1,11 +1,103 @@
 # models/forcemanager_api.py
 
+import json
 import requests
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from odoo import api, fields, models
 
+from .forcemanager_logging import DEFAULT_SAMPLE_EVERY, LazyBody, set_sample_every
+
 _logger = logging.getLogger(__name__)
 
+# Codecs JSON opcionales (más rápidos que el json de la librería estándar)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+class _JsonCodec:
+    """loads(bytes) => objeto y dumps(objeto) => bytes (UTF-8)."""
+
+    def __init__(self, name, loads, dumps):
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+
+
+JSON_CODECS = {
+    'json': _JsonCodec('json', json.loads, lambda obj: json.dumps(obj).encode('utf-8')),
+}
+if orjson:
+    JSON_CODECS['orjson'] = _JsonCodec('orjson', orjson.loads, orjson.dumps)
+if ujson:
+    JSON_CODECS['ujson'] = _JsonCodec('ujson', ujson.loads, lambda obj: ujson.dumps(obj).encode('utf-8'))
+# Preferencia en modo 'auto': el primero instalado
+_AUTO_CODECS = ('orjson', 'ujson', 'json')
+
+
+class ForceManagerRequestError(Exception):
+    """
+    Petición a ForceManager fallida (error HTTP, de conexión o respuesta ilegible).
+    status_code: código HTTP de la respuesta, o None si no la hubo.
+    """
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class _RateLimiter:
+    """
+    Limitador compartido por todos los hilos (y crons) de un mismo proceso y base
+    de datos: como máximo `rate` peticiones por segundo hacia ForceManager.
+    """
+
+    def __init__(self, rate):
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+        self.interval = 0.0
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+
+    def acquire(self):
+        """Espera (fuera del lock) hasta el siguiente hueco libre."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+# Un limitador por base de datos, compartido entre peticiones del mismo proceso
+_RATE_LIMITERS = {}
+_RATE_LIMITERS_LOCK = threading.Lock()
+
+
+def _send_request(limiter, method, url, headers, body):
+    """
+    Petición HTTP sin tocar el ORM (se ejecuta en los hilos del pool).
+    body: JSON ya serializado (bytes) o None.
+    Devuelve (response, None) o (None, mensaje de error).
+    """
+    limiter.acquire()
+    try:
+        return requests.request(method, url, headers=headers, data=body), None
+    except requests.exceptions.RequestException as e:
+        return None, str(e)
+
 class ForceManagerAPI(models.AbstractModel):
     _name = 'forcemanager.api'
     _description = 'ForceManager API Wrapper (v4)'
@@ -32,13 +124,14 @@ class ForceManagerAPI(models.AbstractModel):
             'password': api_password,
         }
 
-        _logger.info(f"Iniciando solicitud de token a ForceManager. URL: {base_url_login}")
+        _logger.info("Iniciando solicitud de token a ForceManager. URL: %s", base_url_login)
         try:
             response = requests.post(base_url_login, json=payload)
-            _logger.info(f"HTTP {response.status_code}, respuesta: {response.text}")
+            # Nunca se registra el cuerpo: contiene el token
+            _logger.info("Login ForceManager: HTTP %s", response.status_code)
             response.raise_for_status()
 
-            data = response.json()
+            data = self._decode_response(response)
             token = data.get('token')
             if token:
                 self.env['ir.config_parameter'].sudo().set_param(
@@ -47,9 +140,9 @@ class ForceManagerAPI(models.AbstractModel):
                 )
                 _logger.info("Token obtenido y guardado en ir.config_parameter.")
             else:
-                _logger.warning(f"No se encontró 'token' en la respuesta: {data}")
-        except requests.exceptions.RequestException as e:
-            _logger.error(f"Error al autenticar en ForceManager: {e}")
+                _logger.warning("No se encontró 'token' en la respuesta (claves: %s)", list(data))
+        except (requests.exceptions.RequestException, ValueError) as e:
+            _logger.error("Error al autenticar en ForceManager: %s", e)
 
     @api.model
     def _get_base_url(self):
@@ -73,7 +166,8 @@ class ForceManagerAPI(models.AbstractModel):
         return token
 
     @api.model
-    def _perform_request(self, endpoint, method='GET', payload=None, custom_headers=None):
+    def _perform_request(self, endpoint, method='GET', payload=None, custom_headers=None, data_stream=None,
+                         restream=None, raise_errors=False):
         """
         Ejecuta una petición HTTP a ForceManager v4 con 'X-Session-Key' en headers.
         endpoint p.ej. 'accounts', 'contacts', 'products', 'opportunities'.
@@ -81,11 +175,28 @@ class ForceManagerAPI(models.AbstractModel):
         1) Obtiene el token
         2) Hace la petición con las cabeceras base + custom_headers
         3) Si recibe 401 => reautentica y reintenta 1 vez.
+
+        data_stream (POST/PUT): iterable de bytes con el JSON ya serializado, que se
+        envía como cuerpo "chunked" en lugar de payload. Un stream no se puede
+        repetir: con 401 se reautentica y se reintenta con restream() (función que
+        vuelve a generar el mismo cuerpo). Devuelve None si el envío en streaming
+        falla sin respuesta (error de conexión o timeout, o 401 sin restream), para
+        que el llamante dé por fallidos los elementos de ese cuerpo.
+
+        raise_errors: por defecto un error HTTP devuelve {} (igual que un cuerpo
+        vacío). Con raise_errors=True se lanza ForceManagerRequestError (con el
+        código HTTP, si lo hay), para los llamantes que necesitan distinguirlos.
+
+        Log: petición y respuesta a nivel DEBUG (cuerpos truncados y con hash, nunca
+        las cabeceras con la clave de sesión); a nivel INFO para los endpoints de
+        `_is_debug_endpoint`. Los errores, siempre.
         """
         base_url = self._get_base_url().rstrip('/')
         url = f"{base_url}/{endpoint.lstrip('/')}"
+        codec = self._get_json_codec()
+        body_level = logging.INFO if self._is_debug_endpoint(endpoint) else logging.DEBUG
 
-        def do_request():
+        def do_request(stream=None):
             """Pequeña función interna para no duplicar código."""
             token_now = self._get_access_token()
             headers = {
@@ -97,36 +208,251 @@ class ForceManagerAPI(models.AbstractModel):
             if custom_headers:
                 headers.update(custom_headers)
 
-            _logger.info(f"Haciendo {method} a {url}, payload={payload}, headers={headers}")
+            _logger.log(body_level, "Haciendo %s a %s, payload=%s, cabeceras extra=%s", method, url,
+                        LazyBody(payload) if stream is None else '<stream>', custom_headers or {})
+            self._get_rate_limiter().acquire()
             if method == 'GET':
                 return requests.get(url, headers=headers, params=payload)
+            elif method in ('POST', 'PUT') and stream is not None:
+                return requests.request(method, url, headers=headers, data=stream)
             elif method == 'POST':
-                return requests.post(url, headers=headers, json=payload)
+                return requests.post(url, headers=headers, data=codec.dumps(payload))
             elif method == 'PUT':
-                return requests.put(url, headers=headers, json=payload)
+                return requests.put(url, headers=headers, data=codec.dumps(payload))
             elif method == 'DELETE':
                 return requests.delete(url, headers=headers)
             else:
                 raise ValueError("Método HTTP no soportado")
 
+        def send(stream=None):
+            """
+            do_request; en streaming, un error de transporte devuelve None en lugar de
+            propagarse, y con raise_errors se convierte en ForceManagerRequestError.
+            """
+            if stream is None and not raise_errors:
+                return do_request()
+            try:
+                return do_request(stream)
+            except requests.exceptions.RequestException as e:
+                _logger.error("Error de conexión en la petición ForceManager API (%s %s): %s", method, endpoint, e)
+                if raise_errors:
+                    raise ForceManagerRequestError(str(e)) from e
+                return None
+
         # 1) Primer intento
-        resp = do_request()
-        _logger.info(f"Respuesta ForceManager: {resp.status_code}, {resp.text}")
+        resp = send(data_stream)
+        if resp is None:
+            return None
+        _logger.log(body_level, "Respuesta ForceManager %s %s: %s %s", method, endpoint, resp.status_code,
+                    LazyBody(resp.content))
 
         if resp.status_code == 401:
-            # 2) Reautenticar y reintentar UNA vez
-            _logger.warning("Token caducado (401). Reautenticando y reintentando la petición.")
+            # 2) Reautenticar y reintentar UNA vez (un stream, solo si se puede regenerar)
             self._authenticate()
-            resp = do_request()  # segundo intento
-            _logger.info(f"Respuesta ForceManager (2° intento): {resp.status_code}, {resp.text}")
+            if data_stream is not None and restream is None:
+                _logger.warning("Token caducado (401) en un envío en streaming sin restream. Petición fallida.")
+                return None
+            _logger.warning("Token caducado (401). Reautenticando y reintentando la petición.")
+            resp = send(restream() if data_stream is not None else None)  # segundo intento
+            if resp is None:
+                return None
+            _logger.log(body_level, "Respuesta ForceManager %s %s (2° intento): %s %s", method, endpoint,
+                        resp.status_code, LazyBody(resp.content))
         
         try:
             resp.raise_for_status()  # si sigue fallando, levantará excepción
-            # Devuelve JSON (puede ser dict o lista)
-            return resp.json() if resp.text else {}
-        except requests.exceptions.RequestException as e:
-            _logger.error(f"Error en la petición ForceManager API: {e}")
+            # Devuelve JSON (puede ser dict o lista), parseado una vez desde los bytes
+            return self._decode_response(resp, codec)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            _logger.error("Error en la petición ForceManager API (%s %s): %s", method, endpoint, e)
+            if raise_errors:
+                raise ForceManagerRequestError(str(e), resp.status_code) from e
+            return {}
+
+    @api.model
+    def _is_debug_endpoint(self, endpoint):
+        """
+        Interruptor de log detallado por endpoint: forcemanager_integration.debug_endpoints
+        con prefijos separados por comas (p.ej. 'accounts,sales/bulk') o '*' para todos.
+        Para esos endpoints, petición y respuesta (truncadas) se registran a nivel INFO.
+        """
+        value = self.env['ir.config_parameter'].sudo().get_param('forcemanager_integration.debug_endpoints')
+        if not value:
+            return False
+        path = endpoint.lstrip('/').split('?', 1)[0]
+        prefixes = [prefix.strip().lstrip('/') for prefix in value.split(',') if prefix.strip()]
+        return any(prefix == '*' or path.startswith(prefix) for prefix in prefixes)
+
+    @api.model
+    def _get_json_codec(self):
+        """
+        Codec JSON para respuestas y payloads (forcemanager_integration.json_codec:
+        'auto' por defecto = orjson, ujson o json según lo que esté instalado).
+        Si se pide uno no instalado, se usa el de la librería estándar.
+        """
+        name = self.env['ir.config_parameter'].sudo().get_param('forcemanager_integration.json_codec', 'auto')
+        if name == 'auto':
+            name = next(codec for codec in _AUTO_CODECS if codec in JSON_CODECS)
+        return JSON_CODECS.get(name) or JSON_CODECS['json']
+
+    @api.model
+    def _decode_response(self, resp, codec=None):
+        """
+        Parsea el cuerpo de la respuesta desde los bytes (resp.content), una sola vez
+        y sin construir resp.text. Cuerpo vacío => {}.
+        """
+        content = resp.content
+        if not content:
+            return {}
+        return (codec or self._get_json_codec()).loads(content)
+
+    @api.model
+    def _get_rate_limiter(self):
+        """
+        Limitador de peticiones por segundo (forcemanager_integration.max_requests_per_second,
+        por defecto 10; 0 = sin límite), compartido por todos los envíos del proceso.
+        """
+        value = self.env['ir.config_parameter'].sudo().get_param(
+            'forcemanager_integration.max_requests_per_second', '10'
+        )
+        try:
+            rate = float(value)
+        except (TypeError, ValueError):
+            rate = 10.0
+        dbname = self.env.cr.dbname
+        with _RATE_LIMITERS_LOCK:
+            limiter = _RATE_LIMITERS.get(dbname)
+            if limiter is None:
+                limiter = _RATE_LIMITERS[dbname] = _RateLimiter(rate)
+            else:
+                limiter.set_rate(rate)
+        return limiter
+
+    @api.model
+    def _get_http_workers(self):
+        """
+        Hilos para los envíos concurrentes (forcemanager_integration.http_workers, por defecto 4).
+        """
+        value = self.env['ir.config_parameter'].sudo().get_param('forcemanager_integration.http_workers', '4')
+        try:
+            return max(int(value), 1)
+        except (TypeError, ValueError):
+            return 4
+
+    @api.model
+    def _configure_log_sampling(self):
+        """
+        Muestreo de los logs por registro (ver forcemanager_logging.log_sampled):
+        uno de cada forcemanager_integration.log_sample_every por entidad (por defecto 100).
+        """
+        value = self.env['ir.config_parameter'].sudo().get_param(
+            'forcemanager_integration.log_sample_every', str(DEFAULT_SAMPLE_EVERY)
+        )
+        try:
+            set_sample_every(int(value))
+        except (TypeError, ValueError):
+            set_sample_every(DEFAULT_SAMPLE_EVERY)
+
+    @api.model
+    def _perform_requests_concurrent(self, request_list):
+        """
+        Ejecuta en paralelo (pool de `_get_http_workers()` hilos, con el limitador
+        compartido) una lista de peticiones independientes:
+            [(clave, endpoint, method, payload), ...]
+        Los hilos solo hacen HTTP: token, URL y parámetros se leen antes en el hilo
+        del cron, y las respuestas se devuelven para aplicarlas en bloque con el ORM.
+        Si alguna recibe 401 se reautentica UNA vez y se reintentan esas.
+        Devuelve {clave: JSON de la respuesta ({} si viene vacía) o None si ha fallado}.
+        """
+        if not request_list:
             return {}
+        base_url = self._get_base_url().rstrip('/')
+        limiter = self._get_rate_limiter()
+        workers = min(self._get_http_workers(), len(request_list))
+        codec = self._get_json_codec()
+
+        def run(batch):
+            headers = {
+                'Content-Type': 'application/json',
+                'Accept': '*/*',
+                'X-Session-Key': self._get_access_token(),
+            }
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='forcemanager_http') as pool:
+                futures = {
+                    key: pool.submit(_send_request, limiter, method, f"{base_url}/{endpoint.lstrip('/')}",
+                                     headers, codec.dumps(payload) if payload is not None else None)
+                    for key, endpoint, method, payload in batch
+                }
+                return {key: future.result() for key, future in futures.items()}
+
+        _logger.info("[_perform_requests_concurrent] %d peticiones con %d hilos.", len(request_list), workers)
+        raw = run(request_list)
+        expired = [req for req in request_list if raw[req[0]][0] is not None and raw[req[0]][0].status_code == 401]
+        if expired:
+            _logger.warning("Token caducado (401) en %d peticiones. Reautenticando y reintentando.", len(expired))
+            self._authenticate()
+            raw.update(run(expired))
+
+        results = {}
+        for key, endpoint, method, payload in request_list:
+            resp, error = raw[key]
+            if resp is None:
+                _logger.error("Error en la petición ForceManager API (%s %s): %s", method, endpoint, error)
+                results[key] = None
+                continue
+            try:
+                resp.raise_for_status()
+                results[key] = self._decode_response(resp, codec)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                _logger.error("Error en la petición ForceManager API (%s %s): %s", method, endpoint, e)
+                results[key] = None
+        return results
+
+    @api.model
+    def _get_page_size(self):
+        """
+        Tamaño de página para las lecturas paginadas (cabecera 'Count').
+        Configurable con forcemanager_integration.page_size (por defecto 100).
+        """
+        value = self.env['ir.config_parameter'].sudo().get_param('forcemanager_integration.page_size', '100')
+        try:
+            return max(int(value), 1)
+        except (TypeError, ValueError):
+            return 100
+
+    @api.model
+    def _iter_pages(self, endpoint, page_size=None):
+        """
+        Recorre un endpoint de lectura página a página con las cabeceras
+        'Count' (tamaño) y 'Page' (índice, empieza en 0) de ForceManager v4.
+        Devuelve un generador de listas; se detiene con la primera página
+        incompleta, vacía o repetida (por si la API ignorase 'Page').
+        Si falla la petición de una página lanza ForceManagerRequestError (las
+        anteriores ya se han entregado): el llamante no debe darla por el final
+        de los datos ni avanzar la fecha de última sincronización.
+        """
+        page_size = page_size or self._get_page_size()
+        page = 0
+        previous_first_id = None
+        while True:
+            response = self._perform_request(
+                endpoint,
+                method='GET',
+                custom_headers={'Count': str(page_size), 'Page': str(page)},
+                raise_errors=True,
+            )
+            records = response if isinstance(response, list) else (response or {}).get('results', [])
+            if not records:
+                return
+            first_id = records[0].get('id') if isinstance(records[0], dict) else None
+            if page and first_id is not None and first_id == previous_first_id:
+                _logger.warning("[_iter_pages] %s: la página %d repite la anterior. Fin de la lectura.", endpoint, page)
+                return
+            previous_first_id = first_id
+            yield records
+            if len(records) < page_size:
+                return
+            page += 1
 
     # -------------------------------------------------------------------------
     # Última sincronización
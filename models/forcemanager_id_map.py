@@ -0,0 +1,416 @@
+# models/forcemanager_id_map.py
+
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+# Secuencia que cada proceso consulta una vez por transacción: si ha avanzado, otro
+# worker ha re-enlazado o borrado enlaces y la caché local se vacía.
+_GENERATION_SEQ = 'forcemanager_id_map_generation_seq'
+_DEFAULT_CACHE_SIZE = 100000
+
+# entidad => (modelo Odoo, dominio extra, columnas "legacy" con el ID de FM y su tipo)
+# Las columnas legacy siguen existiendo (vistas, payloads); la tabla de mapeo es la
+# fuente para las búsquedas y se rellena sola a partir de ellas cuando falta algo.
+FM_ENTITY_SPECS = {
+    'account': ('res.partner', [('is_company', '=', True)], [('forcemanager_id', int)]),
+    'contact': ('res.partner', [('is_company', '=', False)], [('forcemanager_id', int)]),
+    'opportunity': ('crm.lead', [], [('forcemanager_opportunity_id', int), ('forcemanager_id', str)]),
+    'order': ('sale.order', [], [('forcemanager_id', str)]),
+    'product': ('product.template', [], [('forcemanager_id', str)]),
+    'category': ('product.category', [], [('forcemanager_id', str)]),
+    'user': ('res.users', [], [('forcemanager_id', int)]),
+    'country': ('res.country', [], [('forcemanager_id', int)]),
+}
+
+
+class _FmIdLruCache:
+    """
+    Caché LRU en memoria (por proceso y base de datos) delante de forcemanager_id_map:
+    (entidad, fm_id) => res_id. Compartida por todos los hilos del worker.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.data = OrderedDict()
+        self.max_size = _DEFAULT_CACHE_SIZE
+        self.generation = None
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, entity, fm_ids):
+        found = {}
+        with self.lock:
+            for fm_id in fm_ids:
+                key = (entity, fm_id)
+                res_id = self.data.get(key)
+                if res_id is not None:
+                    self.data.move_to_end(key)
+                    found[fm_id] = res_id
+            self.hits += len(found)
+            self.misses += len(fm_ids) - len(found)
+        return found
+
+    def put_many(self, entity, pairs):
+        with self.lock:
+            for fm_id, res_id in pairs:
+                self.data[(entity, fm_id)] = res_id
+                self.data.move_to_end((entity, fm_id))
+            while len(self.data) > self.max_size:
+                self.data.popitem(last=False)
+
+    def evict(self, keys):
+        with self.lock:
+            for key in keys:
+                self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+_ID_CACHES = {}
+_ID_CACHES_LOCK = threading.Lock()
+
+
+class ForceManagerIdMap(models.Model):
+    """
+    Mapeo único y tipado ID de ForceManager <=> registro Odoo para todas las entidades.
+
+    Los IDs de FM viven en columnas heterogéneas (Integer en partners/usuarios/países,
+    Char en productos/categorías/pedidos/leads, y dos columnas en crm.lead). Esta tabla
+    los guarda siempre como entero, con índice único (entity_type, fm_id) y otro por
+    (entity_type, res_id), de modo que las búsquedas en ambos sentidos son directas
+    y sin conversiones str()/int().
+
+    Delante de la tabla hay una caché LRU por proceso (`_FmIdLruCache`) para el
+    sentido FM => Odoo: se rellena al leer y al enlazar, y se invalida al re-enlazar
+    o desenlazar. Otros workers se enteran por la secuencia de generación, que se
+    avanza tras el commit y se comprueba una vez por transacción; un rollback vacía
+    la caché local, y un savepoint revertido también si se abre con `_savepoint`.
+    Tamaño: parámetro forcemanager_integration.id_cache_size.
+    """
+    _name = 'forcemanager.id.map'
+    _description = 'Mapeo de IDs ForceManager ↔ Odoo'
+    _log_access = False
+
+    entity_type = fields.Selection([
+        ('account', 'Cuenta'),
+        ('contact', 'Contacto'),
+        ('opportunity', 'Oportunidad'),
+        ('order', 'Pedido'),
+        ('product', 'Producto'),
+        ('category', 'Categoría de producto'),
+        ('user', 'Comercial'),
+        ('country', 'País'),
+    ], string='Entidad', required=True)
+    fm_id = fields.Integer(string='ID ForceManager', required=True)
+    res_model = fields.Char(string='Modelo Odoo', required=True)
+    res_id = fields.Integer(string='ID Odoo', required=True)
+
+    _sql_constraints = [
+        ('entity_fm_id_uniq', 'unique(entity_type, fm_id)',
+         'Un ID de ForceManager solo puede estar enlazado a un registro por entidad.'),
+    ]
+
+    def init(self):
+        super().init()
+        self.env.cr.execute(
+            'CREATE INDEX IF NOT EXISTS "forcemanager_id_map_entity_res_idx" '
+            'ON "forcemanager_id_map" (entity_type, res_id)'
+        )
+        self.env.cr.execute(f'CREATE SEQUENCE IF NOT EXISTS "{_GENERATION_SEQ}"')
+
+    # -------------------------------------------------------------------------
+    # Caché en memoria
+    # -------------------------------------------------------------------------
+    def _id_cache(self):
+        """
+        Devuelve la caché LRU de esta base de datos. En la primera llamada de cada
+        transacción compara la generación global y vacía la caché si ha cambiado.
+        """
+        cr = self.env.cr
+        with _ID_CACHES_LOCK:
+            cache = _ID_CACHES.setdefault(cr.dbname, _FmIdLruCache())
+        # postrollback.data se limpia al final de cada transacción (commit o rollback)
+        if cr.postrollback.data.get('forcemanager_id_map_checked'):
+            return cache
+
+        cr.execute(f'SELECT last_value FROM "{_GENERATION_SEQ}"')
+        generation = cr.fetchone()[0]
+        with cache.lock:
+            if generation != cache.generation:
+                cache.data.clear()
+                cache.generation = generation
+            cache.max_size = int(self.env['ir.config_parameter'].sudo().get_param(
+                'forcemanager_integration.id_cache_size', _DEFAULT_CACHE_SIZE
+            ))
+        cr.postrollback.data['forcemanager_id_map_checked'] = True
+        # Lo cacheado en esta transacción puede no llegar a existir
+        cr.postrollback.add(cache.clear)
+        return cache
+
+    def _schedule_generation_bump(self):
+        """Tras el commit, avanza la generación para que el resto de workers vacíen su caché."""
+        cr = self.env.cr
+        if cr.postcommit.data.get('forcemanager_id_map_bump'):
+            return
+        cr.postcommit.data['forcemanager_id_map_bump'] = True
+        registry = self.env.registry
+
+        def bump_generation():
+            with registry.cursor() as bump_cr:
+                bump_cr.execute(f"SELECT nextval('\"{_GENERATION_SEQ}\"')")
+
+        cr.postcommit.add(bump_generation)
+
+    @contextmanager
+    def _savepoint(self):
+        """
+        cr.savepoint() para bloques que enlazan registros: si el savepoint se
+        revierte, sus filas del mapeo desaparecen pero la caché en memoria las
+        conservaría (el rollback de la transacción no llega a producirse), así que
+        se vacía la caché local antes de propagar la excepción.
+        """
+        try:
+            with self.env.cr.savepoint():
+                yield
+        except Exception:
+            self._id_cache().clear()
+            raise
+
+    @api.model
+    def get_cache_stats(self):
+        """Tamaño y ratio de aciertos de la caché en memoria de este proceso."""
+        cache = self._id_cache()
+        with cache.lock:
+            lookups = cache.hits + cache.misses
+            return {
+                'size': len(cache.data),
+                'max_size': cache.max_size,
+                'hits': cache.hits,
+                'misses': cache.misses,
+                'hit_ratio': (cache.hits / lookups) if lookups else 0.0,
+                'generation': cache.generation,
+            }
+
+    # -------------------------------------------------------------------------
+    # Búsquedas
+    # -------------------------------------------------------------------------
+    @api.model
+    def _clean_fm_ids(self, fm_ids):
+        clean = set()
+        for fm_id in fm_ids or []:
+            try:
+                fm_id = int(fm_id) if fm_id else 0
+            except (TypeError, ValueError):
+                fm_id = 0
+            if fm_id:
+                clean.add(fm_id)
+        return clean
+
+    @api.model
+    def _get_res_ids(self, entity, fm_ids):
+        """
+        FM ID => ID Odoo para una lista de IDs de FM (enteros o texto).
+        Primero la caché en memoria; los que falten, una consulta sobre el mapeo,
+        y los que sigan faltando se buscan una vez en las columnas legacy y se
+        añaden al mapeo. Devuelve {fm_id(int): res_id}.
+        """
+        fm_ids = self._clean_fm_ids(fm_ids)
+        if not fm_ids:
+            return {}
+        cache = self._id_cache()
+        found = cache.get_many(entity, fm_ids)
+        missing = fm_ids - set(found)
+        if not missing:
+            return found
+
+        self.env.cr.execute(
+            "SELECT fm_id, res_id FROM forcemanager_id_map WHERE entity_type = %s AND fm_id = ANY(%s)",
+            (entity, list(missing)),
+        )
+        from_table = dict(self.env.cr.fetchall())
+        cache.put_many(entity, from_table.items())
+        found.update(from_table)
+        missing -= set(from_table)
+        if missing:
+            legacy = self._legacy_res_ids(entity, missing)
+            if legacy:
+                self._link_many(entity, legacy.items())
+                found.update(legacy)
+        return found
+
+    @api.model
+    def _get_res_id(self, entity, fm_id):
+        """Versión para un único ID; devuelve el ID Odoo o False."""
+        fm_ids = self._clean_fm_ids([fm_id])
+        if not fm_ids:
+            return False
+        return self._get_res_ids(entity, fm_ids).get(fm_ids.pop(), False)
+
+    @api.model
+    def _get_fm_ids(self, entity, res_ids):
+        """
+        ID Odoo => FM ID (sentido Odoo → ForceManager). Devuelve {res_id: fm_id(int)}.
+        """
+        res_ids = {rid for rid in res_ids or [] if rid}
+        if not res_ids:
+            return {}
+        self.env.cr.execute(
+            "SELECT res_id, fm_id FROM forcemanager_id_map WHERE entity_type = %s AND res_id = ANY(%s)",
+            (entity, list(res_ids)),
+        )
+        found = dict(self.env.cr.fetchall())
+        missing = res_ids - set(found)
+        if missing:
+            model_name, _domain, columns = FM_ENTITY_SPECS[entity]
+            rows = self.env[model_name].browse(list(missing)).exists().read([col for col, _type in columns])
+            legacy = {}
+            for row in rows:
+                fm_id = self._first_fm_id(row, columns)
+                if fm_id:
+                    legacy[fm_id] = row['id']
+            if legacy:
+                self._link_many(entity, legacy.items())
+                found.update({res_id: fm_id for fm_id, res_id in legacy.items()})
+        return found
+
+    @api.model
+    def _legacy_res_ids(self, entity, fm_ids):
+        """Busca en las columnas legacy (forcemanager_id...) los IDs de FM que faltan en el mapeo."""
+        model_name, extra_domain, columns = FM_ENTITY_SPECS[entity]
+        domain = []
+        for col, col_type in columns:
+            if domain:
+                domain.insert(0, '|')
+            domain.append((col, 'in', [col_type(fm_id) for fm_id in fm_ids]))
+        rows = self.env[model_name].search_read(extra_domain + domain, [col for col, _type in columns])
+        legacy = {}
+        for row in rows:
+            for col, _col_type in columns:
+                fm_id = self._clean_fm_ids([row[col]])
+                fm_id = fm_id.pop() if fm_id else 0
+                if fm_id in fm_ids:
+                    legacy.setdefault(fm_id, row['id'])
+        return legacy
+
+    @api.model
+    def _first_fm_id(self, row, columns):
+        for col, _col_type in columns:
+            fm_id = self._clean_fm_ids([row[col]])
+            if fm_id:
+                return fm_id.pop()
+        return 0
+
+    # -------------------------------------------------------------------------
+    # Altas / bajas
+    # -------------------------------------------------------------------------
+    @api.model
+    def _link_many(self, entity, pairs):
+        """
+        Enlaza (o re-enlaza) en bloque pares (fm_id, res_id) con un único
+        INSERT ... ON CONFLICT sobre el índice único (entity_type, fm_id).
+        """
+        model_name = FM_ENTITY_SPECS[entity][0]
+        rows = {}
+        for fm_id, res_id in pairs:
+            fm_id = self._clean_fm_ids([fm_id])
+            if fm_id and res_id:
+                rows[fm_id.pop()] = res_id
+        if not rows:
+            return
+        values_sql = ", ".join(["(%s, %s, %s, %s)"] * len(rows))
+        params = []
+        for fm_id, res_id in rows.items():
+            params.extend([entity, fm_id, model_name, res_id])
+        # xmax <> 0 => la fila ya existía (re-enlace): hay que invalidar en los demás workers
+        self.env.cr.execute(
+            f"""INSERT INTO forcemanager_id_map (entity_type, fm_id, res_model, res_id)
+                VALUES {values_sql}
+                ON CONFLICT (entity_type, fm_id)
+                DO UPDATE SET res_model = EXCLUDED.res_model, res_id = EXCLUDED.res_id
+                RETURNING (xmax <> 0)""",
+            params,
+        )
+        if any(relinked for (relinked,) in self.env.cr.fetchall()):
+            self._schedule_generation_bump()
+        self._id_cache().put_many(entity, rows.items())
+
+    @api.model
+    def _link(self, entity, fm_id, res_id):
+        self._link_many(entity, [(fm_id, res_id)])
+
+    @api.model
+    def _forget(self, res_model, res_ids):
+        """Elimina los enlaces de registros Odoo borrados o desvinculados de ForceManager."""
+        if not res_ids:
+            return
+        self.env.cr.execute(
+            "DELETE FROM forcemanager_id_map WHERE res_model = %s AND res_id = ANY(%s) "
+            "RETURNING entity_type, fm_id",
+            (res_model, list(res_ids)),
+        )
+        removed = self.env.cr.fetchall()
+        if removed:
+            self._id_cache().evict(removed)
+            self._schedule_generation_bump()
+
+    @api.model
+    def _get_link_fields(self, model_name):
+        """Campos de `model_name` que, al cambiar, obligan a recalcular sus enlaces."""
+        fields_set = set()
+        for spec_model, extra_domain, columns in FM_ENTITY_SPECS.values():
+            if spec_model == model_name:
+                fields_set.update(col for col, _type in columns)
+                fields_set.update(leaf[0] for leaf in extra_domain)
+        return fields_set
+
+    @api.model
+    def _refresh_links_on_write(self, records, vals):
+        """
+        Llamado desde los write() de los modelos enlazados: si cambia el ID de FM
+        (p.ej. al asignar el ID devuelto por un POST o al borrarlo), recalcula los
+        enlaces de `records` desde sus columnas legacy.
+        Las escrituras de la sincronización FM → Odoo (contexto sync_from_forcemanager)
+        ya enlazan explícitamente y se omiten.
+        """
+        if not records or self.env.context.get('sync_from_forcemanager'):
+            return
+        if not self._get_link_fields(records._name).intersection(vals):
+            return
+        self._forget(records._name, records.ids)
+        self._link_records(records)
+
+    @api.model
+    def _link_records(self, records):
+        """Enlaza `records` desde sus columnas legacy (una lectura y un `_link_many` por entidad)."""
+        for entity, (model_name, extra_domain, columns) in FM_ENTITY_SPECS.items():
+            if model_name != records._name:
+                continue
+            targets = records.filtered_domain(extra_domain) if extra_domain else records
+            rows = targets.read([col for col, _type in columns])
+            self._link_many(entity, [(self._first_fm_id(row, columns), row['id']) for row in rows])
+
+    @api.model
+    def _backfill_from_legacy_columns(self):
+        """
+        Rellena el mapeo con todos los IDs de FM que ya existen en las columnas
+        legacy (p.ej. tras instalar/actualizar el módulo).
+        """
+        for entity, (model_name, extra_domain, columns) in FM_ENTITY_SPECS.items():
+            domain = []
+            for col, _col_type in columns:
+                if domain:
+                    domain.insert(0, '|')
+                domain.append((col, '!=', False))
+            rows = self.env[model_name].with_context(active_test=False).search_read(
+                extra_domain + domain, [col for col, _type in columns]
+            )
+            self._link_many(entity, [(self._first_fm_id(row, columns), row['id']) for row in rows])
+            _logger.info("[forcemanager.id.map] %s: %d enlaces cargados desde %s.", entity, len(rows), model_name)
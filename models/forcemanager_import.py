@@ -2,18 +2,141 @@
 import logging
 from odoo import models, fields, api
 
+from .forcemanager_api import ForceManagerRequestError
+from .forcemanager_logging import log_sampled
+from .forcemanager_tools import FM_SYNC_CONTEXT, normalize_email, normalize_vat
+
 _logger = logging.getLogger(__name__)
 
+
 class ForceManagerImport(models.TransientModel):
     """
     Modelo auxiliar para importar datos desde ForceManager a Odoo,
     aplicando la lógica de "no sobrescribir si ya existe con el mismo ID",
     "actualizar si coincide un campo clave pero forcemanager_id está vacío",
     "crear nuevo si no coincide nada".
+
+    Para que una carga inicial grande no haga dos búsquedas por registro, cada
+    importación construye UNA vez un índice en memoria (IDs de FM ya enlazados,
+    NIF normalizado, email en minúsculas o nombre de la oportunidad) y decide
+    crear/actualizar/saltar página a página contra ese índice.
     """
     _name = 'forcemanager.import'
     _description = 'Importaciones ForceManager → Odoo (Empresas, Contactos, Oportunidades)'
 
+    # -------------------------------------------------------------------------
+    # Índices de matching
+    # -------------------------------------------------------------------------
+    @api.model
+    def _build_partner_match_index(self, is_company, key_field):
+        """
+        Lee de una vez los partners (empresas o contactos) y devuelve:
+        - 'fm_ids': set de forcemanager_id ya enlazados.
+        - 'by_key': {clave normalizada: [id, forcemanager_id]} con el primer partner
+          (en el orden por defecto de res.partner) para cada NIF/email.
+        key_field es la columna normalizada e indexada (fm_vat_normalized / fm_email_normalized).
+        """
+        rows = self.env['res.partner'].search_read(
+            [('is_company', '=', is_company)],
+            ['forcemanager_id', key_field],
+        )
+        index = {'fm_ids': set(), 'by_key': {}}
+        for row in rows:
+            if row['forcemanager_id']:
+                index['fm_ids'].add(row['forcemanager_id'])
+            key = row[key_field]
+            if key:
+                index['by_key'].setdefault(key, [row['id'], row['forcemanager_id']])
+        _logger.info(
+            "[forcemanager.import] Índice de partners (is_company=%s): %d FM IDs, %d claves por %s.",
+            is_company, len(index['fm_ids']), len(index['by_key']), key_field
+        )
+        return index
+
+    @api.model
+    def _build_lead_match_index(self):
+        """
+        Índice de crm.lead:
+        - 'fm_ids': set de forcemanager_id (texto) ya enlazados.
+        - 'by_name': {name: id} de las oportunidades SIN forcemanager_id.
+        """
+        rows = self.env['crm.lead'].search_read([], ['forcemanager_id', 'name'])
+        index = {'fm_ids': set(), 'by_name': {}}
+        for row in rows:
+            if row['forcemanager_id']:
+                index['fm_ids'].add(row['forcemanager_id'])
+            elif row['name']:
+                index['by_name'].setdefault(row['name'], row['id'])
+        _logger.info(
+            "[forcemanager.import] Índice de oportunidades: %d FM IDs, %d nombres sin enlazar.",
+            len(index['fm_ids']), len(index['by_name'])
+        )
+        return index
+
+    @api.model
+    def _import_partner_page(self, page, index, parse_record, is_company, label):
+        """
+        Aplica a una página las reglas de importación de partners contra el índice:
+        1) forcemanager_id ya enlazado => saltar.
+        2) Coincide la clave (NIF/email) y ese partner no tiene forcemanager_id => actualizar.
+           Si ya tiene forcemanager_id => saltar.
+        3) Si no => crear (un único create() por página).
+        parse_record(fm_rec) devuelve (fm_id, clave_normalizada, vals_update, vals_create).
+        """
+        Partner = self.env['res.partner'].with_context(**FM_SYNC_CONTEXT)
+        IdMap = self.env['forcemanager.id.map']
+        entity = 'account' if is_company else 'contact'
+        to_create = []
+        stats = {'skipped': 0, 'updated': 0, 'created': 0}
+        for fm_rec in page:
+            fm_id, key, vals_update, vals_create = parse_record(fm_rec)
+
+            # 1) Si existe partner con forcemanager_id = fm_id => NO tocar
+            if fm_id and fm_id in index['fm_ids']:
+                stats['skipped'] += 1
+                continue
+
+            # 2) Si coincide la clave y forcemanager_id vacío => actualizar
+            match = index['by_key'].get(key) if key else None
+            if match:
+                partner_id, partner_fm_id = match
+                if partner_id and not partner_fm_id:
+                    log_sampled(_logger, label,
+                                "[%s] Partner ID=%d coincide por clave '%s' sin forcemanager_id. Actualizando...",
+                                label, partner_id, key)
+                    Partner.browse(partner_id).write(vals_update)
+                    IdMap._link(entity, fm_id, partner_id)
+                    match[1] = fm_id
+                    stats['updated'] += 1
+                else:
+                    stats['skipped'] += 1
+                if fm_id:
+                    index['fm_ids'].add(fm_id)
+                continue
+
+            # 3) Si no coincide => creamos nuevo
+            to_create.append(vals_create)
+            if fm_id:
+                index['fm_ids'].add(fm_id)
+            if key:
+                # Reservamos la clave para no crear duplicados dentro de la misma ejecución
+                index['by_key'][key] = [0, fm_id]
+
+        if to_create:
+            new_partners = Partner.create(to_create)
+            stats['created'] = len(new_partners)
+            IdMap._link_many(entity, [(vals.get('forcemanager_id'), partner.id)
+                                      for partner, vals in zip(new_partners, to_create)])
+            for partner, vals in zip(new_partners, to_create):
+                key = normalize_vat(vals.get('vat')) if is_company else normalize_email(vals.get('email'))
+                if key:
+                    index['by_key'][key] = [partner.id, vals.get('forcemanager_id')]
+        _logger.info("[%s] Página de %d registros: %s", label, len(page), stats)
+        return stats
+
+    # -------------------------------------------------------------------------
+    # Importaciones
+    # -------------------------------------------------------------------------
     @api.model
     def import_companies_from_forcemanager(self):
         """
@@ -24,56 +147,17 @@ class ForceManagerImport(models.TransientModel):
         """
         _logger.info("Iniciando import_companies_from_forcemanager()...")
 
-        response = self.env['forcemanager.api']._perform_request('accounts', method='GET')
-        if not response:
-            _logger.warning("No hay respuesta o error en /accounts")
-            return
-
-        fm_account_list = response if isinstance(response, list) else response.get('results', [])
-        _logger.info("Recibidos %d registros de ForceManager (accounts).", len(fm_account_list))
-
-        for fm_acc in fm_account_list:
+        def parse_account(fm_acc):
             fm_id = fm_acc.get('id')                 # ID de ForceManager
             nif = (fm_acc.get('Z_nif') or "").strip() # Ejemplo: campo 'Z_nif' en ForceManager
             name = fm_acc.get('name') or "(Sin nombre)"
-
-            # 1) Si existe partner con forcemanager_id = fm_id => NO tocar
-            if fm_id:
-                existing_fm_id = self.env['res.partner'].search([
-                    ('forcemanager_id', '=', fm_id),
-                    ('is_company', '=', True),
-                ], limit=1)
-                if existing_fm_id:
-                    _logger.info("Socio [FM ID=%s] ya existe (ID=%d). Saltando...", fm_id, existing_fm_id.id)
-                    continue
-
-            # 2) Si coincide NIF y forcemanager_id vacío => actualizar
-            existing_by_nif = False
-            if nif:
-                existing_by_nif = self.env['res.partner'].search([
-                    ('vat', '=', nif),
-                    ('is_company', '=', True),
-                ], limit=1)
-                if existing_by_nif and not existing_by_nif.forcemanager_id:
-                    _logger.info("Encontrado partner con NIF=%s (ID=%d) sin forcemanager_id. Actualizando...", 
-                                 nif, existing_by_nif.id)
-                    # Actualizamos (por ejemplo, nombre, forcemanager_id)
-                    vals_update = {
-                        'name': name,
-                        'forcemanager_id': fm_id or False,
-                        'synced_with_forcemanager': True,
-                        # Mapea más campos aquí (phone, city...) si quieres.
-                    }
-                    existing_by_nif.write(vals_update)
-                    continue
-                elif existing_by_nif:
-                    # Si existe con el mismo NIF pero YA tiene un forcemanager_id => no tocamos
-                    _logger.info("Encontrado partner con NIF=%s (ID=%d) pero ya con forcemanager_id=%s. Saltamos.",
-                                 nif, existing_by_nif.id, existing_by_nif.forcemanager_id)
-                    continue
-
-            # 3) Si no coincide => creamos nuevo
-            new_vals = {
+            vals_update = {
+                'name': name,
+                'forcemanager_id': fm_id or False,
+                'synced_with_forcemanager': True,
+                # Mapea más campos aquí (phone, city...) si quieres.
+            }
+            vals_create = {
                 'is_company': True,
                 'forcemanager_id': fm_id or False,
                 'name': name,
@@ -81,11 +165,22 @@ class ForceManagerImport(models.TransientModel):
                 'synced_with_forcemanager': True,
                 # Mapea más campos (phone, city...) si procede
             }
-            new_partner = self.env['res.partner'].create(new_vals)
-            _logger.info("Creado nuevo partner ID=%d con FM ID=%s / NIF=%s", 
-                         new_partner.id, fm_id, nif)
+            return fm_id, normalize_vat(nif), vals_update, vals_create
 
-        _logger.info("Finalizado import_companies_from_forcemanager().")
+        index = self._build_partner_match_index(True, 'fm_vat_normalized')
+        total = 0
+        try:
+            for page in self.env['forcemanager.api']._iter_pages('accounts'):
+                total += len(page)
+                self._import_partner_page(page, index, parse_account, True, 'import_companies')
+        except ForceManagerRequestError as e:
+            _logger.error("[import_companies] Lectura de /accounts interrumpida tras %d registros: %s", total, e)
+            return
+        if not total:
+            _logger.warning("No hay respuesta o error en /accounts")
+            return
+
+        _logger.info("Finalizado import_companies_from_forcemanager(): %d registros de ForceManager.", total)
 
 
     @api.model
@@ -98,55 +193,18 @@ class ForceManagerImport(models.TransientModel):
         """
         _logger.info("Iniciando import_contacts_from_forcemanager()...")
 
-        response = self.env['forcemanager.api']._perform_request('contacts', method='GET')
-        if not response:
-            _logger.warning("No hay respuesta o error en /contacts")
-            return
-
-        fm_contact_list = response if isinstance(response, list) else response.get('results', [])
-        _logger.info("Recibidos %d registros de ForceManager (contacts).", len(fm_contact_list))
-
-        for fm_ctc in fm_contact_list:
+        def parse_contact(fm_ctc):
             fm_id = fm_ctc.get('id')        # ID ForceManager
             email = (fm_ctc.get('email') or "").strip()
             first_name = fm_ctc.get('firstName') or ""
             last_name = fm_ctc.get('lastName') or ""
             full_name = (first_name + " " + last_name).strip() or "(Sin nombre)"
-
-            # 1) Si ya existe un partner con forcemanager_id => no tocar
-            if fm_id:
-                existing_fm_id = self.env['res.partner'].search([
-                    ('forcemanager_id', '=', fm_id),
-                    ('is_company', '=', False),
-                ], limit=1)
-                if existing_fm_id:
-                    _logger.info("Contacto [FM ID=%s] ya existe (ID=%d). Saltando...", fm_id, existing_fm_id.id)
-                    continue
-
-            # 2) Si coincide email y forcemanager_id vacío => actualizar
-            existing_by_email = False
-            if email:
-                existing_by_email = self.env['res.partner'].search([
-                    ('email','=', email),
-                    ('is_company','=', False),
-                ], limit=1)
-                if existing_by_email and not existing_by_email.forcemanager_id:
-                    _logger.info("Contacto con email=%s (ID=%d) sin forcemanager_id. Actualizando...",
-                                 email, existing_by_email.id)
-                    vals_update = {
-                        'name': full_name,
-                        'forcemanager_id': fm_id or False,
-                        'synced_with_forcemanager': True,
-                        # Añade más campos si lo deseas (phone, etc.)
-                    }
-                    existing_by_email.write(vals_update)
-                    continue
-                elif existing_by_email:
-                    _logger.info("Contacto con email=%s (ID=%d) ya tiene forcemanager_id=%s. Saltamos.",
-                                 email, existing_by_email.id, existing_by_email.forcemanager_id)
-                    continue
-
-            # 3) Crear uno nuevo
+            vals_update = {
+                'name': full_name,
+                'forcemanager_id': fm_id or False,
+                'synced_with_forcemanager': True,
+                # Añade más campos si lo deseas (phone, etc.)
+            }
             vals_create = {
                 'is_company': False,
                 'forcemanager_id': fm_id or False,
@@ -154,10 +212,22 @@ class ForceManagerImport(models.TransientModel):
                 'email': email,
                 'synced_with_forcemanager': True,
             }
-            new_contact = self.env['res.partner'].create(vals_create)
-            _logger.info("Creado contacto ID=%d, FM ID=%s, email=%s", new_contact.id, fm_id, email)
+            return fm_id, normalize_email(email), vals_update, vals_create
+
+        index = self._build_partner_match_index(False, 'fm_email_normalized')
+        total = 0
+        try:
+            for page in self.env['forcemanager.api']._iter_pages('contacts'):
+                total += len(page)
+                self._import_partner_page(page, index, parse_contact, False, 'import_contacts')
+        except ForceManagerRequestError as e:
+            _logger.error("[import_contacts] Lectura de /contacts interrumpida tras %d registros: %s", total, e)
+            return
+        if not total:
+            _logger.warning("No hay respuesta o error en /contacts")
+            return
 
-        _logger.info("Finalizado import_contacts_from_forcemanager().")
+        _logger.info("Finalizado import_contacts_from_forcemanager(): %d registros de ForceManager.", total)
 
 
     @api.model
@@ -170,50 +240,58 @@ class ForceManagerImport(models.TransientModel):
         """
         _logger.info("Iniciando import_opportunities_from_forcemanager()...")
 
-        response = self.env['forcemanager.api']._perform_request('opportunities', method='GET')
-        if not response:
-            _logger.warning("No hay respuesta o error en /opportunities")
-            return
+        Lead = self.env['crm.lead'].with_context(**FM_SYNC_CONTEXT)
+        IdMap = self.env['forcemanager.id.map']
+        index = self._build_lead_match_index()
+        total = 0
+        try:
+            for page in self.env['forcemanager.api']._iter_pages('opportunities'):
+                total += len(page)
+                to_create = []
+                stats = {'skipped': 0, 'updated': 0, 'created': 0}
+                for fm_opp in page:
+                    fm_id = fm_opp.get('id')     # ID ForceManager
+                    fm_key = str(fm_id) if fm_id else False
+                    ref_name = fm_opp.get('reference') or "(Opp sin nombre)"
 
-        fm_opp_list = response if isinstance(response, list) else response.get('results', [])
-        _logger.info("Recibidos %d registros de ForceManager (opportunities).", len(fm_opp_list))
+                    # 1) Si hay un lead con forcemanager_id => no tocar
+                    if fm_key and fm_key in index['fm_ids']:
+                        stats['skipped'] += 1
+                        continue
 
-        for fm_opp in fm_opp_list:
-            fm_id = fm_opp.get('id')     # ID ForceManager
-            ref_name = fm_opp.get('reference') or "(Opp sin nombre)"
+                    # 2) Si coincide name y forcemanager_id vacío => actualizar
+                    lead_id = index['by_name'].pop(ref_name, False)
+                    if lead_id:
+                        Lead.browse(lead_id).write({
+                            'forcemanager_id': fm_id or False,
+                            'synced_with_forcemanager': True,
+                            # Mapea más campos que quieras (probability, user_id...) si quieres
+                        })
+                        IdMap._link('opportunity', fm_id, lead_id)
+                        stats['updated'] += 1
+                    else:
+                        # 3) Crear una nueva
+                        to_create.append({
+                            'name': ref_name,
+                            'forcemanager_id': fm_id or False,
+                            'synced_with_forcemanager': True,
+                        })
+                    if fm_key:
+                        index['fm_ids'].add(fm_key)
 
-            # 1) Si hay un lead con forcemanager_id => no tocar
-            if fm_id:
-                existing_fm = self.env['crm.lead'].search([
-                    ('forcemanager_id','=', fm_id)
-                ], limit=1)
-                if existing_fm:
-                    _logger.info("Oportunidad [FM ID=%s] ya existe (ID=%d). Saltando...", fm_id, existing_fm.id)
-                    continue
-
-            # 2) Si coincide name y forcemanager_id vacío => actualizar
-            existing_by_name = self.env['crm.lead'].search([
-                ('name','=', ref_name),
-                ('forcemanager_id','=', False),
-            ], limit=1)
-            if existing_by_name:
-                _logger.info("Oportunidad con name='%s' (ID=%d) sin forcemanager_id. Actualizando...",
-                             ref_name, existing_by_name.id)
-                vals_update = {
-                    'forcemanager_id': fm_id or False,
-                    'synced_with_forcemanager': True,
-                    # Mapea más campos que quieras (probability, user_id...) si quieres
-                }
-                existing_by_name.write(vals_update)
-                continue
+                if to_create:
+                    new_leads = Lead.create(to_create)
+                    IdMap._link_many('opportunity', [(vals['forcemanager_id'], lead.id)
+                                                     for lead, vals in zip(new_leads, to_create)])
+                    stats['created'] = len(new_leads)
+                _logger.info("[import_opportunities] Página de %d registros: %s", len(page), stats)
+        except ForceManagerRequestError as e:
+            _logger.error("[import_opportunities] Lectura de /opportunities interrumpida tras %d registros: %s",
+                          total, e)
+            return
 
-            # 3) Crear una nueva
-            vals_create = {
-                'name': ref_name,
-                'forcemanager_id': fm_id or False,
-                'synced_with_forcemanager': True,
-            }
-            new_lead = self.env['crm.lead'].create(vals_create)
-            _logger.info("Creada oportunidad ID=%d con FM ID=%s, nombre='%s'", new_lead.id, fm_id, ref_name)
+        if not total:
+            _logger.warning("No hay respuesta o error en /opportunities")
+            return
 
-        _logger.info("Finalizado import_opportunities_from_forcemanager().")
+        _logger.info("Finalizado import_opportunities_from_forcemanager(): %d registros de ForceManager.", total)
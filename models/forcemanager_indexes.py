@@ -0,0 +1,114 @@
+# models/forcemanager_indexes.py
+
+import logging
+from odoo import api, models
+
+_logger = logging.getLogger(__name__)
+
+# Predicado con la misma forma que genera el ORM para ('synced_with_forcemanager', '=', False),
+# para que PostgreSQL pueda demostrar que la consulta implica el índice parcial.
+_UNSYNCED_PREDICATE = "(synced_with_forcemanager IS NULL OR synced_with_forcemanager = false)"
+
+# (nombre, tabla, columnas, where)
+FM_INDEXES = [
+    # Búsquedas por forcemanager_id = X AND is_company = T/F (cuentas vs contactos)
+    ('res_partner_fm_id_company_idx', 'res_partner', '(forcemanager_id, is_company)', ''),
+    # Selección de pendientes de enviar (Odoo → FM)
+    ('res_partner_fm_unsynced_idx', 'res_partner', '(is_company)', _UNSYNCED_PREDICATE),
+    ('crm_lead_fm_unsynced_idx', 'crm_lead', '(id)', _UNSYNCED_PREDICATE),
+    ('sale_order_fm_unsynced_idx', 'sale_order', '(id)', _UNSYNCED_PREDICATE),
+    ('product_template_fm_unsynced_idx', 'product_template', '(categ_id)', _UNSYNCED_PREDICATE),
+    # product.product.forcemanager_id se resuelve sobre product_template: solo filas enlazadas
+    ('product_template_fm_id_linked_idx', 'product_template', '(forcemanager_id, id)',
+     "forcemanager_id IS NOT NULL"),
+    # Provincia por país + nombre normalizado
+    ('res_country_state_fm_name_idx', 'res_country_state', '(country_id, fm_name_normalized)', ''),
+]
+
+
+class ForceManagerDbIndex(models.AbstractModel):
+    """
+    Índices compuestos/parciales adaptados a las consultas de la sincronización,
+    y una comprobación con EXPLAIN de que cada búsqueda del motor usa un índice.
+
+    Cada modelo llama a `_ensure_indexes(tabla)` desde su init(), es decir, al
+    instalar/actualizar el módulo y justo después de crear sus columnas.
+    """
+    _name = 'forcemanager.db.index'
+    _description = 'Índices de base de datos para la sincronización ForceManager'
+
+    @api.model
+    def _ensure_indexes(self, table):
+        for name, index_table, columns, where in FM_INDEXES:
+            if index_table != table:
+                continue
+            query = f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" {columns}'
+            if where:
+                query += f' WHERE {where}'
+            self.env.cr.execute(query)
+
+    @api.model
+    def _get_lookup_domains(self):
+        """
+        Búsquedas que hace el motor de sincronización (modelo, descripción, dominio).
+        El SQL se obtiene del propio ORM, así la comprobación sigue siendo válida
+        si cambia la forma en que Odoo traduce los dominios.
+        """
+        return [
+            ('forcemanager.id.map', 'mapeo FM ID => Odoo', [('entity_type', '=', 'account'), ('fm_id', 'in', [1, 2])]),
+            ('forcemanager.id.map', 'mapeo Odoo => FM ID', [('entity_type', '=', 'account'), ('res_id', 'in', [1, 2])]),
+            ('res.partner', 'cuenta por forcemanager_id', [('forcemanager_id', 'in', [1, 2]), ('is_company', '=', True)]),
+            ('res.partner', 'contacto por forcemanager_id', [('forcemanager_id', 'in', [1, 2]), ('is_company', '=', False)]),
+            ('res.partner', 'cuentas sin sincronizar', [('is_company', '=', True), ('synced_with_forcemanager', '=', False)]),
+            ('res.partner', 'partner por NIF normalizado', [('fm_vat_normalized', '=', 'X')]),
+            ('res.partner', 'partner por email normalizado', [('fm_email_normalized', '=', 'x')]),
+            ('res.users', 'comercial por forcemanager_id', [('forcemanager_id', '=', 1)]),
+            ('crm.lead', 'oportunidad por forcemanager_opportunity_id', [('forcemanager_opportunity_id', 'in', [1, 2])]),
+            ('crm.lead', 'oportunidades sin sincronizar', [('synced_with_forcemanager', '=', False)]),
+            ('sale.order', 'pedido por forcemanager_id', [('forcemanager_id', '=', '1')]),
+            ('sale.order', 'pedidos sin sincronizar', [('synced_with_forcemanager', '=', False)]),
+            ('product.product', 'producto por forcemanager_id', [('forcemanager_id', 'in', ['1', '2'])]),
+            ('product.template', 'productos sin sincronizar', [('synced_with_forcemanager', '=', False)]),
+            ('product.category', 'categoría por forcemanager_id', [('forcemanager_id', 'in', ['1', '2'])]),
+            ('res.country', 'país por forcemanager_id', [('forcemanager_id', '=', 1)]),
+            ('res.country.state', 'provincia por nombre normalizado', [('country_id', '=', 1), ('fm_name_normalized', '=', 'x')]),
+        ]
+
+    @api.model
+    def check_lookup_indexes(self):
+        """
+        Ejecuta EXPLAIN (con enable_seqscan desactivado, para que el resultado no
+        dependa del tamaño actual de las tablas) sobre cada búsqueda de
+        `_get_lookup_domains` y devuelve una lista de dicts:
+            {'model', 'lookup', 'index_backed', 'plan'}
+        Las búsquedas que acaban en 'Seq Scan' se registran como warning.
+        Al terminar, enable_seqscan vuelve al valor que tenía (no se fuerza a 'on').
+        """
+        cr = self.env.cr
+        results = []
+        cr.execute("SELECT current_setting('enable_seqscan')")
+        previous = cr.fetchone()[0]
+        cr.execute("SET LOCAL enable_seqscan = off")
+        try:
+            for model_name, label, domain in self._get_lookup_domains():
+                Model = self.env[model_name].with_context(active_test=False)
+                query_str, params = Model._search(domain).select()
+                cr.execute("EXPLAIN " + query_str, params)
+                plan = "\n".join(row[0] for row in cr.fetchall())
+                index_backed = 'Seq Scan' not in plan
+                results.append({
+                    'model': model_name,
+                    'lookup': label,
+                    'index_backed': index_backed,
+                    'plan': plan,
+                })
+                if not index_backed:
+                    _logger.warning("[check_lookup_indexes] %s (%s) NO usa índice:\n%s", model_name, label, plan)
+        finally:
+            cr.execute("SELECT set_config('enable_seqscan', %s, true)", (previous,))
+
+        _logger.info(
+            "[check_lookup_indexes] %d de %d búsquedas usan índice.",
+            sum(1 for r in results if r['index_backed']), len(results)
+        )
+        return results
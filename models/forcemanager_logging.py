@@ -0,0 +1,69 @@
+# models/forcemanager_logging.py
+"""
+Utilidades de log de la integración, pensadas para que una sincronización grande
+a nivel INFO apenas cueste nada:
+- LazyBody: el resumen de un cuerpo (tamaño, hash y comienzo truncado) solo se
+  calcula si el mensaje llega a emitirse.
+- log_sampled: mensajes por registro muestreados por entidad (el primero y uno de
+  cada N); a nivel DEBUG se emiten todos.
+Siempre con formato '%' para que el logging no formatee lo que descarta.
+"""
+
+import hashlib
+import logging
+import threading
+
+# Bytes del cuerpo que se muestran en el log (el resto solo cuenta para tamaño y hash)
+BODY_LOG_LIMIT = 500
+# Por defecto, uno de cada N mensajes por registro de cada entidad
+DEFAULT_SAMPLE_EVERY = 100
+
+_sample_lock = threading.Lock()
+_sample_counts = {}
+_sample_every = DEFAULT_SAMPLE_EVERY
+
+
+def body_summary(body, limit=BODY_LOG_LIMIT):
+    """'<N bytes md5=...> comienzo…' de un cuerpo (bytes, str u objeto)."""
+    if body is None:
+        return '-'
+    if isinstance(body, bytes):
+        raw = body
+    else:
+        raw = (body if isinstance(body, str) else repr(body)).encode('utf-8')
+    digest = hashlib.md5(raw).hexdigest()[:12]
+    text = raw[:limit].decode('utf-8', 'replace')
+    return "<%d bytes md5=%s> %s%s" % (len(raw), digest, text, '…' if len(raw) > limit else '')
+
+
+class LazyBody:
+    """Argumento de log: se resume (body_summary) solo al formatear el mensaje."""
+    __slots__ = ('body', 'limit')
+
+    def __init__(self, body, limit=BODY_LOG_LIMIT):
+        self.body = body
+        self.limit = limit
+
+    def __str__(self):
+        return body_summary(self.body, self.limit)
+
+
+def set_sample_every(every):
+    """Configura el muestreo (se llama al empezar cada sincronización)."""
+    global _sample_every
+    _sample_every = max(int(every or 1), 1)
+
+
+def log_sampled(logger, entity, msg, *args, level=logging.INFO):
+    """
+    Log por registro muestreado por entidad: se emite el primero y uno de cada
+    N (ver set_sample_every). Si el logger está en DEBUG se emiten todos.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    with _sample_lock:
+        count = _sample_counts[entity] = _sample_counts.get(entity, 0) + 1
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.log(level, msg, *args)
+    elif count == 1 or count % _sample_every == 0:
+        logger.log(level, msg + " [%s: mensaje %d, 1 de cada %d]", *args, entity, count, _sample_every)
@@ -0,0 +1,279 @@
+# models/forcemanager_outbox.py
+
+import logging
+
+from psycopg2.extras import execute_values
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+# Campos de control de la propia integración: escribirlos no es un cambio que haya que enviar a FM.
+FM_BOOKKEEPING_FIELDS = {
+    'synced_with_forcemanager', 'forcemanager_id', 'forcemanager_opportunity_id',
+    'forcemanager_salesrep_id', 'forcemanager_country_id', 'forcemanager_country',
+    'forcemanager_status', 'forcemanager_stage', 'fm_vat_normalized', 'fm_email_normalized',
+}
+
+# Envíos Odoo → ForceManager (en el orden en que se ejecutan) y modelo de cada uno
+OUTBOUND_ENTITY_MODELS = {
+    'accounts': 'res.partner',
+    'contacts': 'res.partner',
+    'products': 'product.template',
+    'opportunities': 'crm.lead',
+    'orders': 'sale.order',
+}
+# Por defecto solo se envían productos (forcemanager_integration.outbound_entities)
+DEFAULT_OUTBOUND_ENTITIES = 'products'
+
+
+class ForceManagerOutbox(models.Model):
+    """
+    Cola (outbox) de cambios Odoo → ForceManager.
+
+    Los write()/create() de partners, oportunidades, productos, pedidos y los
+    movimientos de stock añaden una fila compacta (modelo, id, campos). El cron de
+    salida lee la cola en orden en lugar de buscar con el triple OR de
+    `_build_domain_for_odoo2fm`, de modo que el coste crece con los cambios reales
+    y no con el tamaño de las tablas.
+
+    changed_fields vacío significa "registro completo" (altas y carga inicial).
+
+    Solo se encolan los modelos de los envíos activos
+    (forcemanager_integration.outbound_entities); `_purge` elimina lo que no va a
+    consumir nadie.
+    """
+    _name = 'forcemanager.outbox'
+    _description = 'Cola de cambios Odoo → ForceManager'
+    _order = 'id'
+    _log_access = False
+
+    res_model = fields.Char(string='Modelo', required=True)
+    res_id = fields.Integer(string='ID Odoo', required=True)
+    changed_fields = fields.Char(string='Campos modificados')
+    enqueued_at = fields.Datetime(string='Encolado el', required=True)
+    attempts = fields.Integer(string='Envíos fallidos')
+    last_error = fields.Char(string='Último error')
+
+    def init(self):
+        super().init()
+        self.env.cr.execute(
+            'CREATE INDEX IF NOT EXISTS "forcemanager_outbox_model_id_idx" '
+            'ON "forcemanager_outbox" (res_model, id)'
+        )
+
+    # -------------------------------------------------------------------------
+    # Configuración
+    # -------------------------------------------------------------------------
+    @api.model
+    def _get_outbound_entities(self):
+        """
+        Envíos activos, en orden de ejecución, según forcemanager_integration.outbound_entities
+        (lista separada por comas de OUTBOUND_ENTITY_MODELS, por defecto 'products').
+        """
+        value = self.env['ir.config_parameter'].sudo().get_param(
+            'forcemanager_integration.outbound_entities', DEFAULT_OUTBOUND_ENTITIES
+        )
+        names = {name.strip() for name in (value or '').split(',') if name.strip()}
+        unknown = names - OUTBOUND_ENTITY_MODELS.keys()
+        if unknown:
+            _logger.warning("[forcemanager.outbox] outbound_entities desconocidas (se ignoran): %s", sorted(unknown))
+        return [entity for entity in OUTBOUND_ENTITY_MODELS if entity in names]
+
+    @api.model
+    def _tracked_models(self):
+        """Modelos con algún envío activo: los únicos que se encolan."""
+        return {OUTBOUND_ENTITY_MODELS[entity] for entity in self._get_outbound_entities()}
+
+    @api.model
+    def _get_batch_size(self):
+        """Filas de la cola que se leen (y bloquean) por lote (forcemanager_integration.outbox_batch_size, 500)."""
+        value = self.env['ir.config_parameter'].sudo().get_param('forcemanager_integration.outbox_batch_size', '500')
+        try:
+            return max(int(value), 1)
+        except (TypeError, ValueError):
+            return 500
+
+    # -------------------------------------------------------------------------
+    # Encolar
+    # -------------------------------------------------------------------------
+    @api.model
+    def _enqueue(self, res_model, res_ids, fnames=()):
+        """Añade en bloque una fila por registro (un único INSERT)."""
+        res_ids = [rid for rid in res_ids if rid]
+        if not res_ids:
+            return
+        fields_str = ",".join(sorted(fnames))
+        execute_values(
+            self.env.cr._obj,
+            "INSERT INTO forcemanager_outbox (res_model, res_id, changed_fields, enqueued_at) VALUES %s",
+            [(res_model, res_id, fields_str) for res_id in res_ids],
+            template="(%s, %s, %s, (now() at time zone 'UTC'))",
+        )
+
+    @api.model
+    def _enqueue_records(self, records, fnames=(), full=False):
+        """
+        Llamado desde los write()/create() de los modelos sincronizados.
+        - Ignora las escrituras de la propia sincronización (sync_from_forcemanager)
+          y las que solo tocan campos de control (FM_BOOKKEEPING_FIELDS).
+        - full=True (altas): se enviará el registro completo.
+        - Solo encola si el modelo tiene un envío activo (`_tracked_models`).
+        En modificaciones, además, se baja synced_with_forcemanager con `_mark_unsynced`
+        (también sin envío activo: al activarlo, `_seed_once` recoge esos registros).
+        """
+        if not records or self.env.context.get('sync_from_forcemanager'):
+            return
+        relevant = set(fnames) - FM_BOOKKEEPING_FIELDS
+        if not relevant and not full:
+            return
+        if records._name in self._tracked_models():
+            self._enqueue(records._name, records.ids, () if full else relevant)
+        if not full:
+            self._mark_unsynced(records)
+
+    @api.model
+    def _mark_unsynced(self, records):
+        """
+        Pone synced_with_forcemanager=False con un único UPDATE sobre las filas que
+        lo tenían a True, sin pasar por write(): no dispara otro write() en cascada,
+        no toca write_date ni vuelve a recalcular nada.
+        """
+        self._set_synced_flag(records, False)
+
+    @api.model
+    def _mark_synced(self, records):
+        """
+        Lo contrario de `_mark_unsynced`, para cerrar un envío: synced_with_forcemanager=True
+        con un único UPDATE, sin write() (que volvería a encolar o a registrar el cambio).
+        """
+        self._set_synced_flag(records, True)
+
+    @api.model
+    def _set_synced_flag(self, records, value):
+        if not records or 'synced_with_forcemanager' not in records._fields:
+            return
+        records.flush_recordset(['synced_with_forcemanager'])
+        self.env.cr.execute(
+            f'UPDATE "{records._table}" SET synced_with_forcemanager = %s '
+            f'WHERE id = ANY(%s) AND synced_with_forcemanager IS DISTINCT FROM %s',
+            (value, list(records.ids), value),
+        )
+        if self.env.cr.rowcount:
+            records.invalidate_recordset(['synced_with_forcemanager'])
+
+    # -------------------------------------------------------------------------
+    # Consumir
+    # -------------------------------------------------------------------------
+    @api.model
+    def _peek(self, res_model, limit=None, after_id=0):
+        """
+        Lee (bloqueando con SKIP LOCKED, para que dos crons no envíen lo mismo)
+        hasta `limit` filas pendientes de un modelo con id > after_id, en orden. Devuelve:
+            {res_id: {'outbox_ids': [...], 'fields': set() o None (= completo)}}
+        """
+        query = (
+            "SELECT id, res_id, changed_fields FROM forcemanager_outbox "
+            "WHERE res_model = %s AND id > %s ORDER BY id"
+        )
+        params = [res_model, after_id]
+        if limit:
+            query += " LIMIT %s"
+            params.append(limit)
+        self.env.cr.execute(query + " FOR UPDATE SKIP LOCKED", params)
+        entries = {}
+        for outbox_id, res_id, changed_fields in self.env.cr.fetchall():
+            entry = entries.setdefault(res_id, {'outbox_ids': [], 'fields': set()})
+            entry['outbox_ids'].append(outbox_id)
+            if not changed_fields:
+                entry['fields'] = None
+            elif entry['fields'] is not None:
+                entry['fields'].update(changed_fields.split(','))
+        return entries
+
+    @api.model
+    def _ack(self, entries, res_ids=None):
+        """Elimina de la cola las filas de los registros ya enviados (todos si res_ids es None)."""
+        outbox_ids = [
+            outbox_id
+            for res_id, entry in entries.items()
+            if res_ids is None or res_id in res_ids
+            for outbox_id in entry['outbox_ids']
+        ]
+        if outbox_ids:
+            self.env.cr.execute("DELETE FROM forcemanager_outbox WHERE id = ANY(%s)", (outbox_ids,))
+
+    @api.model
+    def _record_failures(self, entries, errors):
+        """
+        Guarda en las filas pendientes el error de cada registro que no se ha podido
+        enviar (errors = {res_id: "[código] mensaje"}) e incrementa sus intentos.
+        Las filas se quedan en la cola: el siguiente ciclo solo reintenta esos.
+        """
+        values = [
+            (outbox_id, error)
+            for res_id, error in errors.items()
+            for outbox_id in (entries.get(res_id) or {}).get('outbox_ids', [])
+        ]
+        if not values:
+            return
+        execute_values(
+            self.env.cr._obj,
+            """
+            UPDATE forcemanager_outbox AS o
+               SET attempts = COALESCE(o.attempts, 0) + 1, last_error = v.error
+              FROM (VALUES %s) AS v(id, error)
+             WHERE o.id = v.id
+            """,
+            values,
+        )
+
+    @api.model
+    def _seed_once(self, res_model, domain, key):
+        """
+        Primera vez que se usa la cola para un envío (key: 'accounts', 'contacts'...):
+        encola (como registros completos) lo que el dominio antiguo habría seleccionado,
+        para no perder pendientes previos.
+        """
+        param = f'forcemanager_integration.outbox_seeded.{key}'
+        ICP = self.env['ir.config_parameter'].sudo()
+        if ICP.get_param(param):
+            return
+        res_ids = self.env[res_model].with_context(active_test=False).search(domain).ids
+        self._enqueue(res_model, res_ids)
+        ICP.set_param(param, '1')
+        _logger.info("[forcemanager.outbox] %s: %d registros pendientes encolados al activar la cola.",
+                     res_model, len(res_ids))
+
+    @api.model
+    def _purge(self):
+        """
+        Elimina lo que no se va a consumir:
+        - filas de modelos sin envío activo (y la marca de `_seed_once` de esos envíos,
+          para que al activarlos se vuelva a encolar lo pendiente);
+        - filas que han fallado forcemanager_integration.outbox_max_attempts veces (20).
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        enabled = set(self._get_outbound_entities())
+        for entity in OUTBOUND_ENTITY_MODELS.keys() - enabled:
+            param = f'forcemanager_integration.outbox_seeded.{entity}'
+            if ICP.get_param(param):
+                ICP.set_param(param, False)
+        tracked = [OUTBOUND_ENTITY_MODELS[entity] for entity in enabled]
+        self.env.cr.execute(
+            "DELETE FROM forcemanager_outbox WHERE NOT (res_model = ANY(%s))", (tracked,)
+        )
+        untracked = self.env.cr.rowcount
+        try:
+            max_attempts = max(int(ICP.get_param('forcemanager_integration.outbox_max_attempts', '20')), 1)
+        except (TypeError, ValueError):
+            max_attempts = 20
+        self.env.cr.execute(
+            "DELETE FROM forcemanager_outbox WHERE attempts >= %s RETURNING res_model, res_id, last_error",
+            (max_attempts,),
+        )
+        for res_model, res_id, last_error in self.env.cr.fetchall():
+            _logger.warning("[forcemanager.outbox] %s(%s) descartado tras %d intentos: %s",
+                            res_model, res_id, max_attempts, last_error)
+        if untracked:
+            _logger.info("[forcemanager.outbox] %d filas de modelos sin envío activo eliminadas.", untracked)
@@ -0,0 +1,209 @@
+# models/forcemanager_pending_ref.py
+
+import json
+import logging
+from odoo import api, fields, models
+
+from .forcemanager_logging import log_sampled
+from .forcemanager_tools import FM_SYNC_CONTEXT
+
+_logger = logging.getLogger(__name__)
+
+
+class ForceManagerPendingRef(models.Model):
+    """
+    Cola de referencias ForceManager sin resolver.
+
+    Cuando un contacto, una oportunidad o un pedido de ForceManager apunta a una
+    cuenta (accountId) que todavía no existe en Odoo, guardamos aquí la referencia.
+    En cuanto la cuenta llega (en una página posterior o en otra ejecución),
+    `resolve_pending()` vuelve a enlazar los dependientes en bloque, sin tener
+    que volver a pedir el delta completo a la API. Si la cuenta no llega tras
+    forcemanager_integration.pending_ref_max_attempts intentos (20), la referencia
+    se descarta con un warning.
+    """
+    _name = 'forcemanager.pending.ref'
+    _description = 'Referencias ForceManager pendientes de resolver'
+    _order = 'id'
+
+    entity = fields.Selection([
+        ('contact', 'Contacto'),
+        ('opportunity', 'Oportunidad'),
+        ('order', 'Pedido'),
+    ], string='Entidad', required=True, index=True)
+    fm_record_id = fields.Integer(string='FM ID del registro', required=True)
+    fm_account_id = fields.Integer(string='FM ID de la cuenta', required=True, index=True)
+    res_id = fields.Integer(string='ID Odoo del registro')
+    payload = fields.Text(string='Datos FM (JSON)')
+    attempts = fields.Integer(string='Intentos', default=0)
+
+    _sql_constraints = [
+        ('entity_record_uniq', 'unique(entity, fm_record_id)',
+         'Solo puede haber una referencia pendiente por registro de ForceManager.'),
+    ]
+
+    @api.model
+    def _register(self, entity, fm_record_id, fm_account_id, res_id=False, payload=None):
+        """
+        Registra (o actualiza) una referencia pendiente.
+        - payload: dict serializable, solo para las entidades que no llegan a crearse
+          en Odoo sin la cuenta (pedidos).
+        """
+        return self._register_many(entity, [{
+            'fm_record_id': fm_record_id,
+            'fm_account_id': fm_account_id,
+            'res_id': res_id,
+            'payload': payload,
+        }])
+
+    @api.model
+    def _register_many(self, entity, rows):
+        """
+        Versión en bloque de `_register`: una búsqueda para todas las filas,
+        una escritura por referencia ya existente y un único create para el resto.
+        rows: lista de dicts con fm_record_id, fm_account_id y opcionalmente res_id/payload.
+        """
+        if not rows:
+            return self.browse()
+        existing = self.search([
+            ('entity', '=', entity),
+            ('fm_record_id', 'in', [row['fm_record_id'] for row in rows]),
+        ])
+        existing_by_fm = {ref.fm_record_id: ref for ref in existing}
+
+        to_create = []
+        for row in rows:
+            payload = row.get('payload')
+            vals = {
+                'fm_account_id': row['fm_account_id'],
+                'res_id': row.get('res_id') or 0,
+                'payload': json.dumps(payload) if payload is not None else False,
+            }
+            pending = existing_by_fm.get(row['fm_record_id'])
+            if pending:
+                vals['attempts'] = pending.attempts + 1
+                pending.write(vals)
+            else:
+                vals.update({'entity': entity, 'fm_record_id': row['fm_record_id']})
+                to_create.append(vals)
+            log_sampled(
+                _logger, 'pending_ref',
+                "[forcemanager.pending.ref] %s FM ID=%s pendiente de la cuenta FM ID=%s.",
+                entity, row['fm_record_id'], row['fm_account_id']
+            )
+        _logger.info("[forcemanager.pending.ref] %d referencias %s pendientes (%d nuevas).",
+                     len(rows), entity, len(to_create))
+        return existing | self.create(to_create)
+
+    @api.model
+    def _discard(self, entity, fm_record_ids):
+        """
+        Elimina las referencias pendientes de registros que ya se han resuelto
+        (o que han dejado de apuntar a una cuenta ausente).
+        """
+        if not fm_record_ids:
+            return
+        self.search([
+            ('entity', '=', entity),
+            ('fm_record_id', 'in', list(fm_record_ids)),
+        ]).unlink()
+
+    @api.model
+    def resolve_pending(self, fm_account_ids=None):
+        """
+        Intenta resolver las referencias pendientes.
+        - fm_account_ids: si se indica, solo se revisan las que apuntan a esas cuentas
+          (p.ej. las recién importadas en sync_accounts).
+
+        Todo se resuelve con una consulta al mapeo forcemanager.id.map y una escritura por
+        cuenta y modelo; los pedidos se vuelven a procesar desde el JSON guardado.
+        """
+        domain = []
+        if fm_account_ids is not None:
+            fm_account_ids = [fid for fid in fm_account_ids if fid]
+            if not fm_account_ids:
+                return 0
+            domain.append(('fm_account_id', 'in', fm_account_ids))
+
+        pending = self.search(domain)
+        if not pending:
+            return 0
+
+        partner_by_fm = self.env['forcemanager.id.map']._get_res_ids(
+            'account', pending.mapped('fm_account_id')
+        )
+
+        resolved = self.browse()
+        contacts_by_parent = {}
+        leads_by_partner = {}
+        orders = []
+        for ref in pending:
+            partner_id = partner_by_fm.get(ref.fm_account_id)
+            if not partner_id:
+                continue
+            if ref.entity == 'contact' and ref.res_id:
+                contacts_by_parent.setdefault(partner_id, []).append(ref.res_id)
+            elif ref.entity == 'opportunity' and ref.res_id:
+                leads_by_partner.setdefault(partner_id, []).append(ref.res_id)
+            elif ref.entity == 'order' and ref.payload:
+                orders.append(ref)
+                continue
+            resolved |= ref
+
+        for partner_id, contact_ids in contacts_by_parent.items():
+            self.env['res.partner'].browse(contact_ids).exists().with_context(**FM_SYNC_CONTEXT).write({
+                'parent_id': partner_id,
+            })
+        for partner_id, lead_ids in leads_by_partner.items():
+            self.env['crm.lead'].browse(lead_ids).exists().with_context(**FM_SYNC_CONTEXT).write({
+                'partner_id': partner_id,
+            })
+
+        ToOdoo = self.env['forcemanager.to.odoo']
+        for ref in orders:
+            data = json.loads(ref.payload)
+            order = ToOdoo._sync_single_order(data.get('order') or {}, data.get('lines') or [])
+            if order:
+                resolved |= ref
+
+        self._count_failed_attempts(pending - resolved)
+
+        _logger.info(
+            "[forcemanager.pending.ref] Resueltas %d de %d referencias pendientes "
+            "(contactos=%d, oportunidades=%d, pedidos=%d).",
+            len(resolved), len(pending),
+            sum(len(v) for v in contacts_by_parent.values()),
+            sum(len(v) for v in leads_by_partner.values()),
+            len(orders),
+        )
+        resolved.exists().unlink()
+        return len(resolved)
+
+    @api.model
+    def _count_failed_attempts(self, refs):
+        """
+        Suma un intento (un único UPDATE) a las referencias que siguen sin resolver y
+        descarta las que llegan a forcemanager_integration.pending_ref_max_attempts:
+        sin ese tope, un pedido cuya cuenta no llega nunca se reprocesaría en cada ejecución.
+        """
+        if not refs:
+            return
+        self.env.cr.execute(
+            "UPDATE forcemanager_pending_ref SET attempts = attempts + 1 WHERE id = ANY(%s)",
+            (refs.ids,),
+        )
+        refs.invalidate_recordset(['attempts'])
+        try:
+            max_attempts = max(int(self.env['ir.config_parameter'].sudo().get_param(
+                'forcemanager_integration.pending_ref_max_attempts', '20'
+            )), 1)
+        except (TypeError, ValueError):
+            max_attempts = 20
+        exhausted = refs.filtered(lambda ref: ref.attempts >= max_attempts)
+        for ref in exhausted:
+            _logger.warning(
+                "[forcemanager.pending.ref] %s FM ID=%s descartado tras %d intentos: "
+                "la cuenta FM ID=%s no ha llegado.",
+                ref.entity, ref.fm_record_id, max_attempts, ref.fm_account_id
+            )
+        exhausted.unlink()
@@ -0,0 +1,80 @@
+# models/forcemanager_push_hash.py
+
+import hashlib
+import json
+import logging
+
+from psycopg2.extras import execute_values
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class ForceManagerPushHash(models.Model):
+    """
+    Hash del último payload enviado correctamente a ForceManager por registro.
+
+    Antes de un PUT, odoo.to.forcemanager compara el hash del payload recién
+    construido con el guardado: si coincide (p.ej. un movimiento de stock que no
+    cambia qty_available, o un write que no toca ningún campo que vea FM) se
+    omite el envío.
+    """
+    _name = 'forcemanager.push.hash'
+    _description = 'Hash del último envío Odoo → ForceManager'
+    _log_access = False
+
+    res_model = fields.Char(string='Modelo', required=True)
+    res_id = fields.Integer(string='ID Odoo', required=True)
+    payload_hash = fields.Char(string='Hash del payload', required=True)
+    pushed_at = fields.Datetime(string='Enviado el')
+
+    _sql_constraints = [
+        ('res_model_res_id_uniq', 'unique(res_model, res_id)', 'Solo puede haber un hash por registro.'),
+    ]
+
+    @api.model
+    def _payload_hash(self, payload):
+        """
+        Hash estable del payload. Se ignora 'id' para que alta y actualización
+        del mismo contenido den el mismo hash.
+        """
+        content = {key: value for key, value in payload.items() if key != 'id'}
+        dumped = json.dumps(content, sort_keys=True, default=str, separators=(',', ':'))
+        return hashlib.md5(dumped.encode('utf-8')).hexdigest()
+
+    @api.model
+    def _get_hashes(self, res_model, res_ids):
+        """Devuelve {res_id: hash} de los registros que ya se han enviado alguna vez."""
+        if not res_ids:
+            return {}
+        self.env.cr.execute(
+            "SELECT res_id, payload_hash FROM forcemanager_push_hash WHERE res_model = %s AND res_id = ANY(%s)",
+            (res_model, list(res_ids)),
+        )
+        return dict(self.env.cr.fetchall())
+
+    @api.model
+    def _store(self, res_model, hashes):
+        """Guarda (upsert, una sola consulta) {res_id: hash} tras un envío correcto."""
+        if not hashes:
+            return
+        execute_values(
+            self.env.cr._obj,
+            """
+            INSERT INTO forcemanager_push_hash (res_model, res_id, payload_hash, pushed_at) VALUES %s
+            ON CONFLICT (res_model, res_id)
+            DO UPDATE SET payload_hash = EXCLUDED.payload_hash, pushed_at = EXCLUDED.pushed_at
+            """,
+            [(res_model, res_id, payload_hash) for res_id, payload_hash in hashes.items()],
+            template="(%s, %s, %s, (now() at time zone 'UTC'))",
+        )
+
+    @api.model
+    def _forget(self, res_model, res_ids):
+        """Borra los hashes (registro desvinculado de FM: el próximo envío será completo)."""
+        if res_ids:
+            self.env.cr.execute(
+                "DELETE FROM forcemanager_push_hash WHERE res_model = %s AND res_id = ANY(%s)",
+                (res_model, list(res_ids)),
+            )
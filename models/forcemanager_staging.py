@@ -0,0 +1,406 @@
+# models/forcemanager_staging.py
+
+import json
+import logging
+import uuid
+
+from psycopg2.extras import execute_values
+
+from odoo import api, fields, models
+
+from .forcemanager_api import ForceManagerRequestError
+
+_logger = logging.getLogger(__name__)
+
+# Claves que cambian en cada edición en FM sin que cambie nada que llevemos a Odoo;
+# se quitan del payload antes de calcular el hash de contenido (rutas jsonb para #-).
+_VOLATILE_PATHS = {
+    'account': ['{dateUpdated}', '{dateCreated}'],
+    'contact': ['{dateUpdated}', '{dateCreated}'],
+    'opportunity': ['{dateUpdated}', '{dateCreated}'],
+    'order': ['{order,dateUpdated}', '{order,dateCreated}'],
+}
+
+# Comparación columna a columna con la tabla destino: (columna Odoo, expresión sobre el payload[, tipo]).
+# Si alguna difiere, el registro se actualiza aunque el payload sea igual al último aplicado
+# (p.ej. alguien lo editó en Odoo). Las columnas 'numeric' se comparan como números
+# (1500.00 = 1500); el resto, como texto.
+_COLUMN_DIFFS = {
+    'account': ('res_partner', [
+        ('name', "COALESCE(NULLIF(s.payload->>'name', ''), '(Sin nombre)')"),
+        ('street', "s.payload->>'address1'"),
+        ('street2', "s.payload->>'address2'"),
+        ('city', "s.payload->>'city'"),
+        ('zip', "s.payload->>'postcode'"),
+        ('email', "s.payload->>'email'"),
+        ('phone', "s.payload->>'phone'"),
+        ('mobile', "s.payload->>'phone2'"),
+        ('website', "s.payload->>'website'"),
+        ('vat', "s.payload->>'Z_nif'"),
+    ]),
+    'contact': ('res_partner', [
+        ('phone', "s.payload->>'phone1'"),
+        ('mobile', "s.payload->>'phone2'"),
+        ('email', "s.payload->>'email'"),
+        ('function', "s.payload->'typeId'->>'value'"),
+    ]),
+    'opportunity': ('crm_lead', [
+        ('name', "COALESCE(NULLIF(s.payload->>'reference', ''), '(Opp sin nombre)')"),
+        ('expected_revenue', "COALESCE(NULLIF(s.payload->>'total', ''), '0')::numeric", 'numeric'),
+    ]),
+    'order': ('sale_order', []),
+}
+
+# Entidad de staging => clave de la fecha de última sincronización
+_SYNC_KEYS = {
+    'account': 'accounts',
+    'contact': 'contacts',
+    'opportunity': 'opportunities',
+    'order': 'orders',
+}
+
+
+class ForceManagerStagingRecord(models.Model):
+    """
+    Zona de staging (ELT) para la sincronización ForceManager → Odoo.
+
+    En modo 'staging' (parámetro forcemanager_integration.sync_mode) cada página
+    descargada se inserta tal cual (JSONB) con execute_values; después el match con
+    forcemanager.id.map, la comparación con res.partner / crm.lead / sale.order y la
+    clasificación create/update/unchanged se hacen con SQL sobre toda la ejecución,
+    y solo los registros create/update pasan por el ORM con los mismos métodos por
+    página que el modo directo.
+
+    La descarga y la aplicación están desacopladas: una ejecución (run_id) puede
+    volver a aplicarse con `replay_run()`.
+    """
+    _name = 'forcemanager.staging.record'
+    _description = 'Registros ForceManager en staging'
+    _order = 'id'
+    _log_access = False
+
+    run_id = fields.Char(string='Ejecución', required=True, index=True)
+    entity = fields.Selection([
+        ('account', 'Cuenta'),
+        ('contact', 'Contacto'),
+        ('opportunity', 'Oportunidad'),
+        ('order', 'Pedido'),
+    ], string='Entidad', required=True)
+    fm_id = fields.Integer(string='ID ForceManager', required=True)
+    payload = fields.Json(string='Datos FM')
+    content_hash = fields.Char(string='Hash del contenido')
+    state = fields.Selection([
+        ('staged', 'Descargado'),
+        ('create', 'A crear'),
+        ('update', 'A actualizar'),
+        ('unchanged', 'Sin cambios'),
+        ('superseded', 'Sustituido'),
+        ('applied', 'Aplicado'),
+        ('pending', 'Pendiente de cuenta'),
+        ('failed', 'Error'),
+    ], string='Estado', required=True, default='staged')
+    res_id = fields.Integer(string='ID Odoo')
+    fetched_at = fields.Datetime(string='Descargado el', required=True)
+    error = fields.Text(string='Error')
+
+    def init(self):
+        super().init()
+        self.env.cr.execute(
+            'CREATE INDEX IF NOT EXISTS "forcemanager_staging_record_entity_fm_idx" '
+            'ON "forcemanager_staging_record" (entity, fm_id, id)'
+        )
+        self.env.cr.execute(
+            'CREATE INDEX IF NOT EXISTS "forcemanager_staging_record_run_state_idx" '
+            'ON "forcemanager_staging_record" (run_id, entity, state)'
+        )
+
+    # -------------------------------------------------------------------------
+    # Extract / Load
+    # -------------------------------------------------------------------------
+    @api.model
+    def _stage_page(self, run_id, entity, records):
+        """
+        Inserta en bloque (execute_values) una página de registros FM sin tocarlos.
+        records: lista de (fm_id, payload_dict).
+        """
+        rows = [(run_id, entity, fm_id, json.dumps(payload)) for fm_id, payload in records if fm_id]
+        if not rows:
+            return 0
+        hash_expr = 'payload'
+        for path in _VOLATILE_PATHS[entity]:
+            hash_expr = f"({hash_expr} #- '{path}')"
+        # Primero se inserta el JSONB y luego se calcula el hash sobre su forma canónica
+        inserted = execute_values(
+            self.env.cr._obj,
+            """INSERT INTO forcemanager_staging_record (run_id, entity, fm_id, payload, state, fetched_at)
+               VALUES %s RETURNING id""",
+            rows,
+            template="(%s, %s, %s, %s::jsonb, 'staged', (now() at time zone 'UTC'))",
+            fetch=True,
+        )
+        self.env.cr.execute(
+            f"UPDATE forcemanager_staging_record SET content_hash = md5({hash_expr}::text) WHERE id = ANY(%s)",
+            ([row[0] for row in inserted],),
+        )
+        return len(rows)
+
+    @api.model
+    def download_to_staging(self):
+        """
+        Descarga a staging el delta de cuentas, contactos, oportunidades y pedidos
+        (sin aplicar nada). Las fechas de última sincronización NO se avanzan aquí:
+        devuelve (run_id, {sync_key: inicio de la descarga}) y `_advance_watermarks`
+        las mueve solo cuando la ejecución se ha aplicado sin errores. Una entidad
+        cuya descarga se interrumpe (ForceManagerRequestError) no entra en ese dict.
+        """
+        ToOdoo = self.env['forcemanager.to.odoo']
+        Api = self.env['forcemanager.api']
+        run_id = uuid.uuid4().hex
+        counts = {}
+        watermarks = {}
+
+        for entity, resource, sync_key in (
+            ('account', 'accounts', 'accounts'),
+            ('contact', 'contacts', 'contacts'),
+            ('opportunity', 'opportunities', 'opportunities'),
+        ):
+            watermarks[sync_key] = fields.Datetime.now()
+            date_str = ToOdoo._get_delta_date_str(sync_key)
+            where_clause = f"(dateUpdated > '{date_str}' OR dateCreated > '{date_str}')"
+            counts[entity] = 0
+            try:
+                for page in Api._iter_pages(f"{resource}?where={where_clause}"):
+                    counts[entity] += self._stage_page(
+                        run_id, entity, [(ToOdoo._fm_int(rec.get('id')), rec) for rec in page if rec]
+                    )
+            except ForceManagerRequestError as e:
+                # Lo descargado se aplica, pero la fecha no avanza: la siguiente
+                # ejecución vuelve a pedir las páginas que faltan
+                _logger.error("[forcemanager.staging] %s %s: descarga interrumpida tras %d registros (%s).",
+                              run_id, entity, counts[entity], e)
+                del watermarks[sync_key]
+
+        watermarks['orders'] = fields.Datetime.now()
+        date_str = ToOdoo._get_delta_date_str('orders')
+        fm_orders = ToOdoo._fetch_orders_since(date_str)
+        lines_dict = ToOdoo._fetch_salesorder_lines_since(date_str)
+        counts['order'] = self._stage_page(run_id, 'order', [
+            (ToOdoo._fm_int(order.get('id')),
+             {'order': order, 'lines': lines_dict.get(ToOdoo._fm_int(order.get('id')), [])})
+            for order in fm_orders
+        ])
+
+        _logger.info("[forcemanager.staging] Ejecución %s descargada: %s", run_id, counts)
+        return run_id, watermarks
+
+    @api.model
+    def _advance_watermarks(self, run_id, watermarks):
+        """
+        Avanza la fecha de última sincronización de cada entidad de la ejecución
+        hasta el inicio de su descarga, salvo si algún bloque ha quedado 'failed':
+        entonces se mantiene y la siguiente ejecución vuelve a descargar esos registros.
+        """
+        self.env.cr.execute("""
+            SELECT DISTINCT entity FROM forcemanager_staging_record
+             WHERE run_id = %s AND state = 'failed'
+        """, (run_id,))
+        failed = {row[0] for row in self.env.cr.fetchall()}
+        Api = self.env['forcemanager.api']
+        for entity, sync_key in _SYNC_KEYS.items():
+            if entity in failed:
+                _logger.warning("[forcemanager.staging] %s %s con bloques fallidos: no se avanza '%s'.",
+                                run_id, entity, sync_key)
+            elif sync_key in watermarks:
+                Api.set_last_sync_date(sync_key, watermarks[sync_key])
+
+    # -------------------------------------------------------------------------
+    # Transform (SQL por conjuntos)
+    # -------------------------------------------------------------------------
+    @api.model
+    def _classify(self, run_id, entity):
+        """
+        Clasifica con SQL todos los registros de la ejecución para una entidad:
+        1) Duplicados del mismo fm_id => 'superseded' (gana el último descargado).
+        2) Match con forcemanager.id.map (con relleno desde columnas legacy) => res_id.
+        3) Sin res_id => 'create'.
+        4) Con res_id => 'update' si el hash difiere del último aplicado, no hay
+           aplicado previo o alguna columna de la tabla destino difiere; si no, 'unchanged'.
+        Devuelve {estado: número}.
+        """
+        cr = self.env.cr
+        cr.execute("""
+            UPDATE forcemanager_staging_record s SET state = 'superseded'
+             WHERE s.run_id = %s AND s.entity = %s AND s.state = 'staged'
+               AND EXISTS (SELECT 1 FROM forcemanager_staging_record n
+                            WHERE n.run_id = s.run_id AND n.entity = s.entity
+                              AND n.fm_id = s.fm_id AND n.id > s.id)
+        """, (run_id, entity))
+
+        # Los que aún no están en el mapeo se buscan una vez en las columnas legacy
+        cr.execute("""
+            SELECT s.fm_id FROM forcemanager_staging_record s
+             WHERE s.run_id = %s AND s.entity = %s AND s.state = 'staged'
+               AND NOT EXISTS (SELECT 1 FROM forcemanager_id_map m
+                                WHERE m.entity_type = s.entity AND m.fm_id = s.fm_id)
+        """, (run_id, entity))
+        self.env['forcemanager.id.map']._get_res_ids(entity, [row[0] for row in cr.fetchall()])
+
+        cr.execute("""
+            UPDATE forcemanager_staging_record s SET res_id = m.res_id
+              FROM forcemanager_id_map m
+             WHERE s.run_id = %s AND s.entity = %s AND s.state = 'staged'
+               AND m.entity_type = s.entity AND m.fm_id = s.fm_id
+        """, (run_id, entity))
+        cr.execute("""
+            UPDATE forcemanager_staging_record SET state = 'create'
+             WHERE run_id = %s AND entity = %s AND state = 'staged' AND res_id IS NULL
+        """, (run_id, entity))
+
+        table, columns = _COLUMN_DIFFS[entity]
+        column_diff = " OR ".join(
+            f"COALESCE(t.{col}, 0) IS DISTINCT FROM ({expr})" if kind == ['numeric']
+            else f"COALESCE(t.{col}::text, '') IS DISTINCT FROM COALESCE(({expr})::text, '')"
+            for col, expr, *kind in columns
+        ) or "false"
+        cr.execute(f"""
+            UPDATE forcemanager_staging_record s
+               SET state = CASE
+                   WHEN t.id IS NULL THEN 'create'
+                   WHEN last.content_hash IS NULL
+                     OR last.content_hash IS DISTINCT FROM s.content_hash
+                     OR {column_diff} THEN 'update'
+                   ELSE 'unchanged' END
+              FROM forcemanager_staging_record s2
+              LEFT JOIN {table} t ON t.id = s2.res_id
+              LEFT JOIN LATERAL (
+                   SELECT p.content_hash FROM forcemanager_staging_record p
+                    WHERE p.entity = s2.entity AND p.fm_id = s2.fm_id
+                      AND p.state IN ('applied', 'unchanged') AND p.id < s2.id
+                    ORDER BY p.id DESC LIMIT 1
+              ) last ON true
+             WHERE s.id = s2.id AND s2.run_id = %s AND s2.entity = %s AND s2.state = 'staged'
+        """, (run_id, entity))
+
+        cr.execute("""
+            SELECT state, count(*) FROM forcemanager_staging_record
+             WHERE run_id = %s AND entity = %s GROUP BY state
+        """, (run_id, entity))
+        counts = dict(cr.fetchall())
+        _logger.info("[forcemanager.staging] %s %s clasificados: %s", run_id, entity, counts)
+        return counts
+
+    # -------------------------------------------------------------------------
+    # Apply (solo create/update pasan por el ORM)
+    # -------------------------------------------------------------------------
+    @api.model
+    def _apply(self, run_id, entity):
+        ToOdoo = self.env['forcemanager.to.odoo']
+        page_size = self.env['forcemanager.api']._get_page_size()
+        cache = ToOdoo._new_resolution_cache()
+        cr = self.env.cr
+        applied = 0
+        synced_account_ids = []
+        last_id = 0
+        while True:
+            cr.execute("""
+                SELECT id, fm_id, payload FROM forcemanager_staging_record
+                 WHERE run_id = %s AND entity = %s AND state IN ('create', 'update') AND id > %s
+                 ORDER BY id LIMIT %s
+            """, (run_id, entity, last_id, page_size))
+            rows = cr.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            ids = [row[0] for row in rows]
+            payloads = [row[2] for row in rows]
+
+            pending_ids = []
+            try:
+                with ToOdoo._deferred_recompute(f'staging {entity}') as to_odoo:
+                    if entity == 'account':
+                        synced_account_ids += to_odoo._sync_accounts_records(payloads, cache)
+                    elif entity == 'contact':
+                        to_odoo._sync_contacts_page(payloads, cache)
+                    elif entity == 'opportunity':
+                        to_odoo._sync_opportunities_page(payloads, cache)
+                    else:
+                        processed = []
+                        for row_id, fm_id, payload in rows:
+                            if to_odoo._sync_single_order(payload.get('order') or {}, payload.get('lines') or []):
+                                processed.append(fm_id)
+                            else:
+                                pending_ids.append(row_id)
+                        self.env['forcemanager.pending.ref']._discard('order', processed)
+            except Exception as e:
+                # El bloque queda en 'failed' (con el error) para reintentarlo con replay_run().
+                # El savepoint de `_deferred_recompute` ya ha vaciado la caché de enlaces; la de resolución
+                # (comerciales creados en el bloque...) también puede apuntar a registros revertidos.
+                _logger.exception("[forcemanager.staging] Error aplicando %s %s (%d registros).", run_id, entity, len(ids))
+                cache.update(ToOdoo._new_resolution_cache())
+                cr.execute(
+                    "UPDATE forcemanager_staging_record SET state = 'failed', error = %s WHERE id = ANY(%s)",
+                    (str(e), ids),
+                )
+                continue
+
+            cr.execute("UPDATE forcemanager_staging_record SET state = 'pending' WHERE id = ANY(%s)", (pending_ids,))
+            cr.execute(
+                "UPDATE forcemanager_staging_record SET state = 'applied', error = NULL "
+                "WHERE id = ANY(%s) AND NOT (id = ANY(%s))",
+                (ids, pending_ids),
+            )
+            applied += len(ids) - len(pending_ids)
+
+        if synced_account_ids:
+            self.env['forcemanager.pending.ref'].resolve_pending(fm_account_ids=synced_account_ids)
+        return applied
+
+    @api.model
+    def apply_run(self, run_id):
+        """Clasifica y aplica una ejecución descargada, entidad a entidad en orden de dependencias."""
+        summary = {}
+        for entity in ('account', 'contact', 'opportunity', 'order'):
+            counts = self._classify(run_id, entity)
+            summary[entity] = {
+                'unchanged': counts.get('unchanged', 0),
+                'applied': self._apply(run_id, entity),
+            }
+        _logger.info("[forcemanager.staging] Ejecución %s aplicada: %s", run_id, summary)
+        return summary
+
+    @api.model
+    def replay_run(self, run_id):
+        """Vuelve a clasificar y aplicar una ejecución ya descargada (p.ej. tras un fallo)."""
+        self.env.cr.execute("""
+            UPDATE forcemanager_staging_record SET state = 'staged', res_id = NULL
+             WHERE run_id = %s AND state NOT IN ('superseded')
+        """, (run_id,))
+        return self.apply_run(run_id)
+
+    @api.model
+    def run_staged_sync(self):
+        """Descarga + aplicación en modo staging (lo llama action_sync_from_forcemanager)."""
+        run_id, watermarks = self.download_to_staging()
+        self.apply_run(run_id)
+        self._advance_watermarks(run_id, watermarks)
+        self._gc_staging()
+        return run_id
+
+    @api.model
+    def _gc_staging(self):
+        """
+        Borra registros antiguos (parámetro forcemanager_integration.staging_retention_days,
+        7 por defecto) conservando el último aplicado de cada fm_id, que sirve de
+        referencia para detectar cambios.
+        """
+        days = int(self.env['ir.config_parameter'].sudo().get_param(
+            'forcemanager_integration.staging_retention_days', 7
+        ))
+        self.env.cr.execute("""
+            DELETE FROM forcemanager_staging_record s
+             WHERE s.fetched_at < (now() at time zone 'UTC') - %s * interval '1 day'
+               AND s.id NOT IN (
+                   SELECT DISTINCT ON (entity, fm_id) id FROM forcemanager_staging_record
+                    WHERE state IN ('applied', 'unchanged')
+                    ORDER BY entity, fm_id, id DESC)
+        """, (days,))
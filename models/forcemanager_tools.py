@@ -0,0 +1,60 @@
+# models/forcemanager_tools.py
+"""
+Funciones de normalización compartidas por los modelos de la integración.
+Se usan tanto para calcular las columnas *_normalized (indexadas) como para
+normalizar los valores que llegan de ForceManager antes de buscarlos por igualdad.
+"""
+
+import re
+import unicodedata
+
+# Contexto de todas las escrituras de la sincronización ForceManager → Odoo:
+# - sync_from_forcemanager: las sobrescrituras de write/create no marcan el registro
+#   como pendiente de enviar a FM.
+# - Sin seguimiento de cambios (mail.tracking.value), sin mensaje de creación,
+#   sin suscribir seguidores y sin actividades automáticas.
+FM_SYNC_CONTEXT = {
+    'sync_from_forcemanager': True,
+    'tracking_disable': True,
+    'mail_notrack': True,
+    'mail_create_nolog': True,
+    'mail_create_nosubscribe': True,
+    'mail_auto_subscribe_no_notify': True,
+    'mail_activity_automation_skip': True,
+}
+
+_VAT_STRIP_RE = re.compile(r'[\s.\-/_]')
+# Prefijos de país de los NIF-IVA intracomunitarios (VIES; Grecia usa EL e Irlanda
+# del Norte XI) más GB. Solo estos se quitan: un NIF que empieza por otras dos letras
+# se deja entero.
+_VAT_COUNTRY_PREFIXES = frozenset({
+    'AT', 'BE', 'BG', 'CY', 'CZ', 'DE', 'DK', 'EE', 'EL', 'ES', 'FI', 'FR', 'GB', 'HR',
+    'HU', 'IE', 'IT', 'LT', 'LU', 'LV', 'MT', 'NL', 'PL', 'PT', 'RO', 'SE', 'SI', 'SK', 'XI',
+})
+_VAT_PREFIX_RE = re.compile(r'^([A-Z]{2})(?=[0-9A-Z]{2,})')
+_SPACES_RE = re.compile(r'\s+')
+
+
+def normalize_vat(vat):
+    """
+    NIF sin espacios ni separadores, en mayúsculas y sin prefijo de país (solo si es
+    uno de _VAT_COUNTRY_PREFIXES).
+    "ES 12.345.678-A" => "12345678A", "ESB12345678" => "B12345678", "AB1234567" => "AB1234567".
+    """
+    value = _VAT_STRIP_RE.sub('', vat or '').upper()
+    match = _VAT_PREFIX_RE.match(value)
+    if match and match.group(1) in _VAT_COUNTRY_PREFIXES:
+        return value[2:]
+    return value
+
+
+def normalize_email(email):
+    """Email sin espacios alrededor y en minúsculas."""
+    return (email or '').strip().lower()
+
+
+def normalize_name(name):
+    """Nombre en minúsculas, sin acentos y con los espacios colapsados ("  Cádiz " => "cadiz")."""
+    value = unicodedata.normalize('NFKD', name or '')
+    value = ''.join(c for c in value if not unicodedata.combining(c))
+    return _SPACES_RE.sub(' ', value).strip().lower()
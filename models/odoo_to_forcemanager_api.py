@@ -1,30 +1,147 @@
 # models/odoo_to_forcemanager_api.py
 
 import logging
+import time
 from datetime import datetime
+
+from psycopg2.extras import execute_values
+
 from odoo import api, fields, models
 
+from .forcemanager_api import ForceManagerRequestError
+from .forcemanager_outbox import OUTBOUND_ENTITY_MODELS
+
 _logger = logging.getLogger(__name__)
 
 
+class _BulkChunker:
+    """
+    Parte un envío bulk en bloques acotados a la vez por nº de elementos y por
+    bytes del JSON, y ajusta el nº de elementos a la latencia observada:
+    si una petición tarda más que target_seconds el bloque siguiente es la mitad;
+    si tarda menos de la mitad, crece (hasta max_items).
+    Los bloques se generan de uno en uno y cada elemento se construye y serializa
+    justo cuando requests lo va enviando (cuerpo "chunked"), así la memoria no
+    depende de cuántos registros lleve el envío.
+    """
+
+    def __init__(self, max_items, max_bytes, target_seconds, dumps):
+        self.dumps = dumps
+        self.max_items = max(max_items, 1)
+        self.items = self.max_items
+        self.max_bytes = max_bytes
+        self.target_seconds = target_seconds
+        self.requests = 0
+
+    def iter_bodies(self, records, build_item):
+        """
+        Genera (ids, body) por bloque. body es un generador de bytes con el array
+        JSON, que serializa build_item(rec) elemento a elemento mientras se envía.
+        ids se rellena a medida que se consume body: solo está completo tras el envío.
+        Un elemento que ya no cabe en el bloque se guarda para abrir el siguiente.
+        """
+        pending = iter(records)
+        carry = []
+
+        def next_item():
+            if carry:
+                return carry.pop()
+            rec = next(pending, None)
+            if rec is None:
+                return None
+            return rec.id, self.dumps(build_item(rec))
+
+        while True:
+            first = next_item()
+            if first is None:
+                return
+            ids = [first[0]]
+
+            def body(first=first, ids=ids):
+                size = 2 + len(first[1])
+                yield b'[' + first[1]
+                while len(ids) < self.items:
+                    item = next_item()
+                    if item is None:
+                        break
+                    if size + len(item[1]) + 1 > self.max_bytes:
+                        carry.append(item)
+                        break
+                    ids.append(item[0])
+                    size += len(item[1]) + 1
+                    yield b',' + item[1]
+                yield b']'
+
+            yield ids, body()
+
+    def body_for(self, records, build_item):
+        """Cuerpo (generador de bytes) con exactamente `records`, para repetir un bloque ya enviado."""
+        yield b'['
+        for index, rec in enumerate(records):
+            yield (b',' if index else b'') + self.dumps(build_item(rec))
+        yield b']'
+
+    def observe(self, n_items, seconds):
+        """Registra la latencia de un bloque de n_items y ajusta el tamaño del siguiente."""
+        self.requests += 1
+        if seconds > self.target_seconds and n_items > 1:
+            self.items = max(n_items // 2, 1)
+        elif seconds < self.target_seconds / 2 and self.items < self.max_items:
+            self.items = min(int(self.items * 1.5) + 1, self.max_items)
+
+# Campo Odoo modificado => claves del payload de FM que dependen de él.
+# Se usan para enviar en los PUT solo lo que ha cambiado (ver `_changed_fields_payload`).
+ACCOUNT_FIELD_MAP = {
+    'name': ['name'], 'street': ['address1'], 'street2': ['address2'], 'city': ['city'],
+    'zip': ['postcode'], 'state_id': ['region'], 'country_id': ['countryId'],
+    'phone': ['phone'], 'mobile': ['phone2'], 'email': ['email'], 'website': ['website'],
+    'comment': ['comment'], 'vat': ['Z_nif'], 'comercial': ['Z_Nombre_Comercial'],
+    'property_account_position_id': ['Z_Recargo_de_equivalencia'], 'user_id': ['salesRepId1'],
+}
+CONTACT_FIELD_MAP = {
+    'name': ['firstName', 'lastName'], 'phone': ['phone1'], 'mobile': ['phone2'], 'email': ['email'],
+    'comment': ['comment'], 'function': ['typeId'], 'parent_id': ['accountId'], 'user_id': ['salesRepId'],
+    'street': ['address1'], 'street2': ['address2'], 'city': ['city'], 'zip': ['postcode'],
+    'state_id': ['region'], 'country_id': ['countryId'],
+}
+OPPORTUNITY_FIELD_MAP = {
+    'name': ['reference'], 'partner_id': ['accountId1'], 'stage_id': ['statusId'], 'user_id': ['salesRepId'],
+    'description': ['comments'], 'expected_revenue': ['total'], 'probability': ['salesProbability'],
+    'date_deadline': ['salesForecastDate'],
+}
+ORDER_FIELD_MAP = {
+    'partner_id': ['accountId'], 'currency_id': ['currencyId'], 'user_id': ['salesRepId'],
+    'date_order': ['dateCreated'], 'order_line': ['lines'],
+    'x_entrega_mismo_comercial': ['Z_Entrega_mismo_comercial'], 'state': ['deleted'],
+}
+PRODUCT_FIELD_MAP = {
+    'name': ['model'], 'description_sale': ['description'], 'list_price': ['price'],
+    'standard_price': ['cost'], 'qty_available': ['stock'], 'categ_id': ['categoryId'],
+}
+
+
 class OdooToForceManagerAPI(models.TransientModel):
     _name = 'odoo.to.forcemanager'
     _description = 'Sync Odoo → ForceManager (accounts, contacts, products, opportunities, orders)'
 
     @api.model
-    def action_sync_to_forcemanager(self):
+    def action_sync_to_forcemanager(self, commit_batches=True):
         """
         Punto de entrada para enviar datos de Odoo a ForceManager.
+        Solo se ejecutan los envíos activos en forcemanager_integration.outbound_entities
+        (por defecto solo 'products'); son también los únicos modelos que se encolan.
+        commit_batches: confirmar la transacción tras cada lote de la cola (ver
+        `_commit_progress`); solo desde aquí, los sync_* sueltos nunca hacen commit.
         """
         _logger.info(">>> [OdooToForceManagerAPI] action_sync_to_forcemanager() START")
+        self.env['forcemanager.api']._configure_log_sampling()
 
-        # Llamamos solamente a sync_products(), por ejemplo.
-        # (Descomenta las otras si quieres sincronizarlas)
-        #self.sync_accounts()
-        #self.sync_contacts()
-        self.sync_products()
-        #self.sync_opportunities()
-        #self.sync_orders()
+        Outbox = self.env['forcemanager.outbox']
+        # Filas que no va a consumir ningún envío activo (o que fallan siempre)
+        Outbox._purge()
+        to_fm = self.with_context(forcemanager_commit_batches=commit_batches)
+        for entity in Outbox._get_outbound_entities():
+            getattr(to_fm, f'sync_{entity}')()
 
         _logger.info("<<< [OdooToForceManagerAPI] action_sync_to_forcemanager() END")
         
@@ -38,137 +155,170 @@ class OdooToForceManagerAPI(models.TransientModel):
         **solo** aquellos que tengan al menos un producto con categ_id.b2b_available = True.
         """
         _logger.info("[sync_orders] Iniciando envío de 'orders' a FM.")
-        last_sync_date = self._get_last_sync_date('orders')
-        
-        # Dominio básico (filtra por triple OR: write_date > last_sync, etc.)
-        domain = self._build_domain_for_odoo2fm(last_sync_date)
-        
-        # Añadimos la condición de que en ALGUNA línea haya productos con b2b_available
-        # => Se traduce a: ('order_line.product_id.categ_id.b2b_available', '=', True)
-        domain.append(('order_line.product_id.categ_id.b2b_available', '=', True))
 
-        orders = self.env['sale.order'].search(domain)
-        if not orders:
+        # Pedidos con cambios en la cola y con ALGUNA línea de producto b2b_available
+        domain = [('order_line.product_id.categ_id.b2b_available', '=', True)]
+        total = skipped = 0
+        for orders, outbox_entries in self._iter_outbox_batches('sale.order', 'orders', domain, drop_unmatched=True):
+            _logger.info("[sync_orders] Encontrados %d pedidos. (dominio=%s)", len(orders), domain)
+
+            to_create = orders.filtered(lambda o: not o.forcemanager_id)
+            to_update = orders - to_create
+
+            # =========== CREAR (POST en bloque, ID por guid) =========== 
+            errors = self._bulk_create(
+                to_create, "sales", lambda recs: self._prepare_order_payloads(recs, is_create=True), 'sync_orders'
+            )
+
+            # =========== ACTUALIZAR (PUT en bloque, solo lo que ha cambiado) =========== 
+            payloads = self._prepare_order_payloads(to_update, is_create=False)
+            batch_skipped, update_errors = self._bulk_update(
+                to_update, "sales", payloads, outbox_entries, ORDER_FIELD_MAP, 'sync_orders'
+            )
+
+            # Los envíos fallidos se quedan en la cola para el siguiente ciclo
+            errors.update(update_errors)
+            self._ack_outbox(outbox_entries, orders, errors)
+            skipped += batch_skipped
+            total += len(orders)
+        if not total:
             _logger.info("[sync_orders] No hay pedidos que enviar (dominio=%s).", domain)
             return
-
-        _logger.info("[sync_orders] Encontrados %d pedidos. (dominio=%s)", len(orders), domain)
-
-        to_create = orders.filtered(lambda o: not o.forcemanager_id)
-        to_update = orders - to_create
-
-        # =========== CREAR (POST) =========== 
-        if to_create:
-            for so in to_create:
-                single_pl = self._prepare_single_order_payload(so, is_create=True)
-                resp = self.env['forcemanager.api']._perform_request("sales", method='POST', payload=single_pl)
-                if resp and isinstance(resp, dict) and resp.get('id'):
-                    so.forcemanager_id = resp['id']
-                so.synced_with_forcemanager = True
-
-        # =========== ACTUALIZAR =========== 
-        if to_update:
-            payload_update = []
-            for so in to_update:
-                payload_update.append({
-                    "guid": f"odoo_update_{so.id}",
-                    "data": self._prepare_single_order_payload(so, is_create=False),
-                })
-
-            endpoint_update = "sales/bulk"
-            if payload_update and self._has_bulk_endpoint(endpoint_update):
-                resp = self.env['forcemanager.api']._perform_request(endpoint_update, method='PUT', payload=payload_update)
-                self._process_bulk_update_response(resp, to_update)
-            else:
-                _logger.warning("[sync_orders] /sales/bulk (PUT) no disponible. Fallback 1x1.")
-                for so in to_update:
-                    single_pl = self._prepare_single_order_payload(so, is_create=False)
-                    ep = f"sales/{so.forcemanager_id}"
-                    self.env['forcemanager.api']._perform_request(ep, method='PUT', payload=single_pl)
-                    so.synced_with_forcemanager = True
-
         self._update_last_sync_date('orders')
-        _logger.info("[sync_orders] Finalizada la sincronización de pedidos.")
+        _logger.info("[sync_orders] Finalizada la sincronización de pedidos (%d sin cambios, omitidos).", skipped)
 
 
 
 
 
     def _prepare_single_order_payload(self, so, is_create=True):
-        data = {}
-        if not is_create and so.forcemanager_id:
-            data['id'] = so.forcemanager_id
-
-        fm_account_id = None
-        if so.partner_id and so.partner_id.forcemanager_id:
-            fm_account_id = {
-                'id': so.partner_id.forcemanager_id,
-                'value': so.partner_id.name
-            }
-
-        currency_val = {'value': so.currency_id.name} if so.currency_id else None
-
-        # Comercial => fallback {id=95, 'value': 'Joan Bonell'}
-        if so.user_id and so.user_id.forcemanager_id:
-            fm_salesrep = {
-                'id': so.user_id.forcemanager_id,
-                'value': so.user_id.name
-            }
-        else:
-            fm_salesrep = {
-                'id': 95,
-                'value': 'Joan Bonell'
-            }
-
-        lines_payload = []
-        for line in so.order_line:
-            fm_prod_id = ""
-            if line.product_id and line.product_id.forcemanager_id:
-                fm_prod_id = line.product_id.forcemanager_id
-
-            lines_payload.append({
-                'productId': fm_prod_id,
-                'productName': line.name or "",
-                'quantity': line.product_uom_qty,
-                'unitPrice': line.price_unit,
-            })
+        return self._prepare_order_payloads(so, is_create=is_create)[so.id]
 
-        date_created = ""
-        if so.date_order:
-            date_created = fields.Datetime.to_string(so.date_order).replace(" ", "T") + "Z"
+    def _prepare_order_payloads(self, orders, is_create=True):
+        """
+        Payloads de pedidos (sale.order) => {id Odoo: payload}, con una lectura por
+        modelo relacionado (partners, monedas, comerciales, líneas y productos).
+        - salesRepId con fallback a {id=95, 'value': 'Joan Bonell'}
+        - 'deleted' si en Odoo está cancelado
+        """
+        rows = orders.read([
+            'forcemanager_id', 'partner_id', 'currency_id', 'user_id', 'date_order',
+            'forcemanager_status', 'x_entrega_mismo_comercial', 'state',
+        ], load=None)
+        partners = self._read_related('res.partner', rows, 'partner_id', ['forcemanager_id', 'name'])
+        currencies = self._read_related('res.currency', rows, 'currency_id', ['name'])
+        users = self._read_related('res.users', rows, 'user_id', ['forcemanager_id', 'name'])
+
+        lines_by_order = {}
+        line_rows = self.env['sale.order.line'].search_read(
+            [('order_id', 'in', orders.ids)],
+            ['order_id', 'product_id', 'name', 'product_uom_qty', 'price_unit'], load=None,
+        )
+        products = self._read_related('product.product', line_rows, 'product_id', ['forcemanager_id'])
+        for line in line_rows:
+            product = products.get(line['product_id']) or {}
+            lines_by_order.setdefault(line['order_id'], []).append({
+                'productId': product.get('forcemanager_id') or "",
+                'productName': line['name'] or "",
+                'quantity': line['product_uom_qty'],
+                'unitPrice': line['price_unit'],
+            })
 
-        fm_status = so.forcemanager_status or ""
-        
-        # x_entrega_mismo_comercial => 'Z_Entrega_mismo_comercial'
-        entrega_str = ""
-        if so.x_entrega_mismo_comercial == 'si':
-            entrega_str = "Si"
-        elif so.x_entrega_mismo_comercial == 'no':
-            entrega_str = "No"
-
-        # Marcar 'deleted' si en Odoo está cancelado
-        is_deleted = (so.state == 'cancel')
-
-        data.update({
-            'accountId': fm_account_id,
-            'currencyId': currency_val,
-            'salesRepId': fm_salesrep,
-            'dateCreated': date_created or None,
-            'lines': lines_payload,
-
-            'status': fm_status,
-            'Z_Entrega_mismo_comercial': entrega_str,
-            'deleted': is_deleted,
-        })
-        return data
+        payloads = {}
+        for row in rows:
+            data = {}
+            if not is_create and row['forcemanager_id']:
+                data['id'] = row['forcemanager_id']
+
+            partner = partners.get(row['partner_id'])
+            fm_account_id = None
+            if partner and partner['forcemanager_id']:
+                fm_account_id = {'id': partner['forcemanager_id'], 'value': partner['name']}
+
+            currency = currencies.get(row['currency_id'])
+            currency_val = {'value': currency['name']} if currency else None
+
+            date_created = ""
+            if row['date_order']:
+                date_created = fields.Datetime.to_string(row['date_order']).replace(" ", "T") + "Z"
+
+            # x_entrega_mismo_comercial => 'Z_Entrega_mismo_comercial'
+            entrega_str = {'si': "Si", 'no': "No"}.get(row['x_entrega_mismo_comercial'], "")
+
+            data.update({
+                'accountId': fm_account_id,
+                'currencyId': currency_val,
+                'salesRepId': self._salesrep_value(users.get(row['user_id'])),
+                'dateCreated': date_created or None,
+                'lines': lines_by_order.get(row['id'], []),
+
+                'status': row['forcemanager_status'] or "",
+                'Z_Entrega_mismo_comercial': entrega_str,
+                'deleted': row['state'] == 'cancel',
+            })
+            payloads[row['id']] = data
+        return payloads
 
     
     # -------------------------------------------------------------------------
     # AUXILIARES DE DOMAIN
     # -------------------------------------------------------------------------
+    def _iter_outbox_batches(self, res_model, sync_key, domain, drop_unmatched=False):
+        """
+        Recorre por lotes (forcemanager.outbox._get_batch_size filas) los registros de
+        res_model con cambios pendientes en forcemanager.outbox que cumplen `domain`.
+        Devuelve (registros, entradas de la cola) de cada lote para hacer `_ack` de lo
+        enviado; tras cada lote se confirma la transacción, de modo que los bloqueos
+        de la cola (y los IDs de FM recibidos) no se mantienen durante todo el envío.
+        - Las entradas de registros borrados se descartan.
+        - drop_unmatched: descarta también las de registros que no cumplen el dominio
+          (no se van a enviar). En res.partner solo si el otro envío del modelo
+          (cuentas/contactos) no está activo: lo que no es cuenta es contacto.
+        - Los fallos se quedan en la cola: el lote siguiente empieza tras la última
+          fila leída, así que no se reintentan dentro de la misma ejecución.
+        """
+        Outbox = self.env['forcemanager.outbox']
+        if not drop_unmatched:
+            drop_unmatched = not any(
+                OUTBOUND_ENTITY_MODELS[entity] == res_model
+                for entity in Outbox._get_outbound_entities() if entity != sync_key
+            )
+        # Solo la primera vez: lo que seleccionaba el dominio antiguo pasa a la cola
+        Outbox._seed_once(
+            res_model, domain + self._build_domain_for_odoo2fm(self._get_last_sync_date(sync_key)), sync_key
+        )
+        batch_size = Outbox._get_batch_size()
+        after_id = 0
+        while True:
+            entries = Outbox._peek(res_model, limit=batch_size, after_id=after_id)
+            if not entries:
+                return
+            after_id = max(outbox_id for entry in entries.values() for outbox_id in entry['outbox_ids'])
+            records = self.env[res_model].browse(list(entries)).exists()
+            matching = records.filtered_domain(domain) if domain else records
+            discard = set(entries) - set(records.ids)
+            # Registros borrados en Odoo: su hash de último envío ya no sirve
+            self.env['forcemanager.push.hash']._forget(res_model, discard)
+            if drop_unmatched:
+                discard |= set(records.ids) - set(matching.ids)
+            Outbox._ack(entries, discard)
+            if matching:
+                yield matching, entries
+            self._commit_progress()
+
+    def _commit_progress(self):
+        """
+        Confirma lo enviado hasta ahora (IDs de FM, `_ack` de la cola) y libera los
+        bloqueos, si lo pide el contexto forcemanager_commit_batches (lo pone
+        `action_sync_to_forcemanager`, es decir, el cron).
+        """
+        if self.env.context.get('forcemanager_commit_batches'):
+            self.env.cr.commit()
+
     def _build_domain_for_odoo2fm(self, last_sync_date):
         """
-        Construye un dominio:
+        Dominio de selección previo a forcemanager.outbox; solo se usa para encolar
+        una vez los pendientes al activar la cola (ver `_iter_outbox_batches`):
          - (A) write_date > last_sync_date
          - (B) forcemanager_id = False
          - (C) synced_with_forcemanager = False
@@ -188,6 +338,20 @@ class OdooToForceManagerAPI(models.TransientModel):
                 ('synced_with_forcemanager', '=', False),
             ]
             
+    def _changed_fields_payload(self, record, payload, outbox_entries, field_map):
+        """
+        Reduce el payload de actualización de `record` a 'id' + las claves de FM
+        afectadas por los campos modificados desde el último envío correcto (las
+        filas de forcemanager.outbox se acumulan hasta el `_ack`).
+        Si no se conocen los cambios (alta, carga inicial) o alguno de los campos
+        no está en field_map, se envía el payload completo.
+        """
+        changed = (outbox_entries.get(record.id) or {}).get('fields')
+        if not changed or not changed <= field_map.keys():
+            return payload
+        keys = {'id'}.union(*(field_map[fname] for fname in changed))
+        return {key: value for key, value in payload.items() if key in keys}
+
     # -------------------------------------------------------------------------
     # Last sync date
     # -------------------------------------------------------------------------
@@ -205,53 +369,35 @@ class OdooToForceManagerAPI(models.TransientModel):
     def sync_accounts(self):
         _logger.info("[sync_accounts] Iniciando envío de 'accounts' a FM.")
 
-        last_sync_date = self._get_last_sync_date('accounts')
-        domain = self._build_domain_for_odoo2fm(last_sync_date)
-        # Filtramos solo las empresas
-        domain.insert(0, ('is_company', '=', True))
-
-        partners = self.env['res.partner'].search(domain)
-        if not partners:
+        # Filtramos solo las empresas con cambios en la cola
+        domain = [('is_company', '=', True)]
+        total = skipped = 0
+        for partners, outbox_entries in self._iter_outbox_batches('res.partner', 'accounts', domain):
+            _logger.info("[sync_accounts] Encontrados %d 'accounts' para enviar (dominio=%s).", len(partners), domain)
+
+            to_create = partners.filtered(lambda p: not p.forcemanager_id)
+            to_update = partners - to_create
+
+            # =========== CREAR (POST en bloque, ID por guid) ===========
+            errors = self._bulk_create(
+                to_create, "accounts", lambda recs: self._prepare_account_payloads(recs, is_update=False), 'sync_accounts'
+            )
+
+            # =========== ACTUALIZAR (PUT en bloque, solo lo que ha cambiado) =====
+            payloads = self._prepare_account_payloads(to_update, is_update=True)
+            batch_skipped, update_errors = self._bulk_update(
+                to_update, "accounts", payloads, outbox_entries, ACCOUNT_FIELD_MAP, 'sync_accounts'
+            )
+
+            errors.update(update_errors)
+            self._ack_outbox(outbox_entries, partners, errors)
+            skipped += batch_skipped
+            total += len(partners)
+        if not total:
             _logger.info("[sync_accounts] No hay partners que enviar (dominio=%s).", domain)
             return
-
-        _logger.info("[sync_accounts] Encontrados %d 'accounts' para enviar (dominio=%s).", len(partners), domain)
-
-        to_create = partners.filtered(lambda p: not p.forcemanager_id)
-        to_update = partners - to_create
-
-        # =========== CREAR (POST) => Fallback 1x1 para obtener la ID real ===========
-        if to_create:
-            for partner in to_create:
-                single_data = self._prepare_single_account_payload(partner, is_update=False)
-                resp = self.env['forcemanager.api']._perform_request("accounts", method='POST', payload=single_data)
-                if resp and resp.get('id'):
-                    partner.forcemanager_id = str(resp['id'])
-                partner.synced_with_forcemanager = True
-
-        # =========== ACTUALIZAR (PUT) en bulk, mantenemos el approach existente =====
-        if to_update:
-            endpoint_bulk_update = "accounts/bulk"
-            if to_update and self._has_bulk_endpoint(endpoint_bulk_update):
-                bulk_payload_update = []
-                for p in to_update:
-                    single_data = self._prepare_single_account_payload(p, is_update=True)
-                    bulk_payload_update.append({
-                        "guid": f"odoo_update_{p.id}",
-                        "data": single_data
-                    })
-                resp = self.env['forcemanager.api']._perform_request(endpoint_bulk_update, method='PUT', payload=bulk_payload_update)
-                self._process_bulk_update_response(resp, to_update)
-            else:
-                # Fallback 1x1
-                for p in to_update:
-                    single_data = self._prepare_single_account_payload(p, is_update=True)
-                    endpoint = f"accounts/{p.forcemanager_id}"
-                    self.env['forcemanager.api']._perform_request(endpoint, method='PUT', payload=single_data)
-                    p.synced_with_forcemanager = True
-
         self._update_last_sync_date('accounts')
-        _logger.info("[sync_accounts] Finalizada la sincronización de cuentas.")
+        _logger.info("[sync_accounts] Finalizada la sincronización de cuentas (%d sin cambios, omitidas).", skipped)
 
 
 
@@ -262,53 +408,32 @@ class OdooToForceManagerAPI(models.TransientModel):
     def sync_contacts(self):
         _logger.info("[sync_contacts] Iniciando envío de 'contacts' a FM.")
 
-        last_sync_date = self._get_last_sync_date('contacts')
-        domain = self._build_domain_for_odoo2fm(last_sync_date)
-        domain.insert(0, ('is_company', '=', False))
+        domain = [('is_company', '=', False)]
+        total = skipped = 0
+        for contacts, outbox_entries in self._iter_outbox_batches('res.partner', 'contacts', domain):
+            _logger.info("[sync_contacts] Encontrados %d 'contacts' para enviar (dominio=%s).", len(contacts), domain)
 
-        contacts = self.env['res.partner'].search(domain)
-        if not contacts:
-            _logger.info("[sync_contacts] No hay contactos que enviar (dominio=%s).", domain)
-            return
+            to_create = contacts.filtered(lambda c: not c.forcemanager_id)
+            to_update = contacts - to_create
 
-        _logger.info("[sync_contacts] Encontrados %d 'contacts' para enviar (dominio=%s).", len(contacts), domain)
-
-        to_create = contacts.filtered(lambda c: not c.forcemanager_id)
-        to_update = contacts - to_create
-
-        # =========== CREAR (POST) => 1x1 para obtener ID ===========
-        if to_create:
-            for c in to_create:
-                single_pl = self._prepare_single_contact_payload(c)
-                response = self.env['forcemanager.api']._perform_request("contacts", method='POST', payload=single_pl)
-                if response and isinstance(response, dict) and response.get('id'):
-                    c.forcemanager_id = response['id']
-                c.with_context(sync_from_forcemanager=True).write({'synced_with_forcemanager': True})
-
-        # =========== ACTUALIZAR =============
-        if to_update:
-            payload_update = []
-            for c in to_update:
-                payload_update.append({
-                    "guid": f"odoo_update_{c.id}",
-                    "data": self._prepare_single_contact_payload_for_update(c),
-                })
+            # =========== CREAR (POST en bloque, ID por guid) ===========
+            errors = self._bulk_create(to_create, "contacts", self._prepare_contact_payloads, 'sync_contacts')
 
-            endpoint_update = "contacts/bulk"
-            if payload_update and self._has_bulk_endpoint(endpoint_update):
-                _logger.info("[sync_contacts][BULK UPDATE] %d → %s", len(payload_update), endpoint_update)
-                resp = self.env['forcemanager.api']._perform_request(endpoint_update, method='PUT', payload=payload_update)
-                self._process_bulk_update_response(resp, to_update)
-            else:
-                _logger.warning("[sync_contacts] /contacts/bulk (PUT) no disponible. Fallback 1x1.")
-                for c in to_update:
-                    single_pl = self._prepare_single_contact_payload_for_update(c)
-                    ep = f"contacts/{c.forcemanager_id}"
-                    self.env['forcemanager.api']._perform_request(ep, method='PUT', payload=single_pl)
-                    c.with_context(sync_from_forcemanager=True).write({'synced_with_forcemanager': True})
+            # =========== ACTUALIZAR (PUT en bloque, solo lo que ha cambiado) =============
+            payloads = self._prepare_contact_payloads(to_update, is_update=True)
+            batch_skipped, update_errors = self._bulk_update(
+                to_update, "contacts", payloads, outbox_entries, CONTACT_FIELD_MAP, 'sync_contacts'
+            )
 
+            errors.update(update_errors)
+            self._ack_outbox(outbox_entries, contacts, errors)
+            skipped += batch_skipped
+            total += len(contacts)
+        if not total:
+            _logger.info("[sync_contacts] No hay contactos que enviar (dominio=%s).", domain)
+            return
         self._update_last_sync_date('contacts')
-        _logger.info("[sync_contacts] Finalizada la sincronización de contactos.")
+        _logger.info("[sync_contacts] Finalizada la sincronización de contactos (%d sin cambios, omitidos).", skipped)
 
         
     # -------------------------------------------------------------------------
@@ -325,42 +450,40 @@ class OdooToForceManagerAPI(models.TransientModel):
         self.verificar_productos_forcemanager_sincronizados()
 
         # 2) Filtrar productos Odoo que SÍ se deben subir/actualizar a FM
-        last_sync = self._get_last_sync_date('products')
-        domain = self._build_domain_for_odoo2fm(last_sync)
-        # Añadir condición: categoría con b2b_available = True
-        domain.insert(0, ('categ_id.b2b_available', '=', True))
-
-        products = self.env['product.template'].search(domain)
-        if not products:
+        # Condición: categoría con b2b_available = True (el resto se descarta de la cola)
+        domain = [('categ_id.b2b_available', '=', True)]
+        total = skipped = 0
+        for products, outbox_entries in self._iter_outbox_batches(
+                'product.template', 'products', domain, drop_unmatched=True):
+            _logger.info("[sync_products] Encontrados %d productos. (dominio=%s)", len(products), domain)
+
+            # Separamos en productos a CREAR (sin forcemanager_id) y a ACTUALIZAR (con forcemanager_id)
+            to_create = products.filtered(lambda p: not p.forcemanager_id)
+            to_update = products - to_create
+
+            # ============== CREAR productos en ForceManager (en bloque) ==============
+            errors = self._bulk_create(
+                to_create, "products", lambda recs: self._prepare_product_payloads(recs, is_create=True),
+                'sync_products'
+            )
+
+            # ============== ACTUALIZAR productos en ForceManager ==============
+            payloads = self._prepare_product_payloads(to_update, is_create=False)
+            batch_skipped, update_errors = self._bulk_update(
+                to_update, "products", payloads, outbox_entries, PRODUCT_FIELD_MAP, 'sync_products'
+            )
+
+            errors.update(update_errors)
+            self._ack_outbox(outbox_entries, products, errors)
+            skipped += batch_skipped
+            total += len(products)
+        if not total:
             _logger.info("[sync_products] No hay productos que enviar (dominio=%s).", domain)
             return
 
-        _logger.info("[sync_products] Encontrados %d productos. (dominio=%s)", len(products), domain)
-
-        # Separamos en productos a CREAR (sin forcemanager_id) y a ACTUALIZAR (con forcemanager_id)
-        to_create = products.filtered(lambda p: not p.forcemanager_id)
-        to_update = products - to_create
-
-        # ============== CREAR productos en ForceManager ==============
-        if to_create:
-            for prod in to_create:
-                data = self._prepare_single_product_payload_bulk(prod, is_create=True)
-                resp = self.env['forcemanager.api']._perform_request("products", method='POST', payload=data)
-                if resp and resp.get('id'):
-                    prod.forcemanager_id = str(resp['id'])
-                prod.synced_with_forcemanager = True
-
-        # ============== ACTUALIZAR productos en ForceManager ==============
-        if to_update:
-            for prod in to_update:
-                data = self._prepare_single_product_payload_bulk(prod, is_create=False)
-                endpoint = f"products/{prod.forcemanager_id}"
-                self.env['forcemanager.api']._perform_request(endpoint, method='PUT', payload=data)
-                prod.synced_with_forcemanager = True
-
         # Actualizamos la fecha de la última sincronización
         self._update_last_sync_date('products')
-        _logger.info("[sync_products] Sincronización de productos finalizada.")
+        _logger.info("[sync_products] Sincronización de productos finalizada (%d sin cambios, omitidos).", skipped)
 
     def verificar_productos_forcemanager_sincronizados(self):
         """
@@ -461,51 +584,36 @@ class OdooToForceManagerAPI(models.TransientModel):
     # -------------------------------------------------------------------------
     def sync_opportunities(self):
         _logger.info("[sync_opportunities] Iniciando envío de 'opportunities' a FM.")
-        last_sync_date = self._get_last_sync_date('opportunities')
-        domain = self._build_domain_for_odoo2fm(last_sync_date)
-
-        leads = self.env['crm.lead'].search(domain)
-        if not leads:
+        domain = []
+        total = skipped = 0
+        for leads, outbox_entries in self._iter_outbox_batches('crm.lead', 'opportunities', domain):
+            _logger.info("[sync_opportunities] Encontradas %d leads. (dominio=%s)", len(leads), domain)
+
+            to_create = leads.filtered(lambda l: not l.forcemanager_id)
+            to_update = leads - to_create
+
+            # =========== CREAR (POST en bloque, ID por guid) ===========
+            errors = self._bulk_create(
+                to_create, "opportunities", lambda recs: self._prepare_opportunity_payloads(recs, is_create=True),
+                'sync_opportunities'
+            )
+
+            # =========== ACTUALIZAR (PUT en bloque, solo lo que ha cambiado) ======
+            payloads = self._prepare_opportunity_payloads(to_update, is_create=False)
+            batch_skipped, update_errors = self._bulk_update(
+                to_update, "opportunities", payloads, outbox_entries, OPPORTUNITY_FIELD_MAP, 'sync_opportunities'
+            )
+
+            errors.update(update_errors)
+            self._ack_outbox(outbox_entries, leads, errors)
+            skipped += batch_skipped
+            total += len(leads)
+        if not total:
             _logger.info("[sync_opportunities] No hay leads que enviar (dominio=%s).", domain)
             return
-
-        _logger.info("[sync_opportunities] Encontradas %d leads. (dominio=%s)", len(leads), domain)
-
-        to_create = leads.filtered(lambda l: not l.forcemanager_id)
-        to_update = leads - to_create
-
-        # =========== CREAR (POST) => 1x1 para obtener ID ===========
-        if to_create:
-            for lead in to_create:
-                single_pl = self._prepare_single_opportunity_payload(lead, is_create=True)
-                resp = self.env['forcemanager.api']._perform_request("opportunities", method='POST', payload=single_pl)
-                if resp and isinstance(resp, dict) and resp.get('id'):
-                    lead.forcemanager_id = resp['id']
-                lead.synced_with_forcemanager = True
-
-        # =========== ACTUALIZAR (PUT) (en bulk o fallback) ======
-        if to_update:
-            payload_update = []
-            for lead in to_update:
-                payload_update.append({
-                    "guid": f"odoo_update_{lead.id}",
-                    "data": self._prepare_single_opportunity_payload(lead, is_create=False),
-                })
-
-            endpoint_update = "opportunities/bulk"
-            if payload_update and self._has_bulk_endpoint(endpoint_update):
-                resp = self.env['forcemanager.api']._perform_request(endpoint_update, method='PUT', payload=payload_update)
-                self._process_bulk_update_response(resp, to_update)
-            else:
-                _logger.warning("[sync_opportunities] /opportunities/bulk (PUT) no disponible. Fallback 1x1.")
-                for lead in to_update:
-                    single_pl = self._prepare_single_opportunity_payload(lead, is_create=False)
-                    ep = f"opportunities/{lead.forcemanager_id}"
-                    self.env['forcemanager.api']._perform_request(ep, method='PUT', payload=single_pl)
-                    lead.synced_with_forcemanager = True
-
         self._update_last_sync_date('opportunities')
-        _logger.info("[sync_opportunities] Finalizada la sincronización de oportunidades.")
+        _logger.info("[sync_opportunities] Finalizada la sincronización de oportunidades (%d sin cambios, omitidas).",
+                     skipped)
 
 
     
@@ -516,10 +624,39 @@ class OdooToForceManagerAPI(models.TransientModel):
     # -------------------------------------------------------------------------
     # PREPARAR PAYLOADS
     # -------------------------------------------------------------------------
+    # Los _prepare_*_payloads trabajan sobre recordsets: leen cada modelo relacionado
+    # una sola vez (read/search_read) y montan los payloads a partir de dicts.
+    # Los _prepare_single_* se mantienen como atajo para un solo registro.
+    def _read_related(self, model, rows, fname, related_fields):
+        """
+        Lee de una vez los registros de `model` referenciados por rows[*][fname]
+        (ids en crudo, read(load=None)) => {id: fila}.
+        """
+        ids = {row[fname] for row in rows if row[fname]}
+        if not ids:
+            return {}
+        records = self.env[model].browse(ids)
+        return {row['id']: row for row in records.read(related_fields, load=None)}
+
+    def _salesrep_value(self, user_row):
+        """Comercial de FM del usuario de Odoo (con fallback = {id=95, value='Joan Bonell'})."""
+        if user_row and user_row['forcemanager_id']:
+            return {'id': user_row['forcemanager_id'], 'value': user_row['name']}
+        return {'id': 95, 'value': 'Joan Bonell'}
+
+    def _country_value(self, country_row):
+        """{'id': country.forcemanager_id, 'value': country.name} o None."""
+        if country_row and country_row['forcemanager_id']:
+            return {'id': country_row['forcemanager_id'], 'value': country_row['name']}
+        return None
+
     def _prepare_single_account_payload(self, partner, is_update=False):
+        return self._prepare_account_payloads(partner, is_update=is_update)[partner.id]
+
+    def _prepare_account_payloads(self, partners, is_update=False):
         """
-        Construye el dict JSON para 'accounts' al enviar desde Odoo a ForceManager.
-        Incluye:
+        Construye el dict JSON para 'accounts' al enviar desde Odoo a ForceManager
+        => {id Odoo: payload}. Incluye:
         - 'id' = partner.forcemanager_id (solo si is_update=True y lo tiene)
         - 'name' = partner.name
         - 'Z_nif' = partner.vat
@@ -528,158 +665,165 @@ class OdooToForceManagerAPI(models.TransientModel):
         - 'salesRepId1': { 'id': ..., 'value': ... } con el FM ID del usuario (o fallback)
         - 'countryId': { 'id': country.forcemanager_id, 'value': country.name } (si existe)
         """
-        payload = {}
-        if is_update and partner.forcemanager_id:
-            payload['id'] = partner.forcemanager_id
-
-        # 1) Recargo equivalencia
-        z_recargo_equivalencia = False
-        if (partner.property_account_position_id
-            and 'Recargo de Equivalencia' in partner.property_account_position_id.name):
-            z_recargo_equivalencia = True
-
-        # 2) Determinar salesRepId1 (con fallback = {id=95, value='Joan Bonell'})
-        if partner.user_id and partner.user_id.forcemanager_id:
-            salesrep_dict = {
-                'id': partner.user_id.forcemanager_id,
-                'value': partner.user_id.name,
-            }
-        else:
-            salesrep_dict = {
-                'id': 95,
-                'value': 'Joan Bonell'
-            }
-
-        # 3) countryId
-        country_dict = None
-        if partner.country_id and partner.country_id.forcemanager_id:
-            country_dict = {
-                'id': partner.country_id.forcemanager_id,
-                'value': partner.country_id.name,
-            }
-
-        # 4) Construcción del payload
-        payload.update({
-            'name': partner.name or "(Sin nombre)",
-            'address1': partner.street or "",
-            'address2': partner.street2 or "",
-            'city': partner.city or "",
-            'postcode': partner.zip or "",
-            'region': partner.state_id.name if partner.state_id else "",
-            'countryId': country_dict,   # En lugar de "country"
-            'phone': partner.phone or "",
-            'phone2': partner.mobile or "",
-            'email': partner.email or "",
-            'website': partner.website or "",
-            'comment': partner.comment or "",
-            'Z_nif': partner.vat or "",
-            'Z_Nombre_Comercial': getattr(partner, 'comercial', "") or "",
-            'Z_Recargo_de_equivalencia': z_recargo_equivalencia,
-            'salesRepId1': salesrep_dict,
-        })
-        return payload
-
-
+        fnames = [
+            'forcemanager_id', 'name', 'street', 'street2', 'city', 'zip', 'state_id', 'country_id',
+            'phone', 'mobile', 'email', 'website', 'comment', 'vat', 'property_account_position_id', 'user_id',
+        ]
+        has_comercial = 'comercial' in partners._fields
+        if has_comercial:
+            fnames.append('comercial')
+        rows = partners.read(fnames, load=None)
+        users = self._read_related('res.users', rows, 'user_id', ['forcemanager_id', 'name'])
+        countries = self._read_related('res.country', rows, 'country_id', ['forcemanager_id', 'name'])
+        states = self._read_related('res.country.state', rows, 'state_id', ['name'])
+        positions = self._read_related('account.fiscal.position', rows, 'property_account_position_id', ['name'])
+
+        payloads = {}
+        for row in rows:
+            payload = {}
+            if is_update and row['forcemanager_id']:
+                payload['id'] = row['forcemanager_id']
+
+            # 1) Recargo equivalencia
+            position = positions.get(row['property_account_position_id'])
+            z_recargo_equivalencia = bool(position and 'Recargo de Equivalencia' in (position['name'] or ""))
+
+            state = states.get(row['state_id'])
+            payload.update({
+                'name': row['name'] or "(Sin nombre)",
+                'address1': row['street'] or "",
+                'address2': row['street2'] or "",
+                'city': row['city'] or "",
+                'postcode': row['zip'] or "",
+                'region': state['name'] if state else "",
+                'countryId': self._country_value(countries.get(row['country_id'])),   # En lugar de "country"
+                'phone': row['phone'] or "",
+                'phone2': row['mobile'] or "",
+                'email': row['email'] or "",
+                'website': row['website'] or "",
+                'comment': row['comment'] or "",
+                'Z_nif': row['vat'] or "",
+                'Z_Nombre_Comercial': (row['comercial'] if has_comercial else "") or "",
+                'Z_Recargo_de_equivalencia': z_recargo_equivalencia,
+                'salesRepId1': self._salesrep_value(users.get(row['user_id'])),
+            })
+            payloads[row['id']] = payload
+        return payloads
 
     def _prepare_single_contact_payload(self, contact):
+        return self._prepare_contact_payloads(contact)[contact.id]
+
+    def _prepare_contact_payloads(self, contacts, is_update=False):
         """
-        Payload para CREAR/ACTUALIZAR un contacto en FM.
+        Payloads para CREAR/ACTUALIZAR contactos en FM => {id Odoo: payload}.
+        - 'id' de FM solo si is_update=True
         - salesRepId => con fallback a {id=95, value='Joan Bonell'}
+        - accountId => empresa padre si está enlazada con FM
         - countryId => { 'id': X, 'value': Y } si existe
         """
-        # 1) Determinar salesRepId (con fallback)
-        if contact.user_id and contact.user_id.forcemanager_id:
-            fm_salesrep = {
-                'id': contact.user_id.forcemanager_id,
-                'value': contact.user_id.name
-            }
-        else:
-            fm_salesrep = {
-                'id': 95,
-                'value': 'Joan Bonell'
-            }
-
-        # 2) Determinar accountId
-        account_id_dict = None
-        if contact.parent_id and contact.parent_id.forcemanager_id:
-            account_id_dict = {
-                'id': contact.parent_id.forcemanager_id,
-                'value': contact.parent_id.name
-            }
-
-        # 3) countryId
-        country_val = None
-        if contact.country_id and contact.country_id.forcemanager_id:
-            country_val = {
-                'id': contact.country_id.forcemanager_id,
-                'value': contact.country_id.name,
-            }
-
-        # 4) Construcción final
-        return {
-            'firstName': contact.name or "",
-            'lastName': "",  # si quieres separar name en first/last, hacerlo aquí
-            'phone1': contact.phone or "",
-            'phone2': contact.mobile or "",
-            'email': contact.email or "",
-            'comment': contact.comment or "",
-            'typeId': {'id': 0, 'value': contact.function or ""},
-            'accountId': account_id_dict,
-            'salesRepId': fm_salesrep,
-            'UseCompanyAddress': False,
-            'address1': contact.street or "",
-            'address2': contact.street2 or "",
-            'city': contact.city or "",
-            'postcode': contact.zip or "",
-            'region': contact.state_id.name if contact.state_id else "",
-            'countryId': country_val,
-        }
+        rows = contacts.read([
+            'forcemanager_id', 'name', 'phone', 'mobile', 'email', 'comment', 'function', 'parent_id',
+            'user_id', 'street', 'street2', 'city', 'zip', 'state_id', 'country_id',
+        ], load=None)
+        users = self._read_related('res.users', rows, 'user_id', ['forcemanager_id', 'name'])
+        parents = self._read_related('res.partner', rows, 'parent_id', ['forcemanager_id', 'name'])
+        countries = self._read_related('res.country', rows, 'country_id', ['forcemanager_id', 'name'])
+        states = self._read_related('res.country.state', rows, 'state_id', ['name'])
+
+        payloads = {}
+        for row in rows:
+            payload = {'id': row['forcemanager_id']} if is_update else {}
+
+            parent = parents.get(row['parent_id'])
+            account_id_dict = None
+            if parent and parent['forcemanager_id']:
+                account_id_dict = {'id': parent['forcemanager_id'], 'value': parent['name']}
+
+            state = states.get(row['state_id'])
+            payload.update({
+                'firstName': row['name'] or "",
+                'lastName': "",  # si quieres separar name en first/last, hacerlo aquí
+                'phone1': row['phone'] or "",
+                'phone2': row['mobile'] or "",
+                'email': row['email'] or "",
+                'comment': row['comment'] or "",
+                'typeId': {'id': 0, 'value': row['function'] or ""},
+                'accountId': account_id_dict,
+                'salesRepId': self._salesrep_value(users.get(row['user_id'])),
+                'UseCompanyAddress': False,
+                'address1': row['street'] or "",
+                'address2': row['street2'] or "",
+                'city': row['city'] or "",
+                'postcode': row['zip'] or "",
+                'region': state['name'] if state else "",
+                'countryId': self._country_value(countries.get(row['country_id'])),
+            })
+            payloads[row['id']] = payload
+        return payloads
 
+    def _prepare_single_contact_payload_for_update(self, contact):
+        """
+        Payload para ACTUALIZAR un contacto en FM: el de `_prepare_single_contact_payload`
+        más el 'id' de FM.
+        """
+        return self._prepare_contact_payloads(contact, is_update=True)[contact.id]
 
     def _prepare_single_product_payload_bulk(self, product, is_create=True):
+        return self._prepare_product_payloads(product, is_create=is_create)[product.id]
+
+    def _prepare_product_payloads(self, products, is_create=True):
         """
-        Construye el 'data' para la exportación en /products/bulk (POST/PUT).
+        Construye el 'data' para la exportación en /products/bulk (POST/PUT) => {id Odoo: data}.
         Enviamos:
         - model => product.name
         - description => product.description_sale
         - price => product.list_price
         - cost => product.standard_price
         - categoryId => int(product.categ_id.forcemanager_id) si existe
-        - stock => product.qty_available
-        """
-        cat_id = False
-        if product.categ_id and product.categ_id.forcemanager_id:
-            try:
-                cat_id = int(product.categ_id.forcemanager_id)
-            except ValueError:
-                cat_id = False
-
-        data_obj = {}
-        if not is_create and product.forcemanager_id:
-            # ForceManager exige mandar "id" como int
-            try:
-                data_obj['id'] = int(product.forcemanager_id)
-            except ValueError:
-                data_obj['id'] = 0  # en caso extremo
-
-        data_obj.update({
-            "extId": str(product.id),
-            "model": product.name or "(Sin nombre)",
-            # Usamos description_sale para que coincida con lo que recibimos del otro lado
-            "description": product.description_sale or "",
-            "price": product.list_price or 0.0,
-            "cost": product.standard_price or 0.0,
-            "maxDiscount": 0,
-            "permissionLevel": 2,
-            # Enviamos el stock disponible
-            "stock": product.qty_available or 0.0,
-            "notAvailable": False,
-            "readOnly": False,
-        })
-        if cat_id:
-            data_obj["categoryId"] = cat_id
-
-        return data_obj
+        - stock => product.qty_available (calculado una vez para todo el recordset)
+        """
+        rows = products.read([
+            'forcemanager_id', 'name', 'description_sale', 'list_price', 'standard_price',
+            'qty_available', 'categ_id',
+        ], load=None)
+        categories = self._read_related('product.category', rows, 'categ_id', ['forcemanager_id'])
+
+        payloads = {}
+        for row in rows:
+            cat_id = False
+            category = categories.get(row['categ_id'])
+            if category and category['forcemanager_id']:
+                try:
+                    cat_id = int(category['forcemanager_id'])
+                except ValueError:
+                    cat_id = False
+
+            data_obj = {}
+            if not is_create and row['forcemanager_id']:
+                # ForceManager exige mandar "id" como int
+                try:
+                    data_obj['id'] = int(row['forcemanager_id'])
+                except ValueError:
+                    data_obj['id'] = 0  # en caso extremo
+
+            data_obj.update({
+                "extId": str(row['id']),
+                "model": row['name'] or "(Sin nombre)",
+                # Usamos description_sale para que coincida con lo que recibimos del otro lado
+                "description": row['description_sale'] or "",
+                "price": row['list_price'] or 0.0,
+                "cost": row['standard_price'] or 0.0,
+                "maxDiscount": 0,
+                "permissionLevel": 2,
+                # Enviamos el stock disponible
+                "stock": row['qty_available'] or 0.0,
+                "notAvailable": False,
+                "readOnly": False,
+            })
+            if cat_id:
+                data_obj["categoryId"] = cat_id
+            payloads[row['id']] = data_obj
+        return payloads
 
 
     # -------------------------------------------------------------------------
@@ -687,61 +831,300 @@ class OdooToForceManagerAPI(models.TransientModel):
     # -------------------------------------------------------------------------
     def _has_bulk_endpoint(self, endpoint):
         """
-        Comprueba si FM soporta GET <endpoint>?limit=0 sin 404 => True.
-        Se usa igual en POST y PUT. 
+        Comprueba si FM soporta <endpoint> con GET <endpoint>?limit=0: 404 o 405 => False.
+        Cualquier otro error (500, conexión...) no demuestra que no exista => True
+        (si el envío bulk falla, sus elementos se quedan en la cola).
+        Se usa igual en POST y PUT.
         """
         test_url = endpoint + "?limit=0"
         _logger.info("[_has_bulk_endpoint] Probando GET: %s", test_url)
         try:
-            self.env['forcemanager.api']._perform_request(test_url, method='GET')
-            return True
-        except Exception as e:
-            _logger.warning("[_has_bulk_endpoint] => No soportado: %s", e)
-            return False
+            self.env['forcemanager.api']._perform_request(test_url, method='GET', raise_errors=True)
+        except ForceManagerRequestError as e:
+            if e.status_code in (404, 405):
+                _logger.warning("[_has_bulk_endpoint] => No soportado (HTTP %s): %s", e.status_code, endpoint)
+                return False
+            _logger.warning("[_has_bulk_endpoint] => Comprobación no concluyente (%s). Se usa bulk.", e)
+        return True
+
+    def _get_bulk_chunk_size(self):
+        """
+        Máximo de elementos por petición bulk (POST/PUT).
+        Configurable con forcemanager_integration.bulk_chunk_size (por defecto 100).
+        """
+        value = self.env['ir.config_parameter'].sudo().get_param('forcemanager_integration.bulk_chunk_size', '100')
+        try:
+            return max(int(value), 1)
+        except (TypeError, ValueError):
+            return 100
+
+    def _get_bulk_chunker(self, max_items=None):
+        """
+        Troceador de envíos bulk (ver _BulkChunker). Parámetros:
+        - forcemanager_integration.bulk_chunk_size: máximo de elementos (100).
+        - forcemanager_integration.bulk_max_bytes: máximo de bytes del JSON (500000).
+        - forcemanager_integration.bulk_target_seconds: latencia objetivo por petición (10).
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        try:
+            max_bytes = int(ICP.get_param('forcemanager_integration.bulk_max_bytes', '500000'))
+        except (TypeError, ValueError):
+            max_bytes = 500000
+        try:
+            target_seconds = float(ICP.get_param('forcemanager_integration.bulk_target_seconds', '10'))
+        except (TypeError, ValueError):
+            target_seconds = 10.0
+        return _BulkChunker(
+            max_items or self._get_bulk_chunk_size(), max_bytes, target_seconds,
+            self.env['forcemanager.api']._get_json_codec().dumps,
+        )
+
+    def _send_bulk_chunks(self, records, bulk_endpoint, method, build_item, process_response, log_tag,
+                          max_items=None):
+        """
+        Envía `records` a bulk_endpoint en bloques de `_get_bulk_chunker()`, uno detrás
+        de otro: cada bloque se serializa en streaming mientras se envía y su respuesta
+        se procesa con process_response(resp, registros_del_bloque) (=> {id Odoo: error})
+        antes de pasar al siguiente. Devuelve {id Odoo: error} de todos los bloques.
+        Un bloque sin respuesta (conexión caída, timeout) no interrumpe el envío: sus
+        elementos se dan por fallidos y se quedan en la cola, y los bloques correctos
+        se procesan (y se les hace `_ack`) normalmente.
+        """
+        Api = self.env['forcemanager.api']
+        chunker = self._get_bulk_chunker(max_items)
+        errors = {}
+        for ids, body in chunker.iter_bodies(records, build_item):
+            start = time.monotonic()
+            resp = Api._perform_request(
+                bulk_endpoint, method=method, data_stream=body,
+                restream=lambda ids=ids: chunker.body_for(records.browse(ids), build_item),
+            )
+            chunker.observe(len(ids), time.monotonic() - start)
+            _logger.info("[%s][BULK %s] %d → %s", log_tag, method, len(ids), bulk_endpoint)
+            if resp is None:
+                errors.update(dict.fromkeys(ids, "Bloque sin respuesta de FM (conexión o autenticación)"))
+                continue
+            errors.update(process_response(resp, records.browse(ids)))
+        _logger.info("[%s][BULK %s] %d elementos en %d peticiones (%d fallidos).",
+                     log_tag, method, len(records), chunker.requests, len(errors))
+        return errors
+
+    def _bulk_create(self, records, endpoint, build_payloads, log_tag):
+        """
+        Da de alta `records` en ForceManager.
+        - Con <endpoint>/bulk: POST por bloques acotados en elementos y bytes
+          (`_send_bulk_chunks`), cada uno con guid "odoo_create_<id>"; el ID de FM se asigna por guid
+          (`_process_bulk_create_response`).
+        - Sin bulk: fallback 1x1.
+        build_payloads(records) devuelve {id Odoo: 'data' de cada alta} (ver _prepare_*_payloads).
+        Devuelve {id Odoo: error} de las altas fallidas (se reintentan en el siguiente
+        ciclo; las altas no se reintentan en el mismo para no duplicar en FM).
+        El hash de lo creado se guarda en forcemanager.push.hash.
+        """
+        errors = {}
+        if not records:
+            return errors
+        Api = self.env['forcemanager.api']
+        PushHash = self.env['forcemanager.push.hash']
+        bulk_endpoint = f"{endpoint}/bulk"
+        payloads = build_payloads(records)
+
+        if not self._has_bulk_endpoint(bulk_endpoint):
+            _logger.warning("[%s] /%s (POST) no disponible. Fallback 1x1 (concurrente).", log_tag, bulk_endpoint)
+            results = Api._perform_requests_concurrent([
+                (rec.id, endpoint, 'POST', payloads[rec.id]) for rec in records
+            ])
+            fm_ids = {}
+            for rec in records:
+                resp = results.get(rec.id)
+                if resp and isinstance(resp, dict) and resp.get('id'):
+                    fm_ids[rec.id] = resp['id']
+                else:
+                    errors[rec.id] = "Sin ID en la respuesta de FM"
+            self._store_fm_ids(records, fm_ids)
+        else:
+            errors = self._send_bulk_chunks(
+                records, bulk_endpoint, 'POST',
+                lambda rec: {"guid": f"odoo_create_{rec.id}", "data": payloads[rec.id]},
+                self._process_bulk_create_response, log_tag,
+            )
+
+        PushHash._store(records._name, {
+            rid: PushHash._payload_hash(payloads[rid]) for rid in records.ids if rid not in errors
+        })
+        return errors
+
+    def _bulk_update(self, records, endpoint, payloads, outbox_entries, field_map, log_tag):
+        """
+        Envía a ForceManager las modificaciones de `records` (ya enlazados).
+        payloads: {id Odoo: payload completo de actualización}.
+        1) Omite (y marca como sincronizados) los registros cuyo payload tiene el
+           mismo hash que el último enviado correctamente (forcemanager.push.hash).
+        2) PUT en <endpoint>/bulk por bloques acotados en elementos y bytes, con guid
+           "odoo_update_<id>" y solo los campos cambiados (`_changed_fields_payload`).
+           Los elementos que fallan se reintentan UNA vez, solos y en bloques más
+           pequeños. Sin bulk: fallback 1x1.
+        3) Guarda el hash de lo enviado.
+        Devuelve (nº de registros omitidos por no tener cambios, {id Odoo: error}).
+        """
+        if not records:
+            return 0, {}
+        Api = self.env['forcemanager.api']
+        PushHash = self.env['forcemanager.push.hash']
+        hashes = {rid: PushHash._payload_hash(payload) for rid, payload in payloads.items()}
+        last_hashes = PushHash._get_hashes(records._name, records.ids)
+
+        unchanged = records.filtered(lambda r: last_hashes.get(r.id) == hashes[r.id])
+        if unchanged:
+            self.env['forcemanager.outbox']._mark_synced(unchanged)
+            _logger.info("[%s] %d registros sin cambios respecto al último envío: PUT omitido.",
+                         log_tag, len(unchanged))
+        to_send = records - unchanged
+        if not to_send:
+            return len(unchanged), {}
+
+        def build(rec):
+            return self._changed_fields_payload(rec, payloads[rec.id], outbox_entries, field_map)
+
+        bulk_endpoint = f"{endpoint}/bulk"
+        if self._has_bulk_endpoint(bulk_endpoint):
+            def build_item(rec):
+                return {"guid": f"odoo_update_{rec.id}", "data": build(rec)}
+
+            errors = self._send_bulk_chunks(
+                to_send, bulk_endpoint, 'PUT', build_item, self._process_bulk_update_response, log_tag
+            )
+            if errors:
+                retry_size = max(self._get_bulk_chunk_size() // 4, 1)
+                _logger.info("[%s] Reintentando %d elementos fallidos en bloques de %d.",
+                             log_tag, len(errors), retry_size)
+                errors = self._send_bulk_chunks(
+                    to_send.browse(list(errors)), bulk_endpoint, 'PUT', build_item,
+                    self._process_bulk_update_response, log_tag, max_items=retry_size,
+                )
+        else:
+            _logger.warning("[%s] /%s (PUT) no disponible. Fallback 1x1 (concurrente).", log_tag, bulk_endpoint)
+            results = Api._perform_requests_concurrent([
+                (rec.id, f"{endpoint}/{rec.forcemanager_id}", 'PUT', build(rec)) for rec in to_send
+            ])
+            errors = {rec.id: "Error en la petición (ver log)" for rec in to_send if results.get(rec.id) is None}
+            self.env['forcemanager.outbox']._mark_synced(to_send - to_send.browse(list(errors)))
+
+        PushHash._store(records._name, {rid: hashes[rid] for rid in to_send.ids if rid not in errors})
+        if errors:
+            _logger.warning("[%s] %d actualizaciones fallidas; se quedan pendientes en la cola.", log_tag, len(errors))
+        return len(unchanged), errors
+
+    def _ack_outbox(self, outbox_entries, records, errors):
+        """
+        Cierra un envío: quita de la cola lo enviado y deja los fallidos (errors =
+        {id Odoo: error}) pendientes, guardando su error para el siguiente ciclo.
+        """
+        Outbox = self.env['forcemanager.outbox']
+        Outbox._record_failures(outbox_entries, errors)
+        Outbox._ack(outbox_entries, set(records.ids) - set(errors))
+
+    def _bulk_item_error(self, item):
+        """
+        Error de un elemento de la respuesta bulk, o None si ha ido bien.
+        Cuenta como fallo un 'error'/'errors' o un status >= 400; se devuelve
+        "[código] mensaje" (truncado) para guardarlo en la cola.
+        """
+        if not isinstance(item, dict):
+            return "Elemento de respuesta no válido"
+        status = item.get('status') or item.get('statusCode')
+        error = item.get('error') or item.get('errors')
+        if not error and not (isinstance(status, int) and status >= 400):
+            return None
+        message = error or item.get('message') or ""
+        code = item.get('errorCode') or item.get('code') or status
+        return (f"[{code}] {message}" if code else str(message))[:500]
 
     def _process_bulk_create_response(self, response_list, recordset):
         """
-        Lee la respuesta, e.g. [{"id": X, "guid": "odoo_create_XX"}, ...]
+        Lee la respuesta, e.g. [{"id": X, "guid": "odoo_create_XX"}, ...], asigna
+        el ID de FM a cada registro por su guid y lo marca como sincronizado.
+        Devuelve {id Odoo: error} de los que no se han creado (con error o sin
+        elemento en la respuesta).
         """
         if not response_list or not isinstance(response_list, list):
             _logger.warning("[_process_bulk_create_response] Respuesta no es lista => no se mapea.")
-            return
+            return {rec.id: "Respuesta bulk no válida" for rec in recordset}
 
         guid_map = {f"odoo_create_{rec.id}": rec for rec in recordset}
+        fm_ids = {}
+        errors = {}
         for item in response_list:
-            guid = item.get('guid')
-            fm_id = item.get('id')
-            if guid and fm_id:
-                rec = guid_map.get(guid)
-                if rec:
-                    rec.forcemanager_id = str(fm_id)
-                    rec.synced_with_forcemanager = True
+            rec = guid_map.get(item.get('guid')) if isinstance(item, dict) else None
+            if not rec:
+                continue
+            error = self._bulk_item_error(item)
+            if not error and item.get('id'):
+                fm_ids[rec.id] = item['id']
+            else:
+                errors[rec.id] = error or "Sin ID en la respuesta de FM"
+                _logger.warning("[_process_bulk_create_response] Alta fallida guid=%s: %s",
+                                item.get('guid'), errors[rec.id])
+        for rec_id in set(recordset.ids) - set(fm_ids):
+            errors.setdefault(rec_id, "Sin elemento en la respuesta para el guid")
+        self._store_fm_ids(recordset, fm_ids)
+        return errors
+
+    def _store_fm_ids(self, records, fm_ids):
+        """
+        Guarda en bloque los IDs de FM de las altas correctas ({id Odoo: ID de FM}) y
+        las marca como sincronizadas: un UPDATE ... FROM (VALUES) sin pasar por write()
+        (ni cola de salida ni recálculo de enlaces por registro) y un único
+        `_link_records` en forcemanager.id.map.
+        """
+        fm_ids = {rid: fm_id for rid, fm_id in fm_ids.items() if fm_id}
+        if not fm_ids:
+            return
+        created = records.browse(list(fm_ids))
+        fnames = ['forcemanager_id', 'synced_with_forcemanager']
+        created.flush_recordset(fnames)
+        column_type = created._fields['forcemanager_id'].column_type[1]
+        execute_values(
+            self.env.cr._obj,
+            f"""
+            UPDATE "{created._table}" AS t
+               SET forcemanager_id = v.fm_id::{column_type}, synced_with_forcemanager = true
+              FROM (VALUES %s) AS v(id, fm_id)
+             WHERE t.id = v.id
+            """,
+            [(rid, str(fm_id)) for rid, fm_id in fm_ids.items()],
+        )
+        created.invalidate_recordset(fnames)
+        created.modified(fnames)
+        self.env['forcemanager.id.map']._link_records(created)
 
     def _process_bulk_update_response(self, response_list, recordset):
         """
-        Lee la respuesta, e.g. [{"id": X, "odoo_local_id": Y}, ...] (varía).
-        Normalmente => se marca synced = True.
+        Correlaciona la respuesta por guid ("odoo_update_<id>"): marca como
+        sincronizados los elementos correctos y devuelve {id Odoo: error} de los
+        fallidos o ausentes. Si la respuesta no trae ningún guid no hay forma de
+        saber qué ha fallado: se da el lote por bueno (con warning).
         """
         if not response_list or not isinstance(response_list, list):
             _logger.warning("[_process_bulk_update_response] Respuesta no es lista => no se mapea.")
-            return
-
-        # Normalmente en PUT ya había forcemanager_id => lo marcamos True
-        # Detectamos 'odoo_local_id' si lo hay:
-        local_ids = {}
-        for item in response_list:
-            local_id = item.get('odoo_local_id')
-            if local_id:
-                local_ids[local_id] = item.get('id')
-
-        if local_ids:
-            # Si la API devuelven local_id => actualizamos 1 a 1
-            for rec in recordset:
-                if rec.id in local_ids:
-                    rec.synced_with_forcemanager = True
-        else:
-            # Marcamos todos directamente
-            recordset.write({'synced_with_forcemanager': True})
+            return {rec.id: "Respuesta bulk no válida" for rec in recordset}
+
+        guid_map = {f"odoo_update_{rec.id}": rec for rec in recordset}
+        items = {item.get('guid'): item for item in response_list if isinstance(item, dict) and item.get('guid')}
+        if not items:
+            _logger.warning("[_process_bulk_update_response] Respuesta sin guid => se marca todo el lote.")
+            self.env['forcemanager.outbox']._mark_synced(recordset)
+            return {}
+
+        errors = {}
+        for guid, rec in guid_map.items():
+            item = items.get(guid)
+            error = self._bulk_item_error(item) if item else "Sin elemento en la respuesta para el guid"
+            if error:
+                errors[rec.id] = error
+                _logger.warning("[_process_bulk_update_response] Actualización fallida guid=%s: %s", guid, error)
+        self.env['forcemanager.outbox']._mark_synced(recordset - recordset.browse(list(errors)))
+        return errors
 
     def _assign_fm_id_single_create(self, response_list, record):
         """
@@ -753,60 +1136,58 @@ class OdooToForceManagerAPI(models.TransientModel):
             item = response_list[0]
             fm_id = item.get('id')
             if fm_id:
-                record.forcemanager_id = str(fm_id)
-                record.synced_with_forcemanager = True
+                self._store_fm_ids(record, {record.id: fm_id})
 
     
 
     def _prepare_single_opportunity_payload(self, lead, is_create=True):
+        return self._prepare_opportunity_payloads(lead, is_create=is_create)[lead.id]
+
+    def _prepare_opportunity_payloads(self, leads, is_create=True):
         """
-        Construye el payload para las oportunidades (crm.lead).
+        Construye los payloads para las oportunidades (crm.lead) => {id Odoo: payload}.
         - salesRepId => con fallback a {id=95, value='Joan Bonell'}
         """
-        # 1) Determinar accountId1
-        fm_account_id = None
-        if lead.partner_id and lead.partner_id.forcemanager_id:
-            fm_account_id = {
-                'id': lead.partner_id.forcemanager_id,
-                'value': lead.partner_id.name
-            }
-
-        # 2) Determinar statusId (etapa)
-        fm_stage = {'value': lead.stage_id.name} if lead.stage_id else None
-
-        # 3) Comercial => salesRepId con fallback
-        if lead.user_id and lead.user_id.forcemanager_id:
-            fm_salesrep = {
-                'id': lead.user_id.forcemanager_id,
-                'value': lead.user_id.name
-            }
-        else:
-            fm_salesrep = {
-                'id': 95,
-                'value': 'Joan Bonell'
-            }
-
-        # 4) Probabilidad => se suele mandar como 0..1, por lo que lead.probability/100
-        fm_prob = (lead.probability or 0.0) / 100.0
-
-        # 5) Construcción del payload
-        payload = {}
-        if not is_create and lead.forcemanager_id:
-            payload['id'] = lead.forcemanager_id
-
-        payload.update({
-            'reference': lead.name or "(Sin nombre)",
-            'accountId1': fm_account_id,
-            'statusId': fm_stage,
-            'salesRepId': fm_salesrep,
-            'comments': lead.description or "",
-            'total': lead.expected_revenue or 0.0,
-            'salesProbability': fm_prob,
-        })
-
-        # 6) Fecha forecast
-        if lead.date_deadline:
-            payload['salesForecastDate'] = f"{lead.date_deadline}T00:00:00Z"
-
-        return payload
+        rows = leads.read([
+            'forcemanager_id', 'name', 'partner_id', 'stage_id', 'user_id', 'description',
+            'expected_revenue', 'probability', 'date_deadline',
+        ], load=None)
+        partners = self._read_related('res.partner', rows, 'partner_id', ['forcemanager_id', 'name'])
+        stages = self._read_related('crm.stage', rows, 'stage_id', ['name'])
+        users = self._read_related('res.users', rows, 'user_id', ['forcemanager_id', 'name'])
+
+        payloads = {}
+        for row in rows:
+            # 1) Determinar accountId1
+            partner = partners.get(row['partner_id'])
+            fm_account_id = None
+            if partner and partner['forcemanager_id']:
+                fm_account_id = {'id': partner['forcemanager_id'], 'value': partner['name']}
+
+            # 2) Determinar statusId (etapa)
+            stage = stages.get(row['stage_id'])
+            fm_stage = {'value': stage['name']} if stage else None
+
+            # 3) Probabilidad => se suele mandar como 0..1, por lo que lead.probability/100
+            fm_prob = (row['probability'] or 0.0) / 100.0
+
+            # 4) Construcción del payload
+            payload = {}
+            if not is_create and row['forcemanager_id']:
+                payload['id'] = row['forcemanager_id']
+
+            payload.update({
+                'reference': row['name'] or "(Sin nombre)",
+                'accountId1': fm_account_id,
+                'statusId': fm_stage,
+                'salesRepId': self._salesrep_value(users.get(row['user_id'])),
+                'comments': row['description'] or "",
+                'total': row['expected_revenue'] or 0.0,
+                'salesProbability': fm_prob,
+            })
 
+            # 5) Fecha forecast
+            if row['date_deadline']:
+                payload['salesForecastDate'] = f"{row['date_deadline']}T00:00:00Z"
+            payloads[row['id']] = payload
+        return payloads
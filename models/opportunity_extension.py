@@ -14,18 +14,27 @@ class CrmLead(models.Model):
     forcemanager_opportunity_id = fields.Integer(string='FM Opportunity ID', copy=False, index=True)
     forcemanager_salesrep_id = fields.Integer(string='FM SalesRep ID', copy=False, index=True)
     synced_with_forcemanager = fields.Boolean(string='Synced with ForceManager', default=False)
+
+    def init(self):
+        super().init()
+        # Índices compuestos/parciales de la sincronización (ver forcemanager_indexes.py)
+        self.env['forcemanager.db.index']._ensure_indexes(self._table)
     
     @api.model
     def create(self, vals):
         if not self.env.context.get('sync_from_forcemanager'):
             vals['synced_with_forcemanager'] = False
         lead = super(CrmLead, self).create(vals)
+        self.env['forcemanager.outbox']._enqueue_records(lead, full=True)
         return lead
 
     def write(self, vals):
         res = super(CrmLead, self).write(vals)
-        if not self.env.context.get('sync_from_forcemanager'):
-            self.filtered(lambda l: l.synced_with_forcemanager).write({'synced_with_forcemanager': False})
+        self.env['forcemanager.id.map']._refresh_links_on_write(self, vals)
+        # Encola y baja synced_with_forcemanager en bloque (salvo desde la sincronización)
+        self.env['forcemanager.outbox']._enqueue_records(self, vals)
         return res
 
-    
+    def unlink(self):
+        self.env['forcemanager.id.map']._forget(self._name, self.ids)
+        return super(CrmLead, self).unlink()
@@ -1,5 +1,5 @@
 # models/order_extension.py
-from odoo import fields, models
+from odoo import api, fields, models
 
 class SaleOrder(models.Model):
     _inherit = 'sale.order'
@@ -8,4 +8,25 @@ class SaleOrder(models.Model):
     forcemanager_status = fields.Char(string='ForceManager Status')
     synced_with_forcemanager = fields.Boolean(string='Synced with ForceManager', default=False)
     x_entrega_mismo_comercial = fields.Selection(selection=[('si', 'Si'), ('no', 'No')],
-        string="Entrega mismo comercial")
\ No newline at end of file
+        string="Entrega mismo comercial")
+
+    def init(self):
+        super().init()
+        # Índices compuestos/parciales de la sincronización (ver forcemanager_indexes.py)
+        self.env['forcemanager.db.index']._ensure_indexes(self._table)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        orders = super().create(vals_list)
+        self.env['forcemanager.outbox']._enqueue_records(orders, full=True)
+        return orders
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env['forcemanager.id.map']._refresh_links_on_write(self, vals)
+        self.env['forcemanager.outbox']._enqueue_records(self, vals)
+        return res
+
+    def unlink(self):
+        self.env['forcemanager.id.map']._forget(self._name, self.ids)
+        return super().unlink()
@@ -1,6 +1,9 @@
 # models/partner_extension.py
 from odoo import fields, models, api
 import logging
+import time
+
+from .forcemanager_tools import normalize_email, normalize_vat
 
 _logger = logging.getLogger(__name__)
 
@@ -13,6 +16,71 @@ class ResPartner(models.Model):
     forcemanager_country_id = fields.Integer(string='FM Country ID', copy=False, index=True)
     forcemanager_country = fields.Char(string='FM Country Str', copy=False, index=True)
     synced_with_forcemanager = fields.Boolean(string='Synced with ForceManager', default=False)
+    # Claves de matching indexadas (ver forcemanager.import / forcemanager.to.odoo)
+    fm_vat_normalized = fields.Char(
+        string='NIF normalizado (FM)', compute='_compute_fm_match_keys', store=True, index=True,
+        help="NIF sin espacios ni prefijo de país, para buscar duplicados por igualdad."
+    )
+    fm_email_normalized = fields.Char(
+        string='Email normalizado (FM)', compute='_compute_fm_match_keys', store=True, index=True,
+        help="Email en minúsculas, para buscar duplicados por igualdad."
+    )
+
+    @api.depends('vat', 'email')
+    def _compute_fm_match_keys(self):
+        for partner in self:
+            partner.fm_vat_normalized = normalize_vat(partner.vat) or False
+            partner.fm_email_normalized = normalize_email(partner.email) or False
+
+    def init(self):
+        super().init()
+        # Índices compuestos/parciales de la sincronización (ver forcemanager_indexes.py)
+        self.env['forcemanager.db.index']._ensure_indexes(self._table)
+
+    def _fields_sync(self, values):
+        """
+        Durante la sincronización entrante (contexto fm_defer_fields_sync) no se
+        propaga en cada write(); se apunta qué campos han cambiado por partner y
+        se aplica una sola vez en `_flush_deferred_fields_sync`.
+        """
+        if not self.env.context.get('fm_defer_fields_sync'):
+            return super()._fields_sync(values)
+        data = self.env.cr.precommit.data
+        deferred = data.setdefault('forcemanager_deferred_fields_sync', {})
+        if not data.get('forcemanager_deferred_fields_sync_hook'):
+            # Red de seguridad (una vez por transacción): si nadie cierra el bloque,
+            # se aplica antes del commit
+            data['forcemanager_deferred_fields_sync_hook'] = True
+            self.env.cr.precommit.add(self._flush_deferred_fields_sync)
+        for partner in self:
+            deferred.setdefault(partner.id, set()).update(values)
+        data['forcemanager_deferred_fields_sync_calls'] = (
+            data.get('forcemanager_deferred_fields_sync_calls', 0) + len(self)
+        )
+
+    @api.model
+    def _discard_deferred_fields_sync(self):
+        """Descarta las propagaciones pendientes (bloque fallido: sus escrituras se deshacen)."""
+        data = self.env.cr.precommit.data
+        data.pop('forcemanager_deferred_fields_sync', None)
+        data.pop('forcemanager_deferred_fields_sync_calls', None)
+
+    @api.model
+    def _flush_deferred_fields_sync(self):
+        """
+        Aplica las propagaciones pendientes (una por partner, con sus valores actuales).
+        Devuelve {'calls': propagaciones solicitadas, 'partners': aplicadas, 'time': segundos}.
+        """
+        data = self.env.cr.precommit.data
+        deferred = data.pop('forcemanager_deferred_fields_sync', None) or {}
+        calls = data.pop('forcemanager_deferred_fields_sync_calls', 0)
+        start = time.perf_counter()
+        Partner = self.with_context(fm_defer_fields_sync=False)
+        for partner in Partner.browse(list(deferred)).exists():
+            fnames = [fname for fname in deferred[partner.id] if fname in partner._fields]
+            values = partner._convert_to_write({fname: partner[fname] for fname in fnames})
+            partner._fields_sync(values)
+        return {'calls': calls, 'partners': len(deferred), 'time': time.perf_counter() - start}
 
     @api.model
     def create(self, vals):
@@ -23,25 +91,22 @@ class ResPartner(models.Model):
         if not self.env.context.get('sync_from_forcemanager'):
             vals['synced_with_forcemanager'] = False
         partner = super(ResPartner, self).create(vals)
+        self.env['forcemanager.outbox']._enqueue_records(partner, full=True)
         return partner
 
     def write(self, vals):
         """
         Sobrescribimos write para que, si se actualiza cualquier campo en Odoo
-        (y no viene del contexto sync_from_forcemanager), se ponga
-        synced_with_forcemanager=False.
+        (y no viene del contexto sync_from_forcemanager), el partner pase a la cola
+        de salida y quede con synced_with_forcemanager=False (un único UPDATE
+        en bloque, ver forcemanager.outbox._mark_unsynced).
         """
-        # Si la bandera está en el contexto, evitamos ejecutar la lógica para evitar bucles
-        if self.env.context.get('avoid_forcemanager_loop'):
-            return super(ResPartner, self).write(vals)
-
         res = super(ResPartner, self).write(vals)
 
-        if not self.env.context.get('sync_from_forcemanager'):
-            # Marcamos como no sincronizado solo los que estaban True,
-            # pero usamos una bandera de contexto para evitar recursión
-            self.filtered(lambda p: p.synced_with_forcemanager).with_context(
-                avoid_forcemanager_loop=True
-            ).write({'synced_with_forcemanager': False})
-            _logger.info("[ResPartner] Marcados como 'no sincronizados' (synced_with_forcemanager=False) tras update.")
+        self.env['forcemanager.id.map']._refresh_links_on_write(self, vals)
+        self.env['forcemanager.outbox']._enqueue_records(self, vals)
         return res
+
+    def unlink(self):
+        self.env['forcemanager.id.map']._forget(self._name, self.ids)
+        return super(ResPartner, self).unlink()
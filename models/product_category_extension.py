@@ -13,6 +13,15 @@ class ProductCategory(models.Model):
         help="Guarda el ID de la categoría en ForceManager"
     )
 
+    def write(self, vals):
+        res = super().write(vals)
+        self.env['forcemanager.id.map']._refresh_links_on_write(self, vals)
+        return res
+
+    def unlink(self):
+        self.env['forcemanager.id.map']._forget(self._name, self.ids)
+        return super().unlink()
+
     @api.model
     def sync_categories_to_forcemanager_on_init(self):
         _logger.info("[sync_categories_to_forcemanager_on_init] INICIO")
@@ -18,6 +18,11 @@ class ProductTemplate(models.Model):
         default=False
     )
 
+    def init(self):
+        super().init()
+        # Índices compuestos/parciales de la sincronización (ver forcemanager_indexes.py)
+        self.env['forcemanager.db.index']._ensure_indexes(self._table)
+
         
     @api.model
     def export_all_products_to_forcemanager(self):
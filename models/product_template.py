@@ -1,6 +1,6 @@
 # models/product_template.py
 
-from odoo import models, fields
+from odoo import api, models, fields
 
 class ProductTemplate(models.Model):
     _inherit = 'product.template'
@@ -19,17 +19,29 @@ class ProductTemplate(models.Model):
         # Guardamos el resultado del super() primero
         res = super().write(vals)
 
+        # Si cambia el ID de FM (POST, borrado en FM...), actualizamos el mapeo de IDs
+        self.env['forcemanager.id.map']._refresh_links_on_write(self, vals)
+
         # Comprobamos si se está llamando con un contexto especial
         # que indique que viene "desde ForceManager" (para no caer en bucles)
         if not self.env.context.get('sync_from_forcemanager'):
             # Definimos los campos que si cambian, queremos marcar 'synced_with_forcemanager' = False
-            campos_relevantes = {'name', 'list_price', 'standard_price', 'default_code', 
+            campos_relevantes = {'name', 'list_price', 'standard_price', 'default_code', 'description_sale',
                                  'categ_id', 'uom_id', 'uom_po_id', 'active'}
 
             # Si alguno de esos campos está en vals, es que ha cambiado
+            # (encolar ya marca synced_with_forcemanager=False con un único UPDATE)
             if campos_relevantes.intersection(vals.keys()):
-                for product_tmpl in self:
-                    if product_tmpl.synced_with_forcemanager:
-                        product_tmpl.synced_with_forcemanager = False
+                self.env['forcemanager.outbox']._enqueue_records(self, campos_relevantes.intersection(vals))
 
         return res
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        templates = super().create(vals_list)
+        self.env['forcemanager.outbox']._enqueue_records(templates, full=True)
+        return templates
+
+    def unlink(self):
+        self.env['forcemanager.id.map']._forget(self._name, self.ids)
+        return super().unlink()
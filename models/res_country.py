@@ -2,6 +2,8 @@
 
 from odoo import models, fields, api
 
+from .forcemanager_tools import normalize_name
+
 class ResCountry(models.Model):
     _inherit = 'res.country'
 
@@ -10,6 +12,27 @@ class ResCountry(models.Model):
         index=True,
         copy=False
     )
+    fm_name_normalized = fields.Char(
+        string='Nombre normalizado (FM)',
+        compute='_compute_fm_name_normalized',
+        store=True,
+        index=True,
+        help="Nombre sin acentos y en minúsculas, para buscar por igualdad el país que envía ForceManager."
+    )
+
+    @api.depends('name')
+    def _compute_fm_name_normalized(self):
+        for country in self:
+            country.fm_name_normalized = normalize_name(country.name) or False
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env['forcemanager.id.map']._refresh_links_on_write(self, vals)
+        return res
+
+    def unlink(self):
+        self.env['forcemanager.id.map']._forget(self._name, self.ids)
+        return super().unlink()
 
     @api.model
     def sync_countries_from_forcemanager(self):
@@ -55,3 +78,25 @@ class ResCountry(models.Model):
                     'code': iso2,
                     'forcemanager_id': fm_id,
                 })
+
+
+class ResCountryState(models.Model):
+    _inherit = 'res.country.state'
+
+    fm_name_normalized = fields.Char(
+        string='Nombre normalizado (FM)',
+        compute='_compute_fm_name_normalized',
+        store=True,
+        index=True,
+        help="Nombre sin acentos y en minúsculas, para buscar por igualdad la provincia ('region') de ForceManager."
+    )
+
+    @api.depends('name')
+    def _compute_fm_name_normalized(self):
+        for state in self:
+            state.fm_name_normalized = normalize_name(state.name) or False
+
+    def init(self):
+        super().init()
+        # Índices compuestos/parciales de la sincronización (ver forcemanager_indexes.py)
+        self.env['forcemanager.db.index']._ensure_indexes(self._table)
@@ -5,5 +5,15 @@ class ResUsers(models.Model):
 
     forcemanager_id = fields.Integer(
         string="ForceManager ID",
+        index=True,
         help="ID del usuario en ForceManager"
     )
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env['forcemanager.id.map']._refresh_links_on_write(self, vals)
+        return res
+
+    def unlink(self):
+        self.env['forcemanager.id.map']._forget(self._name, self.ids)
+        return super().unlink()
@@ -8,17 +8,17 @@ class StockMove(models.Model):
     def _action_done(self, cancel_backorder=False):
         """
         Sobrescribimos la confirmación final de los movimientos de stock.
-        Tras realizar la operación estándar, para cada move afectado,
-        marcamos su 'product_tmpl_id' con synced_with_forcemanager=False,
-        a menos que venga desde la propia sincronización.
+        Tras realizar la operación estándar, las plantillas de los moves afectados
+        pasan a la cola de salida y quedan con synced_with_forcemanager=False
+        (una sola vez por plantilla, en bloque), a menos que venga desde la
+        propia sincronización.
         """
         moves = super()._action_done(cancel_backorder=cancel_backorder)
 
         if not self.env.context.get('sync_from_forcemanager'):
-            for move in moves:
-                # Obtenemos la plantilla
-                product_tmpl = move.product_id.product_tmpl_id
-                if product_tmpl.synced_with_forcemanager:
-                    product_tmpl.synced_with_forcemanager = False
+            # El stock es parte del payload de producto: una fila por plantilla en la cola
+            self.env['forcemanager.outbox']._enqueue_records(
+                moves.product_id.product_tmpl_id, ['qty_available']
+            )
 
         return moves
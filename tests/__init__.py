@@ -0,0 +1,21 @@
+from . import test_forcemanager_tools
+from . import test_forcemanager_id_map
+from . import test_forcemanager_api
+from . import test_bulk_chunker
+from . import test_forcemanager_logging
+from . import test_forcemanager_push_hash
+from . import test_forcemanager_outbox
+from . import test_bulk_responses
+from . import test_forcemanager_staging
+from . import test_bulk_endpoint
+from . import test_forcemanager_pending_ref
+from . import test_forcemanager_indexes
+from . import test_deferred_recompute
+from . import test_sync_opportunities
+from . import test_sync_products
+from . import test_forcemanager_import
+from . import test_write_partners
+from . import test_sync_context
+from . import test_changed_fields_payload
+from . import test_prepare_payloads
+from . import test_json_codec
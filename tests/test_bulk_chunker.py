@@ -0,0 +1,74 @@
+import json
+from collections import namedtuple
+
+from odoo.tests import BaseCase, tagged
+
+from ..models.odoo_to_forcemanager_api import _BulkChunker
+
+Rec = namedtuple('Rec', ['id'])
+
+
+def _dumps(obj):
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+
+def _build(rec):
+    return {'guid': f"odoo_create_{rec.id}", 'data': {'name': 'x' * 20}}
+
+
+@tagged('post_install', '-at_install')
+class TestBulkChunker(BaseCase):
+
+    def _chunks(self, chunker, records):
+        """[(ids, json decodificado)] de cada bloque, consumiendo el cuerpo antes de leer ids."""
+        chunks = []
+        for ids, body in chunker.iter_bodies(records, _build):
+            data = json.loads(b''.join(body))
+            chunks.append((list(ids), data))
+        return chunks
+
+    def test_splits_by_item_count(self):
+        chunker = _BulkChunker(3, 10 ** 6, 10, _dumps)
+        chunks = self._chunks(chunker, [Rec(i) for i in range(1, 8)])
+        self.assertEqual([ids for ids, _data in chunks], [[1, 2, 3], [4, 5, 6], [7]])
+        for ids, data in chunks:
+            self.assertEqual([item['guid'] for item in data], [f"odoo_create_{i}" for i in ids])
+
+    def test_splits_by_bytes_without_losing_items(self):
+        item_size = len(_dumps(_build(Rec(1))))
+        # Caben dos elementos por bloque: el tercero se guarda para el siguiente
+        chunker = _BulkChunker(100, 2 + item_size * 2 + 1, 10, _dumps)
+        chunks = self._chunks(chunker, [Rec(i) for i in range(1, 6)])
+        self.assertEqual([ids for ids, _data in chunks], [[1, 2], [3, 4], [5]])
+        for _ids, data in chunks:
+            self.assertLessEqual(len(_dumps(data)), chunker.max_bytes)
+
+    def test_oversized_item_goes_alone(self):
+        chunker = _BulkChunker(100, 10, 10, _dumps)
+        chunks = self._chunks(chunker, [Rec(1), Rec(2)])
+        self.assertEqual([ids for ids, _data in chunks], [[1], [2]])
+
+    def test_empty_records(self):
+        chunker = _BulkChunker(100, 10 ** 6, 10, _dumps)
+        self.assertEqual(self._chunks(chunker, []), [])
+
+    def test_observe_adapts_chunk_size(self):
+        chunker = _BulkChunker(100, 10 ** 6, 10, _dumps)
+        chunker.observe(100, 25)     # lento => la mitad
+        self.assertEqual(chunker.items, 50)
+        chunker.observe(50, 7)       # dentro del objetivo => igual
+        self.assertEqual(chunker.items, 50)
+        chunker.observe(50, 1)       # rápido => crece, sin pasar de max_items
+        self.assertEqual(chunker.items, 76)
+        for _i in range(5):
+            chunker.observe(chunker.items, 1)
+        self.assertEqual(chunker.items, 100)
+        self.assertEqual(chunker.requests, 8)
+
+    def test_body_for_repeats_chunk(self):
+        chunker = _BulkChunker(2, 10 ** 6, 10, _dumps)
+        records = [Rec(i) for i in range(1, 4)]
+        for ids, body in chunker.iter_bodies(records, _build):
+            sent = b''.join(body)
+            again = b''.join(chunker.body_for([Rec(i) for i in ids], _build))
+            self.assertEqual(json.loads(sent), json.loads(again))
@@ -0,0 +1,90 @@
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from odoo.tests import TransactionCase, tagged
+
+from ..models import forcemanager_api
+
+
+def _http_response(status_code, content=b''):
+    resp = MagicMock(status_code=status_code, content=content)
+    if status_code >= 400:
+        resp.raise_for_status.side_effect = requests.exceptions.HTTPError(f"{status_code} Error")
+    return resp
+
+
+@tagged('post_install', '-at_install')
+class TestBulkEndpointFallback(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.Api = self.env['forcemanager.api']
+        self.ToFm = self.env['odoo.to.forcemanager']
+        Partner = self.env['res.partner']
+        self.partners = Partner.browse()
+        for i in range(3):
+            self.partners |= Partner.create({'name': f'Cuenta 1x1 {i}', 'is_company': True})
+        token = patch.object(type(self.Api), '_get_access_token', return_value='token')
+        token.start()
+        self.addCleanup(token.stop)
+
+    def _probe(self, response):
+        with patch.object(forcemanager_api.requests, 'get', return_value=response):
+            return self.ToFm._has_bulk_endpoint('accounts/bulk')
+
+    def test_probe_reads_status_code(self):
+        self.assertFalse(self._probe(_http_response(404)))
+        self.assertFalse(self._probe(_http_response(405)))
+        # Un 500 no demuestra que el endpoint no exista
+        self.assertTrue(self._probe(_http_response(500)))
+        self.assertTrue(self._probe(_http_response(200, b'[]')))
+
+    def test_create_falls_back_to_single_posts(self):
+        p1, p2, p3 = self.partners
+        results = {p1.id: {'id': 9990301}, p2.id: None, p3.id: {'message': "sin id"}}
+
+        with patch.object(forcemanager_api.requests, 'get', return_value=_http_response(404)), \
+                patch.object(type(self.Api), '_perform_requests_concurrent', return_value=results) as concurrent, \
+                patch.object(type(self.ToFm), '_send_bulk_chunks') as bulk:
+            errors = self.ToFm._bulk_create(
+                self.partners, 'accounts', lambda recs: {rec.id: {'name': rec.name} for rec in recs}, 'test',
+            )
+
+        bulk.assert_not_called()
+        requests_sent = concurrent.call_args.args[0]
+        self.assertEqual(requests_sent, [(rec.id, 'accounts', 'POST', {'name': rec.name}) for rec in self.partners])
+        self.assertEqual(set(errors), {p2.id, p3.id})
+        self.assertEqual(p1.forcemanager_id, 9990301)
+        self.assertTrue(p1.synced_with_forcemanager)
+        self.assertFalse((p2 | p3).filtered('forcemanager_id'))
+
+    def test_update_falls_back_to_single_puts(self):
+        p1, p2, p3 = self.partners
+        for n, partner in enumerate(self.partners):
+            partner.write({'forcemanager_id': 9990310 + n})
+        self.partners.write({'synced_with_forcemanager': False})
+        payloads = {rec.id: {'id': rec.forcemanager_id, 'name': rec.name, 'phone': '600'} for rec in self.partners}
+        # p1 solo ha cambiado el teléfono => PUT parcial
+        outbox_entries = {p1.id: {'fields': {'phone'}, 'outbox_ids': []}}
+        field_map = {'phone': {'phone'}, 'name': {'name'}}
+        results = {p1.id: {}, p2.id: None, p3.id: {'id': p3.forcemanager_id}}
+
+        with patch.object(forcemanager_api.requests, 'get', return_value=_http_response(405)), \
+                patch.object(type(self.Api), '_perform_requests_concurrent', return_value=results) as concurrent, \
+                patch.object(type(self.ToFm), '_send_bulk_chunks') as bulk:
+            skipped, errors = self.ToFm._bulk_update(
+                self.partners, 'accounts', payloads, outbox_entries, field_map, 'test',
+            )
+
+        bulk.assert_not_called()
+        self.assertEqual(skipped, 0)
+        requests_sent = {key: (endpoint, method, payload)
+                         for key, endpoint, method, payload in concurrent.call_args.args[0]}
+        self.assertEqual(requests_sent[p1.id], (f'accounts/{p1.forcemanager_id}', 'PUT',
+                                                {'id': p1.forcemanager_id, 'phone': '600'}))
+        self.assertEqual(requests_sent[p2.id][2], payloads[p2.id])
+        self.assertEqual(set(errors), {p2.id})
+        self.assertEqual(self.partners.filtered('synced_with_forcemanager'), p1 | p3)
+        self.assertEqual(set(self.env['forcemanager.push.hash']._get_hashes('res.partner', self.partners.ids)),
+                         {p1.id, p3.id})
@@ -0,0 +1,94 @@
+import json
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestBulkResponses(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.ToFm = self.env['odoo.to.forcemanager']
+        Partner = self.env['res.partner']
+        self.partners = Partner.browse()
+        for i in range(4):
+            self.partners |= Partner.create({'name': f'Cuenta bulk {i}', 'is_company': True})
+        self.p1, self.p2, self.p3, self.p4 = self.partners
+
+    def test_create_response_correlated_by_guid(self):
+        errors = self.ToFm._process_bulk_create_response([
+            {'guid': f"odoo_create_{self.p1.id}", 'id': 9990001},
+            {'guid': f"odoo_create_{self.p2.id}", 'error': "NIF duplicado", 'errorCode': 'E1'},
+            {'guid': "odoo_create_0", 'id': 9990002},
+            {'guid': f"odoo_create_{self.p4.id}"},
+        ], self.partners)
+
+        self.assertEqual(errors, {
+            self.p2.id: "[E1] NIF duplicado",
+            self.p3.id: "Sin elemento en la respuesta para el guid",
+            self.p4.id: "Sin ID en la respuesta de FM",
+        })
+        self.assertEqual(self.p1.forcemanager_id, 9990001)
+        self.assertTrue(self.p1.synced_with_forcemanager)
+        self.assertFalse((self.partners - self.p1).filtered('forcemanager_id'))
+        self.assertEqual(self.env['forcemanager.id.map']._get_res_id('account', 9990001), self.p1.id)
+
+    def test_create_response_not_a_list(self):
+        errors = self.ToFm._process_bulk_create_response({}, self.partners)
+        self.assertEqual(set(errors), set(self.partners.ids))
+
+    def test_update_response_correlated_by_guid(self):
+        self.partners.write({'synced_with_forcemanager': False})
+        errors = self.ToFm._process_bulk_update_response([
+            {'guid': f"odoo_update_{self.p1.id}", 'status': 200},
+            {'guid': f"odoo_update_{self.p2.id}", 'status': 422, 'message': "Campo obligatorio"},
+            {'guid': f"odoo_update_{self.p4.id}"},
+        ], self.partners)
+
+        self.assertEqual(errors, {
+            self.p2.id: "[422] Campo obligatorio",
+            self.p3.id: "Sin elemento en la respuesta para el guid",
+        })
+        self.assertEqual(self.partners.filtered('synced_with_forcemanager'), self.p1 | self.p4)
+
+    def test_update_response_without_guids(self):
+        self.partners.write({'synced_with_forcemanager': False})
+        errors = self.ToFm._process_bulk_update_response([{'status': 200}], self.partners)
+        self.assertEqual(errors, {})
+        self.assertTrue(all(self.partners.mapped('synced_with_forcemanager')))
+
+    def test_ack_outbox_keeps_failures(self):
+        Outbox = self.env['forcemanager.outbox']
+        self.env.cr.execute("DELETE FROM forcemanager_outbox")
+        Outbox._enqueue('res.partner', self.partners.ids, ['name'])
+        entries = Outbox._peek('res.partner')
+        self.ToFm._ack_outbox(entries, self.partners, {self.p2.id: "[E1] NIF duplicado"})
+
+        self.assertEqual(set(Outbox._peek('res.partner')), {self.p2.id})
+        self.env.cr.execute("SELECT attempts, last_error FROM forcemanager_outbox")
+        self.assertEqual(self.env.cr.fetchall(), [(1, "[E1] NIF duplicado")])
+
+    def test_chunk_without_response_fails_only_its_items(self):
+        records = self.p1 | self.p2 | self.p3
+        sent = []
+
+        def fake_request(endpoint, method='GET', payload=None, custom_headers=None, data_stream=None, restream=None):
+            items = json.loads(b''.join(data_stream))
+            sent.append([item['guid'] for item in items])
+            if len(sent) == 1:
+                return None     # p.ej. conexión caída a mitad del envío
+            return [{'guid': item['guid'], 'id': 9990100 + n} for n, item in enumerate(items)]
+
+        Api = self.env['forcemanager.api']
+        with patch.object(type(Api), '_perform_request', side_effect=fake_request):
+            errors = self.ToFm._send_bulk_chunks(
+                records, 'accounts/bulk', 'POST',
+                lambda rec: {'guid': f"odoo_create_{rec.id}", 'data': {'name': rec.name}},
+                self.ToFm._process_bulk_create_response, 'test', max_items=2,
+            )
+
+        self.assertEqual(len(sent), 2)
+        self.assertEqual(set(errors), {self.p1.id, self.p2.id})
+        self.assertEqual(self.p3.forcemanager_id, 9990100)
+        self.assertFalse((self.p1 | self.p2).filtered('forcemanager_id'))
@@ -0,0 +1,45 @@
+from odoo.tests import TransactionCase, tagged
+
+from ..models.odoo_to_forcemanager_api import ACCOUNT_FIELD_MAP, CONTACT_FIELD_MAP
+
+
+@tagged('post_install', '-at_install')
+class TestChangedFieldsPayload(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.ToFm = self.env['odoo.to.forcemanager']
+        self.partner = self.env['res.partner'].create({'name': 'Cuenta PUT', 'is_company': True})
+        self.payload = {
+            'id': 9990401, 'name': 'Cuenta PUT', 'phone': '600', 'phone2': '700',
+            'city': 'Jaén', 'firstName': 'Ana', 'lastName': 'Pérez',
+        }
+
+    def _reduce(self, fields, field_map=ACCOUNT_FIELD_MAP):
+        entries = {self.partner.id: {'fields': fields, 'outbox_ids': []}} if fields is not None else {}
+        return self.ToFm._changed_fields_payload(self.partner, self.payload, entries, field_map)
+
+    def test_unknown_changes_send_full_payload(self):
+        # Sin fila en la cola, o una fila de alta (fields=None)
+        self.assertEqual(self._reduce(None), self.payload)
+        self.assertEqual(self._reduce(set()), self.payload)
+
+    def test_field_outside_map_sends_full_payload(self):
+        self.assertEqual(self._reduce({'phone', 'industry_id'}), self.payload)
+
+    def test_only_changed_keys_and_id(self):
+        self.assertEqual(self._reduce({'phone', 'city'}), {'id': 9990401, 'phone': '600', 'city': 'Jaén'})
+        # Un campo de Odoo puede afectar a varias claves de FM
+        self.assertEqual(self._reduce({'name'}, CONTACT_FIELD_MAP),
+                         {'id': 9990401, 'firstName': 'Ana', 'lastName': 'Pérez'})
+
+    def test_changes_accumulated_in_outbox(self):
+        self.env['ir.config_parameter'].sudo().set_param('forcemanager_integration.outbound_entities', 'accounts')
+        self.env.cr.execute("DELETE FROM forcemanager_outbox")
+        self.partner.write({'phone': '600'})
+        self.partner.write({'mobile': '700'})
+        entries = self.env['forcemanager.outbox']._peek('res.partner')
+        self.assertEqual(
+            self.ToFm._changed_fields_payload(self.partner, self.payload, entries, ACCOUNT_FIELD_MAP),
+            {'id': 9990401, 'phone': '600', 'phone2': '700'},
+        )
@@ -0,0 +1,55 @@
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestDeferredRecompute(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.ToOdoo = self.env['forcemanager.to.odoo']
+        self.Partner = self.env['res.partner']
+        self.company = self.Partner.create({'name': 'Cuenta diferida', 'is_company': True, 'city': 'Sevilla'})
+        self.child = self.Partner.create({'name': 'Hijo', 'parent_id': self.company.id, 'type': 'contact'})
+
+    def _pending(self):
+        return self.env.cr.precommit.data.get('forcemanager_deferred_fields_sync')
+
+    def test_propagation_deferred_until_block_closes(self):
+        with self.ToOdoo._deferred_recompute('test') as to_odoo:
+            to_odoo.env['res.partner'].browse(self.company.id).write({'city': 'Cádiz'})
+            self.assertIn(self.company.id, self._pending())
+        self.assertFalse(self._pending())
+        self.assertEqual(self.child.city, 'Cádiz')
+
+    def test_failed_block_is_reverted_and_discarded(self):
+        with self.assertRaises(ValueError), self.ToOdoo._deferred_recompute('test') as to_odoo:
+            to_odoo.env['res.partner'].browse(self.company.id).write({'city': 'Cádiz'})
+            raise ValueError("fallo en la página")
+        self.assertFalse(self._pending())
+        self.company.invalidate_recordset()
+        self.assertEqual(self.company.city, 'Sevilla')
+        self.assertEqual(self.child.city, 'Sevilla')
+
+    def test_direct_mode_failed_page_keeps_previous_pages(self):
+        Api = self.env['forcemanager.api']
+        last_sync = fields.Datetime.from_string('2025-03-01 00:00:00')
+        Api.set_last_sync_date('contacts', last_sync)
+        env = self.env
+
+        def sync_page(page, cache):
+            env['res.partner'].create({'name': page[0]['name']})
+            if page[0]['name'] == 'Página rota':
+                raise ValueError("fallo en la página")
+            return len(page)
+
+        pages = [[{'name': 'Página buena'}], [{'name': 'Página rota'}]]
+        with patch.object(type(Api), '_iter_pages', return_value=iter(pages)), \
+                patch.object(type(self.ToOdoo), '_sync_contacts_page', side_effect=sync_page):
+            self.ToOdoo.sync_contacts()
+
+        self.assertTrue(self.Partner.search([('name', '=', 'Página buena')]))
+        self.assertFalse(self.Partner.search([('name', '=', 'Página rota')]))
+        self.assertEqual(Api.get_last_sync_date('contacts'), last_sync)
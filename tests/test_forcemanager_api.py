@@ -0,0 +1,183 @@
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from odoo import fields
+from odoo.tests import TransactionCase, tagged
+
+from ..models import forcemanager_api
+from ..models.forcemanager_api import ForceManagerRequestError
+
+
+def _http_response(status_code, content=b''):
+    """Respuesta de requests simulada: raise_for_status() falla con 4xx/5xx."""
+    resp = MagicMock(status_code=status_code, content=content)
+    if status_code >= 400:
+        resp.raise_for_status.side_effect = requests.exceptions.HTTPError(f"{status_code} Error")
+    return resp
+
+
+@tagged('post_install', '-at_install')
+class TestIterPages(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.Api = self.env['forcemanager.api']
+
+    def _iter(self, pages, page_size=2):
+        """Recorre _iter_pages con _perform_request devolviendo `pages` según la cabecera 'Page'."""
+        def fake_request(endpoint, method='GET', custom_headers=None, **kwargs):
+            page = int(custom_headers['Page'])
+            return pages[page] if page < len(pages) else []
+
+        with patch.object(type(self.Api), '_perform_request', side_effect=fake_request) as mock:
+            result = list(self.Api._iter_pages('accounts', page_size=page_size))
+        return result, mock.call_count
+
+    def test_stops_on_incomplete_page(self):
+        pages = [[{'id': 1}, {'id': 2}], [{'id': 3}]]
+        result, calls = self._iter(pages)
+        self.assertEqual(result, pages)
+        self.assertEqual(calls, 2)
+
+    def test_stops_on_empty_page(self):
+        pages = [[{'id': 1}, {'id': 2}], [{'id': 3}, {'id': 4}], []]
+        result, calls = self._iter(pages)
+        self.assertEqual(result, pages[:2])
+        self.assertEqual(calls, 3)
+
+    def test_stops_on_repeated_page(self):
+        # API que ignora 'Page': siempre devuelve la primera página
+        page = [{'id': 1}, {'id': 2}]
+        result, calls = self._iter([page] * 5)
+        self.assertEqual(result, [page])
+        self.assertEqual(calls, 2)
+
+    def test_accepts_results_envelope(self):
+        pages = [{'results': [{'id': 1}]}]
+        result, _calls = self._iter(pages)
+        self.assertEqual(result, [[{'id': 1}]])
+
+    def test_empty_body_ends_reading(self):
+        result, calls = self._iter([{}])
+        self.assertEqual(result, [])
+        self.assertEqual(calls, 1)
+
+    def _iter_http(self, responses):
+        """Recorre _iter_pages con requests.get devolviendo `responses` en orden (o lanzándolas)."""
+        result = []
+        with patch.object(type(self.Api), '_get_access_token', return_value='token'), \
+                patch.object(forcemanager_api.requests, 'get', side_effect=responses):
+            try:
+                for page in self.Api._iter_pages('accounts', page_size=2):
+                    result.append(page)
+            except ForceManagerRequestError as e:
+                return result, e
+        return result, None
+
+    def test_no_response(self):
+        # Un error HTTP a mitad de la lectura no es "fin de los datos"
+        result, error = self._iter_http([
+            _http_response(200, b'[{"id": 1}, {"id": 2}]'),
+            _http_response(500),
+        ])
+        self.assertEqual(result, [[{'id': 1}, {'id': 2}]])
+        self.assertIsInstance(error, ForceManagerRequestError)
+        self.assertEqual(error.status_code, 500)
+
+    def test_transport_error(self):
+        result, error = self._iter_http([requests.exceptions.ConnectionError("conexión caída")])
+        self.assertEqual(result, [])
+        self.assertIsInstance(error, ForceManagerRequestError)
+        self.assertIsNone(error.status_code)
+
+
+@tagged('post_install', '-at_install')
+class TestInterruptedReading(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.Api = self.env['forcemanager.api']
+        self.ToOdoo = self.env['forcemanager.to.odoo']
+        self.last_sync = fields.Datetime.from_string('2025-03-01 00:00:00')
+        self.Api.set_last_sync_date('contacts', self.last_sync)
+
+    def _fail_after_first_page(self, *args, **kwargs):
+        yield [{'id': 1}]
+        raise ForceManagerRequestError("500 Error", 500)
+
+    def test_sync_contacts_keeps_last_sync_date(self):
+        with patch.object(type(self.Api), '_iter_pages', side_effect=self._fail_after_first_page), \
+                patch.object(type(self.ToOdoo), '_sync_contacts_page', return_value=1) as sync_page:
+            self.ToOdoo.sync_contacts()
+        self.assertEqual(sync_page.call_count, 1)
+        self.assertEqual(self.Api.get_last_sync_date('contacts'), self.last_sync)
+
+    def test_staging_download_drops_interrupted_watermark(self):
+        Staging = self.env['forcemanager.staging.record']
+        ToOdoo = type(self.ToOdoo)
+
+        def pages(endpoint, *args, **kwargs):
+            if endpoint.startswith('contacts'):
+                return self._fail_after_first_page()
+            return iter([[{'id': 1}]])
+
+        with patch.object(type(self.Api), '_iter_pages', side_effect=pages), \
+                patch.object(ToOdoo, '_fetch_orders_since', return_value=[]), \
+                patch.object(ToOdoo, '_fetch_salesorder_lines_since', return_value={}):
+            _run_id, watermarks = Staging.download_to_staging()
+        self.assertEqual(set(watermarks), {'accounts', 'opportunities', 'orders'})
+
+
+@tagged('post_install', '-at_install')
+class TestStreamingRequest(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.Api = self.env['forcemanager.api']
+        self.addCleanup(patch.stopall)
+        patch.object(type(self.Api), '_get_access_token', return_value='token').start()
+        self.auth = patch.object(type(self.Api), '_authenticate').start()
+
+    def _send(self, responses, restream=None):
+        """POST en streaming con requests.request devolviendo `responses`; devuelve (resultado, cuerpos enviados)."""
+        sent = []
+
+        def fake_request(method, url, headers=None, data=None):
+            sent.append(b''.join(data))
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        with patch.object(forcemanager_api.requests, 'request', side_effect=fake_request), \
+                patch.object(forcemanager_api.requests, 'post') as post:
+            result = self.Api._perform_request(
+                'accounts/bulk', 'POST', data_stream=iter([b'[', b'{"guid":"a"}', b']']), restream=restream,
+            )
+        post.assert_not_called()
+        return result, sent
+
+    def test_stream_is_sent_as_body(self):
+        result, sent = self._send([_http_response(200, b'[{"guid": "a", "id": 1}]')])
+        self.assertEqual(result, [{'guid': 'a', 'id': 1}])
+        self.assertEqual(sent, [b'[{"guid":"a"}]'])
+
+    def test_unauthorized_resends_with_restream(self):
+        result, sent = self._send(
+            [_http_response(401), _http_response(200, b'[{"guid": "a", "id": 1}]')],
+            restream=lambda: iter([b'[{"guid":"a"}]']),
+        )
+        self.assertEqual(result, [{'guid': 'a', 'id': 1}])
+        self.assertEqual(sent, [b'[{"guid":"a"}]', b'[{"guid":"a"}]'])
+        self.auth.assert_called_once()
+
+    def test_unauthorized_without_restream_fails(self):
+        result, sent = self._send([_http_response(401)])
+        self.assertIsNone(result)
+        self.assertEqual(len(sent), 1)
+        self.auth.assert_called_once()
+
+    def test_transport_error_fails_the_body(self):
+        result, _sent = self._send([requests.exceptions.ConnectionError("conexión caída")])
+        self.assertIsNone(result)
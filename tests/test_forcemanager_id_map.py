@@ -0,0 +1,103 @@
+from odoo.tests import BaseCase, TransactionCase, tagged
+
+from ..models.forcemanager_id_map import _FmIdLruCache
+
+
+@tagged('post_install', '-at_install')
+class TestFmIdLruCache(BaseCase):
+
+    def test_get_put_and_stats(self):
+        cache = _FmIdLruCache()
+        cache.put_many('account', [(1, 10), (2, 20)])
+        self.assertEqual(cache.get_many('account', {1, 2, 3}), {1: 10, 2: 20})
+        # Las claves son por entidad
+        self.assertEqual(cache.get_many('contact', {1}), {})
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+
+    def test_evicts_least_recently_used(self):
+        cache = _FmIdLruCache()
+        cache.max_size = 2
+        cache.put_many('account', [(1, 10), (2, 20)])
+        cache.get_many('account', {1})          # 1 pasa a ser el más reciente
+        cache.put_many('account', [(3, 30)])    # sale 2
+        self.assertEqual(cache.get_many('account', {1, 2, 3}), {1: 10, 3: 30})
+
+    def test_evict_and_clear(self):
+        cache = _FmIdLruCache()
+        cache.put_many('user', [(1, 10), (2, 20)])
+        cache.evict([('user', 1), ('user', 99)])
+        self.assertEqual(cache.get_many('user', {1, 2}), {2: 20})
+        cache.clear()
+        self.assertEqual(cache.get_many('user', {2}), {})
+
+
+@tagged('post_install', '-at_install')
+class TestForceManagerIdMap(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.IdMap = self.env['forcemanager.id.map']
+
+    def test_unlink_forgets_country(self):
+        country = self.env['res.country'].create({'name': 'País FM test', 'code': 'XQ'})
+        country.write({'forcemanager_id': 987654})
+        self.assertEqual(self.IdMap._get_res_ids('country', [987654]), {987654: country.id})
+        country.unlink()
+        self.assertEqual(self.IdMap._get_res_ids('country', ['987654']), {})
+
+    def test_unlink_forgets_user(self):
+        user = self.env['res.users'].create({'name': 'Comercial FM test', 'login': 'fm_test_salesrep'})
+        user.write({'forcemanager_id': 876543})
+        self.assertEqual(self.IdMap._get_res_id('user', 876543), user.id)
+        user.unlink()
+        self.assertFalse(self.IdMap._get_res_id('user', 876543))
+
+    def test_reverted_savepoint_drops_cached_links(self):
+        partner = self.env['res.partner'].create({'name': 'Cuenta savepoint', 'is_company': True})
+        with self.assertRaises(ZeroDivisionError), self.IdMap._savepoint():
+            self.IdMap._link('account', 765432, partner.id)
+            self.assertEqual(self.IdMap._get_res_id('account', 765432), partner.id)
+            1 / 0
+        # Ni en la tabla ni en la caché en memoria
+        self.env.cr.execute("SELECT 1 FROM forcemanager_id_map WHERE entity_type = 'account' AND fm_id = 765432")
+        self.assertFalse(self.env.cr.fetchall())
+        self.assertFalse(self.IdMap._get_res_id('account', 765432))
+
+    def _map_rows(self, entity, fm_ids):
+        self.env.cr.execute(
+            "SELECT fm_id, res_model, res_id FROM forcemanager_id_map WHERE entity_type = %s AND fm_id = ANY(%s)",
+            (entity, list(fm_ids)),
+        )
+        return sorted(self.env.cr.fetchall())
+
+    def test_lookup_backfills_from_legacy_columns(self):
+        Partner = self.env['res.partner']
+        account = Partner.create({'name': 'Cuenta legacy', 'is_company': True})
+        contact = Partner.create({'name': 'Contacto legacy', 'is_company': False})
+        # Sin pasar por write(): como los datos previos a la tabla de mapeo
+        self.env.cr.execute("UPDATE res_partner SET forcemanager_id = 654001 WHERE id = %s", (account.id,))
+        self.env.cr.execute("UPDATE res_partner SET forcemanager_id = 654002 WHERE id = %s", (contact.id,))
+        self.env.invalidate_all()
+        self.assertFalse(self._map_rows('account', [654001]))
+
+        # Texto o entero; el contacto no es una cuenta
+        self.assertEqual(self.IdMap._get_res_ids('account', ['654001', 654002, 'x', None]), {654001: account.id})
+        self.assertEqual(self._map_rows('account', [654001]), [(654001, 'res.partner', account.id)])
+        self.assertEqual(self.IdMap._get_res_id('contact', '654002'), contact.id)
+
+    def test_char_and_dual_columns(self):
+        lead = self.env['crm.lead'].create({'name': 'Lead legacy'})
+        self.env.cr.execute("UPDATE crm_lead SET forcemanager_id = '654010' WHERE id = %s", (lead.id,))
+        self.env.invalidate_all()
+        self.assertEqual(self.IdMap._get_res_id('opportunity', 654010), lead.id)
+        self.assertEqual(self.IdMap._get_fm_ids('opportunity', [lead.id]), {lead.id: 654010})
+
+    def test_write_relinks_and_unlinks(self):
+        partner = self.env['res.partner'].create({'name': 'Cuenta re-enlazada', 'is_company': True})
+        partner.write({'forcemanager_id': 654020})
+        self.assertEqual(self.IdMap._get_res_id('account', 654020), partner.id)
+        partner.write({'forcemanager_id': 654021})
+        self.assertFalse(self.IdMap._get_res_id('account', 654020))
+        self.assertEqual(self.IdMap._get_fm_ids('account', partner.ids), {partner.id: 654021})
+        partner.write({'forcemanager_id': False})
+        self.assertFalse(self._map_rows('account', [654021]))
@@ -0,0 +1,68 @@
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestForceManagerImport(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.Import = self.env['forcemanager.import']
+        self.Api = self.env['forcemanager.api']
+        self.Partner = self.env['res.partner']
+        self.IdMap = self.env['forcemanager.id.map']
+
+    def _run(self, method, pages):
+        with patch.object(type(self.Api), '_iter_pages', return_value=iter(pages)):
+            getattr(self.Import, method)()
+
+    def test_build_partner_match_index(self):
+        linked = self.Partner.create({'name': 'Enlazada', 'is_company': True, 'vat': 'ESB55500001'})
+        linked.write({'forcemanager_id': 550100})
+        free = self.Partner.create({'name': 'Libre', 'is_company': True, 'vat': 'B-555.000.02'})
+        index = self.Import._build_partner_match_index(True, 'fm_vat_normalized')
+        self.assertIn(550100, index['fm_ids'])
+        self.assertEqual(index['by_key']['B55500001'], [linked.id, 550100])
+        self.assertEqual(index['by_key']['B55500002'], [free.id, 0])
+
+    def test_import_companies_matches_and_deduplicates(self):
+        already = self.Partner.create({'name': 'Ya enlazada', 'is_company': True})
+        already.write({'forcemanager_id': 550001})
+        by_vat = self.Partner.create({'name': 'Por NIF', 'is_company': True, 'vat': 'ESB55511111'})
+
+        self._run('import_companies_from_forcemanager', [
+            [
+                {'id': 550001, 'name': 'No se toca', 'Z_nif': 'B55599999'},
+                {'id': 550002, 'name': 'Por NIF (FM)', 'Z_nif': 'B-555.111.11'},
+                {'id': 550003, 'name': 'Nueva', 'Z_nif': 'B55522222'},
+                # Mismo NIF que la anterior en la misma página => no se duplica
+                {'id': 550004, 'name': 'Nueva (duplicada)', 'Z_nif': 'ES B55522222'},
+            ],
+            # Y tampoco en una página posterior
+            [{'id': 550005, 'name': 'Nueva (otra página)', 'Z_nif': 'B55522222'}],
+        ])
+
+        self.assertEqual(already.name, 'Ya enlazada')
+        self.assertEqual(by_vat.forcemanager_id, 550002)
+        self.assertEqual(by_vat.name, 'Por NIF (FM)')
+        self.assertEqual(self.IdMap._get_res_id('account', 550002), by_vat.id)
+
+        created = self.Partner.search([('fm_vat_normalized', '=', 'B55522222')])
+        self.assertEqual(len(created), 1)
+        self.assertEqual(created.forcemanager_id, 550003)
+        self.assertTrue(created.synced_with_forcemanager)
+        self.assertEqual(self.IdMap._get_res_id('account', 550003), created.id)
+        self.assertFalse(self.Partner.search([('forcemanager_id', 'in', [550004, 550005])]))
+
+    def test_import_contacts_matches_by_email(self):
+        contact = self.Partner.create({'name': 'Ana', 'email': 'Ana.FM@Example.com'})
+        self._run('import_contacts_from_forcemanager', [[
+            {'id': 551001, 'firstName': 'Ana', 'lastName': 'Pérez', 'email': ' ana.fm@example.COM '},
+            {'id': 551002, 'firstName': 'Luis', 'email': 'luis.fm@example.com'},
+            {'id': 551003, 'firstName': 'Luis', 'lastName': 'bis', 'email': 'LUIS.FM@example.com'},
+        ]])
+        self.assertEqual(contact.forcemanager_id, 551001)
+        self.assertEqual(contact.name, 'Ana Pérez')
+        luis = self.Partner.search([('fm_email_normalized', '=', 'luis.fm@example.com')])
+        self.assertEqual(luis.mapped('forcemanager_id'), [551002])
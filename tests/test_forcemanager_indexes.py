@@ -0,0 +1,42 @@
+from odoo.tests import TransactionCase, tagged
+
+from ..models.forcemanager_indexes import FM_INDEXES
+
+
+@tagged('post_install', '-at_install')
+class TestForceManagerIndexes(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.DbIndex = self.env['forcemanager.db.index']
+
+    def _existing_indexes(self):
+        self.env.cr.execute("SELECT indexname FROM pg_indexes WHERE indexname = ANY(%s)",
+                            ([name for name, *_rest in FM_INDEXES],))
+        return {row[0] for row in self.env.cr.fetchall()}
+
+    def test_indexes_exist_after_init(self):
+        self.assertEqual(self._existing_indexes(), {name for name, *_rest in FM_INDEXES})
+
+    def test_ensure_indexes_recreates_missing_index(self):
+        self.env.cr.execute('DROP INDEX "res_partner_fm_id_company_idx"')
+        self.DbIndex._ensure_indexes('res_partner')
+        self.assertIn('res_partner_fm_id_company_idx', self._existing_indexes())
+
+    def test_check_lookup_indexes_report(self):
+        results = self.DbIndex.check_lookup_indexes()
+        self.assertEqual(len(results), len(self.DbIndex._get_lookup_domains()))
+        for result in results:
+            self.assertEqual(set(result), {'model', 'lookup', 'index_backed', 'plan'})
+            self.assertEqual(result['index_backed'], 'Seq Scan' not in result['plan'])
+        by_lookup = {result['lookup']: result for result in results}
+        self.assertTrue(by_lookup['mapeo FM ID => Odoo']['index_backed'])
+        self.assertTrue(by_lookup['cuenta por forcemanager_id']['index_backed'])
+
+    def test_check_lookup_indexes_restores_enable_seqscan(self):
+        cr = self.env.cr
+        for value in ('off', 'on'):
+            cr.execute("SELECT set_config('enable_seqscan', %s, true)", (value,))
+            self.DbIndex.check_lookup_indexes()
+            cr.execute("SHOW enable_seqscan")
+            self.assertEqual(cr.fetchone()[0], value)
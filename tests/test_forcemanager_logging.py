@@ -0,0 +1,69 @@
+import hashlib
+import logging
+
+from odoo.tests import BaseCase, tagged
+
+from ..models.forcemanager_logging import (
+    DEFAULT_SAMPLE_EVERY, LazyBody, body_summary, log_sampled, set_sample_every,
+)
+
+_test_logger = logging.getLogger(__name__ + '.sampled')
+
+
+@tagged('post_install', '-at_install')
+class TestForceManagerLogging(BaseCase):
+
+    def tearDown(self):
+        set_sample_every(DEFAULT_SAMPLE_EVERY)
+        super().tearDown()
+
+    def test_body_summary_truncates_and_hashes(self):
+        body = b'{"name": "' + b'x' * 1000 + b'"}'
+        summary = body_summary(body, limit=20)
+        digest = hashlib.md5(body).hexdigest()[:12]
+        self.assertTrue(summary.startswith(f"<{len(body)} bytes md5={digest}> "))
+        self.assertTrue(summary.endswith('…'))
+        self.assertIn(body[:20].decode(), summary)
+        self.assertNotIn('x' * 21, summary)
+
+    def test_body_summary_short_and_empty(self):
+        self.assertEqual(body_summary(None), '-')
+        self.assertTrue(body_summary('{"a": 1}').endswith('> {"a": 1}'))
+        # Objetos (dict...) se resumen por su repr
+        self.assertIn("{'a': 1}", body_summary({'a': 1}))
+
+    def test_lazy_body_only_formats_when_emitted(self):
+        class Body:
+            calls = 0
+
+            def __repr__(self):
+                Body.calls += 1
+                return 'body'
+
+        _test_logger.setLevel(logging.INFO)
+        try:
+            _test_logger.debug("cuerpo: %s", LazyBody(Body()))
+            self.assertEqual(Body.calls, 0)
+            with self.assertLogs(_test_logger, level='INFO') as logs:
+                _test_logger.info("cuerpo: %s", LazyBody(Body()))
+            self.assertEqual(Body.calls, 1)
+            self.assertIn('body', logs.output[0])
+        finally:
+            _test_logger.setLevel(logging.NOTSET)
+
+    def test_log_sampled_first_and_every_nth(self):
+        set_sample_every(3)
+        with self.assertLogs(_test_logger, level='INFO') as logs:
+            for i in range(1, 8):
+                log_sampled(_test_logger, 'test_sampled_info', "registro %d", i)
+        self.assertEqual(len(logs.output), 3)
+        self.assertIn("registro 1 [test_sampled_info: mensaje 1, 1 de cada 3]", logs.output[0])
+        self.assertIn("registro 3 ", logs.output[1])
+        self.assertIn("registro 6 ", logs.output[2])
+
+    def test_log_sampled_debug_emits_all(self):
+        set_sample_every(3)
+        with self.assertLogs(_test_logger, level='DEBUG') as logs:
+            for i in range(5):
+                log_sampled(_test_logger, 'test_sampled_debug', "registro %d", i)
+        self.assertEqual(len(logs.output), 5)
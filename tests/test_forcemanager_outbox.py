@@ -0,0 +1,177 @@
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestForceManagerOutbox(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.Outbox = self.env['forcemanager.outbox']
+        self.ICP = self.env['ir.config_parameter'].sudo()
+        self.env.cr.execute("DELETE FROM forcemanager_outbox")
+        self.ICP.set_param('forcemanager_integration.outbound_entities', 'accounts')
+
+    def _pending(self, res_model, records):
+        return {
+            res_id: entry for res_id, entry in self.Outbox._peek(res_model).items()
+            if res_id in records.ids
+        }
+
+    def test_enqueue_on_create_and_write(self):
+        partner = self.env['res.partner'].create({'name': 'Cuenta outbox', 'is_company': True})
+        entries = self._pending('res.partner', partner)
+        # Alta => registro completo
+        self.assertIsNone(entries[partner.id]['fields'])
+
+        self.env.cr.execute("DELETE FROM forcemanager_outbox")
+        partner.write({'phone': '600000000'})
+        entries = self._pending('res.partner', partner)
+        self.assertEqual(entries[partner.id]['fields'], {'phone'})
+        self.assertFalse(partner.synced_with_forcemanager)
+
+    def test_ignores_sync_and_bookkeeping_writes(self):
+        partner = self.env['res.partner'].create({'name': 'Cuenta outbox', 'is_company': True})
+        self.env.cr.execute("DELETE FROM forcemanager_outbox")
+        partner.with_context(sync_from_forcemanager=True).write({'phone': '600000000'})
+        # Los campos de control no cuentan como cambio
+        partner.write({'synced_with_forcemanager': True})
+        self.assertFalse(self._pending('res.partner', partner))
+
+    def test_untracked_model_is_not_enqueued(self):
+        self.ICP.set_param('forcemanager_integration.outbound_entities', 'products')
+        partner = self.env['res.partner'].with_context(sync_from_forcemanager=True).create({
+            'name': 'Cuenta sin envío', 'is_company': True, 'synced_with_forcemanager': True,
+        })
+        partner.write({'phone': '600000000'})
+        self.assertFalse(self._pending('res.partner', partner))
+        # El flag sí baja: al activar el envío, `_seed_once` lo recoge
+        self.assertFalse(partner.synced_with_forcemanager)
+
+    def test_peek_in_batches_and_ack(self):
+        self.Outbox._enqueue('res.partner', [101, 102, 103], ['name'])
+        self.Outbox._enqueue('res.partner', [101], ['phone'])
+        first = self.Outbox._peek('res.partner', limit=2)
+        self.assertEqual(set(first), {101, 102})
+        after_id = max(oid for entry in first.values() for oid in entry['outbox_ids'])
+        rest = self.Outbox._peek('res.partner', limit=2, after_id=after_id)
+        self.assertEqual(set(rest), {103, 101})
+
+        everything = self.Outbox._peek('res.partner')
+        self.assertEqual(everything[101]['fields'], {'name', 'phone'})
+        self.Outbox._ack(everything, {101})
+        self.assertEqual(set(self.Outbox._peek('res.partner')), {102, 103})
+
+    def test_record_failures_and_purge(self):
+        self.ICP.set_param('forcemanager_integration.outbox_max_attempts', '2')
+        self.Outbox._enqueue('res.partner', [201, 202], ['name'])
+        self.Outbox._enqueue('crm.lead', [301], ['name'])
+        entries = self.Outbox._peek('res.partner')
+        self.Outbox._record_failures(entries, {201: "[500] Error"})
+        self.Outbox._purge()
+        # crm.lead no tiene envío activo; 201 aún no ha llegado al máximo de intentos
+        self.assertFalse(self.Outbox._peek('crm.lead'))
+        self.assertEqual(set(self.Outbox._peek('res.partner')), {201, 202})
+        self.env.cr.execute("SELECT attempts, last_error FROM forcemanager_outbox WHERE res_id = 201")
+        self.assertEqual(self.env.cr.fetchall(), [(1, "[500] Error")])
+
+        self.Outbox._record_failures(entries, {201: "[500] Error"})
+        self.Outbox._purge()
+        self.assertEqual(set(self.Outbox._peek('res.partner')), {202})
+
+    def test_iter_outbox_batches(self):
+        self.ICP.set_param('forcemanager_integration.outbox_seeded.accounts', '1')
+        self.ICP.set_param('forcemanager_integration.outbox_batch_size', '2')
+        Partner = self.env['res.partner']
+        companies = Partner.browse()
+        for i in range(3):
+            companies |= Partner.create({'name': f'Cuenta {i}', 'is_company': True})
+        contact = Partner.create({'name': 'Contacto', 'is_company': False})
+        # Un contacto con cambios: con 'contacts' desactivado, nadie lo va a consumir
+        self.Outbox._enqueue('res.partner', contact.ids)
+
+        ToFm = self.env['odoo.to.forcemanager']
+        batches = [
+            records for records, _entries
+            in ToFm._iter_outbox_batches('res.partner', 'accounts', [('is_company', '=', True)])
+        ]
+        self.assertTrue(all(len(records) <= 2 for records in batches))
+        self.assertEqual(set().union(*(records.ids for records in batches)), set(companies.ids))
+        # Sin _ack_outbox las cuentas siguen en la cola; el contacto se ha descartado
+        self.assertEqual(set(self.Outbox._peek('res.partner')), set(companies.ids))
+
+    def test_commit_between_batches_only_when_asked(self):
+        self.ICP.set_param('forcemanager_integration.outbox_seeded.accounts', '1')
+        self.ICP.set_param('forcemanager_integration.outbox_batch_size', '1')
+        Partner = self.env['res.partner']
+        for i in range(2):
+            Partner.create({'name': f'Cuenta commit {i}', 'is_company': True})
+        ToFm = self.env['odoo.to.forcemanager']
+        domain = [('is_company', '=', True)]
+
+        with patch.object(self.env.cr, 'commit') as commit:
+            list(ToFm._iter_outbox_batches('res.partner', 'accounts', domain))
+        commit.assert_not_called()
+
+        with patch.object(self.env.cr, 'commit') as commit:
+            list(ToFm.with_context(forcemanager_commit_batches=True)._iter_outbox_batches(
+                'res.partner', 'accounts', domain))
+        self.assertEqual(commit.call_count, 2)
+
+
+@tagged('post_install', '-at_install')
+class TestMarkUnsynced(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.Outbox = self.env['forcemanager.outbox']
+        self.env['ir.config_parameter'].sudo().set_param(
+            'forcemanager_integration.outbound_entities', 'accounts,products,opportunities')
+
+    def _write_and_count(self, records, vals):
+        """write() sobre `records` devolviendo (llamadas a write(), UPDATEs del flag)."""
+        Model = type(records)
+        cr = self.env.cr
+        with patch.object(Model, 'write', autospec=True, side_effect=Model.write) as write, \
+                patch.object(cr, 'execute', wraps=cr.execute) as execute:
+            records.write(vals)
+            self.env.flush_all()
+        flag_updates = [
+            call for call in execute.call_args_list
+            if 'SET synced_with_forcemanager' in str(call.args[0])
+        ]
+        return write.call_count, len(flag_updates)
+
+    def _check_single_update(self, records, vals):
+        self.Outbox._mark_synced(records)
+        self.assertTrue(all(records.mapped('synced_with_forcemanager')))
+        writes, flag_updates = self._write_and_count(records, vals)
+        self.assertEqual(writes, 1)
+        self.assertEqual(flag_updates, 1)
+        self.assertFalse(any(records.mapped('synced_with_forcemanager')))
+
+    def test_partner_write(self):
+        Partner = self.env['res.partner']
+        partners = Partner.create({'name': 'Cuenta A', 'is_company': True}) \
+            | Partner.create({'name': 'Cuenta B', 'is_company': True})
+        self._check_single_update(partners, {'phone': '600000000'})
+
+    def test_lead_write(self):
+        lead = self.env['crm.lead'].create({'name': 'Oportunidad'})
+        self._check_single_update(lead, {'expected_revenue': 1000})
+
+    def test_template_write(self):
+        template = self.env['product.template'].create({'name': 'Producto'})
+        self._check_single_update(template, {'list_price': 12.5})
+
+    def test_already_unsynced_rows_are_not_rewritten(self):
+        partner = self.env['res.partner'].create({'name': 'Cuenta', 'is_company': True})
+        self.Outbox._mark_unsynced(partner)
+        self.env.flush_all()
+        self.env.cr.execute("SELECT write_date FROM res_partner WHERE id = %s", partner.ids)
+        before = self.env.cr.fetchone()[0]
+        self.Outbox._mark_unsynced(partner)
+        self.assertEqual(self.env.cr.rowcount, 0)
+        self.env.cr.execute("SELECT write_date FROM res_partner WHERE id = %s", partner.ids)
+        self.assertEqual(self.env.cr.fetchone()[0], before)
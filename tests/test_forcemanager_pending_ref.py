@@ -0,0 +1,36 @@
+from odoo.tests import TransactionCase, tagged
+
+from ..models import forcemanager_pending_ref
+
+
+@tagged('post_install', '-at_install')
+class TestForceManagerPendingRef(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.PendingRef = self.env['forcemanager.pending.ref']
+        self.PendingRef.search([]).unlink()
+
+    def test_resolves_contacts_once_account_is_linked(self):
+        contact = self.env['res.partner'].create({'name': 'Contacto pendiente'})
+        self.PendingRef._register('contact', 880001, 880100, res_id=contact.id)
+        self.assertEqual(self.PendingRef.resolve_pending(), 0)
+
+        account = self.env['res.partner'].create({'name': 'Cuenta que llega', 'is_company': True})
+        self.env['forcemanager.id.map']._link('account', 880100, account.id)
+        self.assertEqual(self.PendingRef.resolve_pending(fm_account_ids=[880100]), 1)
+        self.assertEqual(contact.parent_id, account)
+        self.assertFalse(self.PendingRef.search([]))
+
+    def test_drops_refs_after_max_attempts(self):
+        self.env['ir.config_parameter'].sudo().set_param('forcemanager_integration.pending_ref_max_attempts', '2')
+        self.PendingRef._register('order', 880002, 880200, payload={'order': {'id': 880002}, 'lines': []})
+
+        self.PendingRef.resolve_pending()
+        ref = self.PendingRef.search([('fm_record_id', '=', 880002)])
+        self.assertEqual(ref.attempts, 1)
+
+        with self.assertLogs(forcemanager_pending_ref._logger, level='WARNING') as logs:
+            self.PendingRef.resolve_pending()
+        self.assertIn("descartado tras 2 intentos", logs.output[0])
+        self.assertFalse(ref.exists())
@@ -0,0 +1,48 @@
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestForceManagerPushHash(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.PushHash = self.env['forcemanager.push.hash']
+
+    def test_payload_hash_is_stable(self):
+        payload = {'name': 'Cliente', 'city': 'Cádiz', 'phone': None}
+        reordered = {'phone': None, 'city': 'Cádiz', 'name': 'Cliente'}
+        self.assertEqual(self.PushHash._payload_hash(payload), self.PushHash._payload_hash(reordered))
+        # 'id' no cuenta: alta y actualización del mismo contenido dan el mismo hash
+        self.assertEqual(self.PushHash._payload_hash(payload),
+                         self.PushHash._payload_hash(dict(payload, id=123)))
+        self.assertNotEqual(self.PushHash._payload_hash(payload),
+                            self.PushHash._payload_hash(dict(payload, city='Jerez')))
+
+    def test_store_get_and_forget(self):
+        self.assertEqual(self.PushHash._get_hashes('res.partner', [1, 2]), {})
+        self.PushHash._store('res.partner', {1: 'aaa', 2: 'bbb'})
+        self.PushHash._store('res.partner', {2: 'ccc'})
+        self.assertEqual(self.PushHash._get_hashes('res.partner', [1, 2, 3]), {1: 'aaa', 2: 'ccc'})
+        self.assertEqual(self.PushHash._get_hashes('crm.lead', [1, 2]), {})
+        self.PushHash._forget('res.partner', [1])
+        self.assertEqual(self.PushHash._get_hashes('res.partner', [1, 2]), {2: 'ccc'})
+
+    def test_unchanged_records_marked_without_write(self):
+        self.env['ir.config_parameter'].sudo().set_param('forcemanager_integration.outbound_entities', 'accounts')
+        partner = self.env['res.partner'].create({'name': 'Cuenta sin cambios', 'is_company': True})
+        partner.write({'forcemanager_id': 9990401})
+        self.env['forcemanager.outbox']._mark_unsynced(partner)
+        payload = {'id': 9990401, 'name': partner.name}
+        self.PushHash._store('res.partner', {partner.id: self.PushHash._payload_hash(payload)})
+        self.env.cr.execute("DELETE FROM forcemanager_outbox")
+        self.env.cr.execute("UPDATE res_partner SET write_date = '2025-01-01 00:00:00' WHERE id = %s", (partner.id,))
+        partner.invalidate_recordset()
+
+        skipped, errors = self.env['odoo.to.forcemanager']._bulk_update(
+            partner, 'accounts', {partner.id: payload}, {}, {}, 'test',
+        )
+        self.assertEqual((skipped, errors), (1, {}))
+        self.assertTrue(partner.synced_with_forcemanager)
+        # Solo la marca: ni write() (write_date) ni vuelta a la cola
+        self.assertEqual(str(partner.write_date), '2025-01-01 00:00:00')
+        self.assertFalse(self.env['forcemanager.outbox']._peek('res.partner'))
@@ -0,0 +1,50 @@
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestForceManagerStaging(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.Staging = self.env['forcemanager.staging.record']
+        self.IdMap = self.env['forcemanager.id.map']
+        self.ToOdoo = self.env['forcemanager.to.odoo']
+
+    def _states(self, run_id):
+        self.env.cr.execute(
+            "SELECT entity, fm_id, state FROM forcemanager_staging_record WHERE run_id = %s", (run_id,)
+        )
+        return {(entity, fm_id): state for entity, fm_id, state in self.env.cr.fetchall()}
+
+    def test_failed_page_leaves_no_cached_links(self):
+        self.Staging._stage_page('run-failed', 'account', [(555001, {'id': 555001, 'name': 'Cuenta staging'})])
+        env = self.env
+
+        def failing_page(payloads, cache):
+            partner = env['res.partner'].create({'name': 'Cuenta staging', 'is_company': True})
+            env['forcemanager.id.map']._link('account', 555001, partner.id)
+            cache['users']['Comercial revertido'] = partner.id
+            raise ValueError("fallo a mitad de página")
+
+        with patch.object(type(self.ToOdoo), '_sync_accounts_records', side_effect=failing_page):
+            self.Staging.apply_run('run-failed')
+
+        self.assertEqual(self._states('run-failed'), {('account', 555001): 'failed'})
+        # El enlace revertido no sigue en la caché en memoria
+        self.assertFalse(self.IdMap._get_res_id('account', 555001))
+
+    def test_watermarks_skip_entities_with_failed_blocks(self):
+        Api = self.env['forcemanager.api']
+        before = fields.Datetime.from_string('2025-03-01 00:00:00')
+        now = fields.Datetime.from_string('2025-04-01 00:00:00')
+        for key in ('accounts', 'contacts'):
+            Api.set_last_sync_date(key, before)
+        self.Staging._stage_page('run-wm', 'account', [(555002, {'id': 555002})])
+        self.env.cr.execute("UPDATE forcemanager_staging_record SET state = 'failed' WHERE run_id = 'run-wm'")
+
+        self.Staging._advance_watermarks('run-wm', {'accounts': now, 'contacts': now})
+        self.assertEqual(Api.get_last_sync_date('accounts'), before)
+        self.assertEqual(Api.get_last_sync_date('contacts'), now)
@@ -0,0 +1,32 @@
+from odoo.tests import BaseCase, tagged
+
+from ..models.forcemanager_tools import normalize_email, normalize_name, normalize_vat
+
+
+@tagged('post_install', '-at_install')
+class TestForceManagerTools(BaseCase):
+
+    def test_normalize_vat(self):
+        self.assertEqual(normalize_vat("ES 12.345.678-A"), "12345678A")
+        self.assertEqual(normalize_vat("esb12345678"), "B12345678")
+        self.assertEqual(normalize_vat("B-12/345_678"), "B12345678")
+        # Sin prefijo de país no se quita nada
+        self.assertEqual(normalize_vat("12345678A"), "12345678A")
+        # Dos letras que no son un prefijo de país forman parte del NIF
+        self.assertEqual(normalize_vat("AB1234567"), "AB1234567")
+        self.assertEqual(normalize_vat("ZZ-998877"), "ZZ998877")
+        self.assertNotEqual(normalize_vat("AB1234567"), normalize_vat("CD1234567"))
+        self.assertEqual(normalize_vat("EL 094014201"), "094014201")
+        self.assertEqual(normalize_vat("FR40303265045"), normalize_vat("40303265045"))
+        self.assertEqual(normalize_vat(False), "")
+        self.assertEqual(normalize_vat(None), "")
+
+    def test_normalize_email(self):
+        self.assertEqual(normalize_email("  Ana.Perez@Example.COM "), "ana.perez@example.com")
+        self.assertEqual(normalize_email(False), "")
+
+    def test_normalize_name(self):
+        self.assertEqual(normalize_name("  Cádiz "), "cadiz")
+        self.assertEqual(normalize_name("A  Coruña"), "a coruna")
+        self.assertEqual(normalize_name("ÀLAVA\tARABA"), "alava araba")
+        self.assertEqual(normalize_name(None), "")
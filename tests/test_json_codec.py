@@ -0,0 +1,55 @@
+from unittest.mock import MagicMock, PropertyMock, patch
+
+from odoo.tests import TransactionCase, tagged
+
+from ..models import forcemanager_api
+from ..models.forcemanager_api import _AUTO_CODECS, JSON_CODECS
+
+
+@tagged('post_install', '-at_install')
+class TestJsonCodec(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.Api = self.env['forcemanager.api']
+        self.ICP = self.env['ir.config_parameter'].sudo()
+
+    def _codec(self, name):
+        self.ICP.set_param('forcemanager_integration.json_codec', name)
+        return self.Api._get_json_codec()
+
+    def test_codec_selection(self):
+        best = next(name for name in _AUTO_CODECS if name in JSON_CODECS)
+        self.assertEqual(self._codec('auto').name, best)
+        self.assertEqual(self._codec('json').name, 'json')
+        # Codec desconocido o no instalado => librería estándar
+        self.assertEqual(self._codec('simdjson').name, 'json')
+
+    def test_codecs_round_trip_bytes(self):
+        obj = [{'id': 1, 'name': 'Cádiz', 'price': 12.5, 'tags': None}]
+        for name, codec in JSON_CODECS.items():
+            with self.subTest(codec=name):
+                data = codec.dumps(obj)
+                self.assertIsInstance(data, bytes)
+                self.assertEqual(codec.loads(data), obj)
+                self.assertEqual(codec.loads('[{"name": "Cádiz"}]'.encode('utf-8')), [{'name': 'Cádiz'}])
+
+    def _response(self, content):
+        """Respuesta cuyo .text y .json() fallan: el cuerpo solo se lee desde los bytes."""
+        resp = MagicMock(status_code=200, content=content)
+        type(resp).text = PropertyMock(side_effect=AssertionError("resp.text no debería leerse"))
+        resp.json.side_effect = AssertionError("resp.json() no debería usarse")
+        return resp
+
+    def test_decode_response_from_bytes(self):
+        self.assertEqual(self.Api._decode_response(self._response(b'{"id": 1}')), {'id': 1})
+        self.assertEqual(self.Api._decode_response(self._response(b'')), {})
+
+    def test_request_uses_codec_both_ways(self):
+        self._codec('json')
+        with patch.object(type(self.Api), '_get_access_token', return_value='token'), \
+                patch.object(forcemanager_api.requests, 'post',
+                             return_value=self._response(b'{"id": 7}')) as post:
+            result = self.Api._perform_request('accounts', 'POST', payload={'name': 'Cádiz'})
+        self.assertEqual(result, {'id': 7})
+        self.assertEqual(post.call_args.kwargs['data'], JSON_CODECS['json'].dumps({'name': 'Cádiz'}))
@@ -0,0 +1,109 @@
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestPreparePayloads(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.ToFm = self.env['odoo.to.forcemanager']
+        self.user = self.env['res.users'].create({
+            'name': 'Comercial FM', 'login': 'fm_payloads', 'forcemanager_id': 9990501,
+        })
+        self.country = self.env.ref('base.es')
+        self.country.forcemanager_id = 9990502
+        self.category = self.env['product.category'].create({'name': 'Categoría FM', 'forcemanager_id': '77'})
+
+    def _count_queries(self, builder, records):
+        """Consultas SQL de builder(records) con la caché vacía."""
+        self.env.flush_all()
+        self.env.invalidate_all()
+        cr = self.env.cr
+        with patch.object(cr, 'execute', wraps=cr.execute) as execute:
+            builder(records)
+        return execute.call_count
+
+    def _accounts(self, count):
+        Partner = self.env['res.partner']
+        partners = Partner.browse()
+        for i in range(count):
+            partners |= Partner.create({
+                'name': f'Cuenta {i}', 'is_company': True, 'city': 'Jaén',
+                'country_id': self.country.id, 'user_id': self.user.id if i % 2 else False,
+            })
+        return partners
+
+    def test_account_payloads(self):
+        with_rep, without_rep = self._accounts(2)[::-1]
+        with_rep.forcemanager_id = 9990510
+        payloads = self.ToFm._prepare_account_payloads(with_rep | without_rep, is_update=True)
+
+        self.assertEqual(payloads[with_rep.id]['id'], 9990510)
+        self.assertNotIn('id', payloads[without_rep.id])
+        self.assertEqual(payloads[with_rep.id]['salesRepId1'], {'id': 9990501, 'value': 'Comercial FM'})
+        self.assertEqual(payloads[without_rep.id]['salesRepId1'], {'id': 95, 'value': 'Joan Bonell'})
+        self.assertEqual(payloads[with_rep.id]['countryId'], {'id': 9990502, 'value': self.country.name})
+        self.assertEqual(payloads[with_rep.id]['city'], 'Jaén')
+        self.assertEqual(payloads[with_rep.id]['address1'], "")
+        # El atajo de un registro devuelve lo mismo
+        self.assertEqual(self.ToFm._prepare_single_account_payload(with_rep, is_update=True), payloads[with_rep.id])
+
+    def test_contact_payloads(self):
+        company = self._accounts(1)
+        company.forcemanager_id = 9990520
+        contact = self.env['res.partner'].create({'name': 'Ana', 'parent_id': company.id, 'function': 'Compras'})
+        payload = self.ToFm._prepare_contact_payloads(contact)[contact.id]
+        self.assertEqual(payload['accountId'], {'id': 9990520, 'value': company.name})
+        self.assertEqual(payload['typeId'], {'id': 0, 'value': 'Compras'})
+        self.assertEqual(payload['firstName'], 'Ana')
+        self.assertNotIn('id', payload)
+        self.assertIn('id', self.ToFm._prepare_single_contact_payload_for_update(contact))
+
+    def test_product_payloads(self):
+        template = self.env['product.template'].create({
+            'name': 'Producto FM', 'list_price': 12.5, 'categ_id': self.category.id, 'forcemanager_id': '880',
+        })
+        created = self.ToFm._prepare_product_payloads(template)[template.id]
+        self.assertEqual(created['extId'], str(template.id))
+        self.assertEqual(created['model'], 'Producto FM')
+        self.assertEqual(created['price'], 12.5)
+        self.assertEqual(created['categoryId'], 77)
+        self.assertNotIn('id', created)
+        self.assertEqual(self.ToFm._prepare_product_payloads(template, is_create=False)[template.id]['id'], 880)
+
+    def test_opportunity_and_order_payloads(self):
+        company = self._accounts(1)
+        company.forcemanager_id = 9990530
+        lead = self.env['crm.lead'].create({
+            'name': 'Oportunidad FM', 'partner_id': company.id, 'probability': 40, 'user_id': self.user.id,
+        })
+        payload = self.ToFm._prepare_opportunity_payloads(lead)[lead.id]
+        self.assertEqual(payload['accountId1'], {'id': 9990530, 'value': company.name})
+        self.assertAlmostEqual(payload['salesProbability'], 0.4)
+        self.assertEqual(payload['salesRepId'], {'id': 9990501, 'value': 'Comercial FM'})
+
+        template = self.env['product.template'].create({'name': 'Producto pedido', 'forcemanager_id': '881'})
+        order = self.env['sale.order'].create({
+            'partner_id': company.id,
+            'order_line': [(0, 0, {'product_id': template.product_variant_id.id, 'product_uom_qty': 3,
+                                   'price_unit': 2.0})],
+        })
+        payload = self.ToFm._prepare_order_payloads(order)[order.id]
+        self.assertEqual(payload['accountId'], {'id': 9990530, 'value': company.name})
+        self.assertEqual([(line['productId'], line['quantity'], line['unitPrice']) for line in payload['lines']],
+                         [('881', 3, 2.0)])
+        self.assertFalse(payload['deleted'])
+
+    def test_queries_do_not_grow_with_records(self):
+        few = self._accounts(2)
+        many = self._accounts(8)
+        self.assertEqual(
+            self._count_queries(self.ToFm._prepare_account_payloads, few),
+            self._count_queries(self.ToFm._prepare_account_payloads, many),
+        )
+        self.assertEqual(
+            self._count_queries(self.ToFm._prepare_contact_payloads, few),
+            self._count_queries(self.ToFm._prepare_contact_payloads, many),
+        )
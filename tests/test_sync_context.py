@@ -0,0 +1,53 @@
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestSyncContext(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.ToOdoo = self.env['forcemanager.to.odoo']
+        self.ICP = self.env['ir.config_parameter'].sudo()
+        self.ICP.set_param('forcemanager_integration.outbound_entities', 'accounts,opportunities')
+        self.env.cr.execute("DELETE FROM forcemanager_outbox")
+        self.stages = self.env['crm.stage'].search([], limit=2)
+        self.user = self.env['res.users'].create({'name': 'Comercial FM', 'login': 'fm_sync_context'})
+
+    def _messages(self, record):
+        return self.env['mail.message'].search([('model', '=', record._name), ('res_id', '=', record.id)])
+
+    def test_sync_writes_leave_no_chatter_or_tracking(self):
+        Lead = self.ToOdoo._sync_env('crm.lead')
+        lead = Lead.create({'name': 'Oportunidad FM', 'stage_id': self.stages[:1].id})
+        self.assertFalse(self._messages(lead))
+        self.assertFalse(lead.message_follower_ids)
+
+        lead.write({'user_id': self.user.id, 'stage_id': self.stages[-1:].id, 'expected_revenue': 1000})
+        self.env.flush_all()
+        self.assertFalse(self._messages(lead))
+        self.assertFalse(self.env['mail.tracking.value'].search([('mail_message_id.res_id', '=', lead.id),
+                                                                  ('mail_message_id.model', '=', 'crm.lead')]))
+
+    def test_sync_writes_are_not_sent_back(self):
+        partner = self.ToOdoo._sync_env('res.partner').create({'name': 'Cuenta FM', 'is_company': True})
+        partner.write({'phone': '600000000'})
+        self.assertNotIn(partner.id, self.env['forcemanager.outbox']._peek('res.partner'))
+
+    def test_chatter_summary_is_one_note_per_record(self):
+        self.ICP.set_param('forcemanager_integration.sync_chatter_summary', '1')
+        partner = self.ToOdoo._sync_env('res.partner').create({'name': 'Cuenta FM', 'is_company': True})
+        self.ToOdoo._note_synced('res.partner', partner.ids, ['phone'])
+        self.ToOdoo._note_synced('res.partner', partner.ids, ['city', 'synced_with_forcemanager'])
+
+        self.assertEqual(self.ToOdoo._post_sync_summaries(), 1)
+        messages = self._messages(partner)
+        self.assertEqual(len(messages), 1)
+        self.assertIn(partner._fields['city'].string, messages.body)
+        self.assertIn(partner._fields['phone'].string, messages.body)
+        # Ya publicadas: una segunda llamada no repite notas
+        self.assertEqual(self.ToOdoo._post_sync_summaries(), 0)
+
+    def test_chatter_summary_disabled_by_default(self):
+        partner = self.ToOdoo._sync_env('res.partner').create({'name': 'Cuenta FM', 'is_company': True})
+        self.ToOdoo._note_synced('res.partner', partner.ids, ['phone'])
+        self.assertEqual(self.ToOdoo._post_sync_summaries(), 0)
@@ -0,0 +1,69 @@
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestSyncOpportunitiesPage(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.ToOdoo = self.env['forcemanager.to.odoo']
+        self.IdMap = self.env['forcemanager.id.map']
+        self.stage = self.env['crm.stage'].create({'name': 'Etapa FM test'})
+        self.user = self.env['res.users'].create({'name': 'Comercial opp FM', 'login': 'fm_opp_salesrep'})
+        self.account = self.env['res.partner'].create({'name': 'Cuenta opp', 'is_company': True})
+        self.IdMap._link('account', 770100, self.account.id)
+        self.lead = self.env['crm.lead'].create({'name': 'Lead existente'})
+        self.IdMap._link('opportunity', 770001, self.lead.id)
+        self.env['forcemanager.pending.ref'].search([]).unlink()
+
+    def _opp(self, fm_id, account_id, reference):
+        return {
+            'id': fm_id,
+            'reference': reference,
+            'statusId': {'value': 'Etapa FM test'},
+            'salesProbability': 5,
+            'salesForecastDate': '2025-06-30T00:00:00Z',
+            'total': 1200.0,
+            'salesRepId': {'id': 33, 'value': 'Comercial opp FM'},
+            'accountId1': {'id': account_id},
+        }
+
+    def test_page_creates_updates_and_queues_missing_accounts(self):
+        cache = self.ToOdoo._new_resolution_cache()
+        processed = self.ToOdoo._sync_opportunities_page([
+            self._opp(770001, 770100, 'Actualizada'),
+            self._opp(770002, 770100, 'Nueva con cuenta'),
+            self._opp(770003, 770999, 'Nueva sin cuenta'),
+            {'id': None},
+        ], cache)
+        self.assertEqual(processed, 3)
+
+        self.assertEqual(self.lead.name, 'Actualizada')
+        self.assertEqual(self.lead.partner_id, self.account)
+        self.assertEqual(self.lead.stage_id, self.stage)
+        self.assertEqual(self.lead.user_id, self.user)
+        self.assertEqual(self.lead.probability, 50.0)
+        self.assertTrue(self.lead.synced_with_forcemanager)
+
+        with_account = self.env['crm.lead'].browse(self.IdMap._get_res_id('opportunity', 770002))
+        self.assertEqual(with_account.partner_id, self.account)
+        without_account = self.env['crm.lead'].browse(self.IdMap._get_res_id('opportunity', 770003))
+        self.assertTrue(without_account)
+        self.assertFalse(without_account.partner_id)
+
+        pending = self.env['forcemanager.pending.ref'].search([('entity', '=', 'opportunity')])
+        self.assertEqual(pending.mapped('fm_record_id'), [770003])
+        self.assertEqual(pending.res_id, without_account.id)
+
+    def test_lookups_cached_across_pages(self):
+        cache = self.ToOdoo._new_resolution_cache()
+        self.ToOdoo._sync_opportunities_page([self._opp(770004, 770100, 'Página 1')], cache)
+        self.assertEqual(cache['stages'].get('Etapa FM test'), self.stage.id)
+        self.assertEqual(cache['users_by_name'], {'Comercial opp FM': self.user.id})
+
+        # Una etapa creada después no se ve: las etapas se leen una vez por ejecución
+        self.env['crm.stage'].create({'name': 'Etapa nueva'})
+        opp = dict(self._opp(770005, 770100, 'Página 2'), statusId={'value': 'Etapa nueva'})
+        self.ToOdoo._sync_opportunities_page([opp], cache)
+        lead = self.env['crm.lead'].browse(self.IdMap._get_res_id('opportunity', 770005))
+        self.assertNotEqual(lead.stage_id.name, 'Etapa nueva')
@@ -0,0 +1,49 @@
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestSyncProductsPage(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        Category = self.env['product.category']
+        if 'b2b_available' not in Category._fields:
+            # b2b_available lo aporta otro módulo de la instalación (no es dependencia de este)
+            self.skipTest("product.category.b2b_available no está disponible")
+        self.ToOdoo = self.env['forcemanager.to.odoo']
+        self.cat_b2b = Category.create({'name': 'Cat B2B', 'forcemanager_id': '660100', 'b2b_available': True})
+        self.cat_other = Category.create({'name': 'Cat no B2B', 'forcemanager_id': '660200', 'b2b_available': False})
+        Template = self.env['product.template']
+        self.tmpl_a = Template.create({'name': 'Producto A', 'categ_id': self.cat_b2b.id, 'list_price': 1.0})
+        self.tmpl_b = Template.create({'name': 'Producto B', 'categ_id': self.cat_b2b.id, 'list_price': 2.0})
+        self.tmpl_a.write({'forcemanager_id': '660001'})
+        self.tmpl_b.write({'forcemanager_id': '660002'})
+
+    def test_page_updates_only_b2b_existing_products(self):
+        products_before = self.env['product.product'].search_count([])
+        received = self.ToOdoo._sync_products_page([
+            {'id': 660001, 'model': 'Producto A renombrado', 'price': 10.0, 'cost': 4.0,
+             'categoryId': {'id': 660100}},
+            # Categoría FM no B2B => se omite
+            {'id': 660002, 'model': 'Producto B renombrado', 'price': 20.0, 'categoryId': {'id': 660200}},
+            # No existe en Odoo => no se crea
+            {'id': 660003, 'model': 'Producto nuevo', 'price': 30.0},
+        ])
+        self.assertEqual(received, 3)
+        self.assertEqual(self.env['product.product'].search_count([]), products_before)
+
+        self.assertEqual(self.tmpl_a.name, 'Producto A renombrado')
+        self.assertEqual(self.tmpl_a.list_price, 10.0)
+        self.assertEqual(self.tmpl_a.standard_price, 4.0)
+        self.assertTrue(self.tmpl_a.synced_with_forcemanager)
+
+        self.assertEqual(self.tmpl_b.name, 'Producto B')
+        self.assertEqual(self.tmpl_b.list_price, 2.0)
+        self.assertEqual(self.tmpl_b.categ_id, self.cat_b2b)
+
+    def test_unknown_category_keeps_current_one(self):
+        self.ToOdoo._sync_products_page([
+            {'id': 660001, 'model': 'Producto A', 'price': 5.0, 'cost': 0.0, 'categoryId': {'id': 669999}},
+        ])
+        self.assertEqual(self.tmpl_a.categ_id, self.cat_b2b)
+        self.assertEqual(self.tmpl_a.list_price, 5.0)
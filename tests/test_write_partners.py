@@ -0,0 +1,53 @@
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestWritePartners(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.ToOdoo = self.env['forcemanager.to.odoo']
+        self.ICP = self.env['ir.config_parameter'].sudo()
+        Partner = self.env['res.partner']
+        self.lonely = Partner.create({'name': 'Cuenta sola', 'is_company': True, 'city': 'Jaén', 'phone': '1'})
+        self.parent = Partner.create({'name': 'Cuenta con hijos', 'is_company': True, 'city': 'Jaén'})
+        self.child = Partner.create({'name': 'Hijo', 'parent_id': self.parent.id, 'type': 'contact'})
+
+    def _write(self, updates):
+        Partner = type(self.env['res.partner'])
+        with patch.object(Partner, 'write', autospec=True, side_effect=Partner.write) as orm_write:
+            stats = self.ToOdoo._write_partners(updates, log_tag='test')
+        written = {rec.id for call in orm_write.call_args_list for rec in call.args[0]}
+        return stats, written
+
+    def test_fast_path_uses_sql_for_plain_fields(self):
+        self.ICP.set_param('forcemanager_integration.partner_fast_path', '1')
+        stats, written = self._write({
+            self.lonely.id: {'city': 'Cádiz', 'phone': '1', 'email': 'Cuenta@Example.com',
+                             'synced_with_forcemanager': True},
+            # Tiene contactos hijos: la dirección va por el ORM para que se propague
+            self.parent.id: {'city': 'Cádiz', 'phone': '2', 'synced_with_forcemanager': True},
+        })
+        self.assertEqual(stats, {'orm': 1, 'sql': 2, 'unchanged': 0})
+        self.assertEqual(written, {self.parent.id})
+
+        self.assertEqual(self.lonely.city, 'Cádiz')
+        self.assertTrue(self.lonely.synced_with_forcemanager)
+        # Los almacenados que dependen de lo escrito por SQL se recalculan
+        self.assertEqual(self.lonely.fm_email_normalized, 'cuenta@example.com')
+        self.assertEqual(self.parent.phone, '2')
+        self.assertEqual(self.child.city, 'Cádiz')
+
+    def test_without_fast_path_everything_goes_through_orm(self):
+        stats, written = self._write({self.lonely.id: {'city': 'Cádiz', 'phone': '1'}})
+        self.assertEqual(stats, {'orm': 1, 'sql': 0, 'unchanged': 0})
+        self.assertEqual(written, {self.lonely.id})
+        self.assertEqual(self.lonely.city, 'Cádiz')
+
+    def test_unchanged_values_are_not_written(self):
+        self.ICP.set_param('forcemanager_integration.partner_fast_path', '1')
+        stats, written = self._write({self.lonely.id: {'city': 'Jaén', 'phone': '1'}})
+        self.assertEqual(stats, {'orm': 0, 'sql': 0, 'unchanged': 1})
+        self.assertFalse(written)